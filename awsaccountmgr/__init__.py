@@ -1,3 +1,4 @@
+from .session import registry
 from .configparser import read_config_files, validate_config
 from .sts import assume_role, create_boto3_client
 from .vpc import delete_default_vpc
@@ -3,8 +3,6 @@
 The Account class allows you to create or update a new account.
 """
 
-from typing import List
-
 
 class AlternateContact:
     """Represent an alternate contact for an AWS Account."""
@@ -41,6 +39,30 @@ class AlternateContact:
         else:
             self.title = "NotApplicable"
 
+    def __eq__(self, other):
+        if not isinstance(other, AlternateContact):
+            return NotImplemented
+
+        return (self.type, self.name, self.email, self.phone, self.title) == (
+            other.type,
+            other.name,
+            other.email,
+            other.phone,
+            other.title,
+        )
+
+    def __repr__(self):
+        return f"AlternateContact({self.type}, {self.name}, {self.email})"
+
+    def to_config(self):
+        """Returns the contact as an AlternateContacts configuration entry."""
+        return {
+            "Name": self.name,
+            "Email": self.email,
+            "PhoneNumber": self.phone,
+            "Title": self.title,
+        }
+
     @classmethod
     def load_from_config(cls, contact_type, config):
         """Initialize Account class from configuration AlternateContacts entry."""
@@ -73,7 +95,7 @@ class Account:
         operations_contact: AlternateContact = None,
         security_contact: AlternateContact = None,
         billing_contact: AlternateContact = None,
-        tags: List = None,
+        tags=None,
     ):
         """Initialize Account object.
 
@@ -82,7 +104,8 @@ class Account:
         :param ou_path: Organizational Unit path. For nested OUs use / notation, eg. us/development.
                         Use root identifier to target root OU (eg. r-abc1) or just use '/'
 
-        :param alias: Optional Alias to use, if None the alias will default to full_name
+        :param alias: Optional Alias to use, if None the alias will default to full_name.
+                      Set this to False to leave the alias of the account unmanaged
         :param delete_default_vpc: Set this to True to delete the default vpc from the account
         :param allow_direct_move_between_ou: Set this to False to prevent the script from moving
                                              an account directly from one OU to another. This is
@@ -94,7 +117,10 @@ class Account:
         :param operations_contact: Contact email for AWS Operations
         :param security_contact: Contact email for AWS Security
         :param billing_contact: Contact email for AWS Billing
-        :param tags: a dict containing optional tags for the account
+        :param tags: Optional tags for the account, either a dict or a list of dicts. When
+                     provided the tags are fully managed, meaning tags on the account that
+                     are not defined here will be removed. Provide an empty list to remove
+                     all tags
         """
         self.full_name = full_name
         self.email = email
@@ -105,6 +131,8 @@ class Account:
 
         if alias is None:
             self.alias = full_name
+        elif alias is False:
+            self.alias = None
         else:
             self.alias = alias
 
@@ -113,11 +141,63 @@ class Account:
         self.security_contact = security_contact
         self.billing_contact = billing_contact
 
+        self.update_tags = tags is not None
         if tags is None:
             self.tags = []
+        elif isinstance(tags, dict):
+            self.tags = [{key: value} for key, value in tags.items()]
         else:
             self.tags = tags
 
+    @property
+    def alternate_contacts(self):
+        """Dict of contact type to AlternateContact, None for contacts to remove."""
+        return {
+            "OPERATIONS": self.operations_contact,
+            "SECURITY": self.security_contact,
+            "BILLING": self.billing_contact,
+        }
+
+    @property
+    def tags_dict(self):
+        """The account tags as a dict of {key: value} strings."""
+        return {str(key): str(value) for tag in self.tags for key, value in tag.items()}
+
+    def to_config(self):
+        """Returns the account as a configuration file entry.
+
+        Optional parameters are only included when they differ from their default,
+        so equivalent configurations result in the same dict.
+        """
+        config = {
+            "AccountFullName": self.full_name,
+            "OrganizationalUnitPath": self.ou_path,
+            "Email": self.email,
+        }
+
+        if self.alias is None:
+            config["Alias"] = False
+        elif self.alias != self.full_name:
+            config["Alias"] = self.alias
+        if self.delete_default_vpc:
+            config["DeleteDefaultVPC"] = True
+        if self.allow_direct_move_between_ou:
+            config["AllowDirectMoveBetweenOU"] = True
+        if not self.allow_billing:
+            config["AllowBilling"] = False
+
+        if self.update_alternate_contacts:
+            config["AlternateContacts"] = {
+                contact_type.capitalize(): contact.to_config()
+                for contact_type, contact in self.alternate_contacts.items()
+                if contact is not None
+            }
+
+        if self.update_tags:
+            config["Tags"] = self.tags_dict
+
+        return config
+
     @classmethod
     def load_from_config(cls, config):
         """Initialize Account class from configuration object."""
@@ -151,5 +231,5 @@ class Account:
             operations_contact=operations_contact,
             security_contact=security_contact,
             billing_contact=billing_contact,
-            tags=config.get("Tags", []),
+            tags=config.get("Tags"),
         )
@@ -0,0 +1,671 @@
+"""Reconcile accounts with asyncio instead of a pool of worker threads.
+
+boto3 is blocking, so each AWS API call still runs on a thread of a shared
+executor. A thread is only held for the duration of a single call though.
+Waiting for new accounts, for their role to become assumable and for VPC
+dependencies to clear happens with asyncio.sleep, so thousands of accounts and
+regions can be waiting at the same time without a thread each.
+
+The calls in flight are bounded per service by a semaphore, on top of the
+request rate limits of the rate limiter. Single API calls made with
+AsyncRunner.call(), like the default VPC lookups and deletions and the polling
+of account creations, also wait for their rate limit tokens and retries with
+asyncio.sleep. Operations of the Organization class that make several calls,
+like moving or tagging an account, run on a thread as a whole and wait for
+tokens and retries on that thread.
+"""
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from .account import Account
+from .context import bind_context
+from .metrics import api_metrics
+from .organization import CreateAccountPoller, Organization
+from .plan import AccountPlan, Planner
+from .ratelimit import rate_limiter
+from .reconcile import (
+    ResultCollector,
+    _get_create_requests,
+    apply_change,
+    applying_change,
+    capture_result,
+    handle_create_status,
+)
+from .retry import (
+    NEW_ACCOUNT_ERROR_CODES,
+    RETRYABLE_ERROR_CODES,
+    retried_by_caller,
+    retry_policy,
+)
+from .sts import assume_role, create_boto3_client
+from .tracing import tracer
+from .vpc import dependency_retry_policy
+
+# Maximum amount of calls in flight per service
+DEFAULT_SERVICE_CONCURRENCY = {
+    "organizations": 10,
+    "account": 10,
+    "iam": 10,
+    "sts": 20,
+    "ec2": 50,
+}
+
+
+class AsyncRunner:
+    """Run blocking boto3 calls on a shared executor, bounded per service."""
+
+    def __init__(self, service_concurrency=None, max_workers=None):
+        """Initialize AsyncRunner.
+
+        :param service_concurrency: Dict of {service: calls in flight} overriding
+                                    DEFAULT_SERVICE_CONCURRENCY
+        :param max_workers: Amount of executor threads, defaults to the sum of
+                            the service concurrency
+        """
+        self.service_concurrency = dict(DEFAULT_SERVICE_CONCURRENCY)
+        self.service_concurrency.update(service_concurrency or {})
+        self.max_workers = max_workers or sum(self.service_concurrency.values())
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._semaphores = {}
+
+    @staticmethod
+    def parse_service_concurrency(limits):
+        """Returns a dict of {service: calls} from strings like 'organizations=5'."""
+        service_concurrency = {}
+        for limit in limits:
+            try:
+                service, calls = limit.split("=")
+                calls = int(calls)
+            except ValueError:
+                raise ValueError(
+                    f"Invalid concurrency limit {limit}, expected <service>=<calls>"
+                )
+            if calls < 1:
+                raise ValueError(
+                    f"Invalid concurrency limit {limit}, calls should be at least 1"
+                )
+            service_concurrency[service] = calls
+
+        return service_concurrency
+
+    def _semaphore(self, service):
+        # Created on first use so the semaphore belongs to the running event loop
+        if service not in self._semaphores:
+            self._semaphores[service] = asyncio.BoundedSemaphore(
+                self.service_concurrency.get(service, self.max_workers)
+            )
+        return self._semaphores[service]
+
+    async def run(self, service, function, *args, **kwargs):
+        """Run a blocking function on the executor.
+
+        The function runs in the context of the calling task, so its API calls
+        are attributed to the account and step of the task in the metrics.
+
+        :param service: The service the function calls, eg. 'organizations', or
+                        None to only bound the call by the amount of threads
+        :param function: The blocking function to run
+        :return: The return value of the function
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(bind_context(function), *args, **kwargs)
+        if service is None:
+            return await loop.run_in_executor(self._executor, call)
+
+        async with self._semaphore(service):
+            return await loop.run_in_executor(self._executor, call)
+
+    async def call(
+        self, client, method, *, policy=retry_policy, retryable_codes=(), **kwargs
+    ):
+        """Make a single API call without holding a thread while waiting.
+
+        The rate limit tokens are reserved up front and retries are made by the
+        policy, so waiting for either is an asyncio.sleep.
+
+        :param client: A client created through the session registry
+        :param method: The name of the client method, eg. 'describe_vpcs'
+        :param policy: The RetryPolicy to retry failed calls with
+        :param retryable_codes: Error codes to retry on top of the throttling and
+                                transient errors of the policy
+        :return: The response of the call
+        """
+        service = client.meta.service_model.service_id.hyphenize()
+        operation = client.meta.method_to_api_mapping[method]
+        function = getattr(client, method)
+
+        def call_once():
+            with rate_limiter.reserved(), retried_by_caller():
+                return function(**kwargs)
+
+        async def attempt():
+            await asyncio.sleep(rate_limiter.reserve(client, operation))
+            return await self.run(service, call_once)
+
+        attempt.__name__ = f"{service}.{operation}"
+        return await policy.call_async(
+            attempt,
+            retryable_codes=policy.retryable_codes
+            | RETRYABLE_ERROR_CODES
+            | set(retryable_codes),
+        )
+
+    def wrap(self, service, function):
+        """Returns a coroutine function that runs function with run()."""
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            return await self.run(service, function, *args, **kwargs)
+
+        return wrapper
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class AsyncOrganization:
+    """Asyncio versions of the Organization operations."""
+
+    def __init__(self, org_session, runner):
+        """Initialize AsyncOrganization.
+
+        :param org_session: Instance of Organization class to make the calls with
+        :param runner: Instance of AsyncRunner class
+        """
+        self.org_session = org_session
+        self.runner = runner
+
+    async def get_account_id(self, account_name):
+        return await self.runner.run(
+            "organizations", self.org_session.get_account_id, account_name
+        )
+
+    async def submit_create_account(self, account: Account):
+        return await self.runner.run(
+            "organizations", self.org_session.submit_create_account, account
+        )
+
+    async def _list_running_create_requests(self):
+        """Returns the IDs of the create account requests that are in progress."""
+        request_ids = set()
+        kwargs = {"States": ["IN_PROGRESS"]}
+
+        while True:
+            response = await self.runner.call(
+                self.org_session._org_client, "list_create_account_status", **kwargs
+            )
+            request_ids.update(
+                status["Id"] for status in response["CreateAccountStatuses"]
+            )
+            if not response.get("NextToken"):
+                return request_ids
+            kwargs["NextToken"] = response["NextToken"]
+
+    async def wait_for_create_account_requests(
+        self, request_ids, poll_interval=1, max_poll_interval=16
+    ):
+        """Poll the given create account requests until they are completed.
+
+        Same as Organization.wait_for_create_account_requests(), but the requests
+        that left the in progress list are described concurrently and the rounds
+        are separated by asyncio.sleep.
+
+        :return: Async generator of CreateAccountStatus dicts
+        """
+        poller = CreateAccountPoller(request_ids, poll_interval, max_poll_interval)
+
+        while poller.in_progress:
+            running = await self._list_running_create_requests()
+            describe = functools.partial(
+                self.runner.call,
+                self.org_session._org_client,
+                "describe_create_account_status",
+            )
+            responses = await asyncio.gather(
+                *(
+                    describe(CreateAccountRequestId=request_id)
+                    for request_id in poller.to_describe(running)
+                )
+            )
+
+            for response in responses:
+                response = response["CreateAccountStatus"]
+                if not poller.complete(response):
+                    continue
+
+                if response["State"] == "SUCCEEDED":
+                    await self.runner.run(
+                        "organizations",
+                        self.org_session.add_created_account,
+                        response["AccountId"],
+                    )
+                yield response
+
+            if poller.in_progress:
+                await asyncio.sleep(poller.next_interval())
+
+    async def wait_for_account_access(
+        self, account_id, role_name="OrganizationAccountAccessRole", timeout=300
+    ):
+        """Wait until the role in a new account can be assumed.
+
+        :param account_id: ID of the new account
+        :param role_name: The name of the role to assume
+        :param timeout: Maximum amount of seconds to wait
+        """
+        await Organization.account_access_policy(timeout).call_async(
+            self.runner.wrap("sts", assume_role),
+            account_id,
+            role_name,
+            self.org_session._master_credentials,
+            retryable_codes=NEW_ACCOUNT_ERROR_CODES,
+        )
+
+    async def create_account(self, account: Account):
+        """Create a new account and wait until its role can be assumed.
+
+        :param account: Class instance of Account
+        :return: account_id
+        """
+        request_id = await self.submit_create_account(account)
+
+        async for response in self.wait_for_create_account_requests([request_id]):
+            if response["State"] == "FAILED":
+                raise Organization.create_account_error(account, response)
+            account_id = response["AccountId"]
+
+        await self.wait_for_account_access(account_id)
+
+        return account_id
+
+    async def move_account(self, account_id, ou_path, allow_direct_move=False):
+        await self.runner.run(
+            "organizations",
+            self.org_session.move_account,
+            account_id,
+            ou_path,
+            allow_direct_move,
+        )
+
+    async def create_account_alias(self, account_id, account_alias):
+        await self.runner.run(
+            "iam", self.org_session.create_account_alias, account_id, account_alias
+        )
+
+    async def update_alternate_contacts(self, account_id, contacts):
+        await self.runner.run(
+            "account", self.org_session.update_alternate_contacts, account_id, contacts
+        )
+
+    async def update_account_tags(self, account_id, tags, remove_keys=()):
+        await self.runner.run(
+            "organizations",
+            self.org_session.update_account_tags,
+            account_id,
+            tags,
+            remove_keys,
+        )
+
+    async def get_default_vpc_id(self, account_id, region):
+        """Returns the ID of the default VPC of an account in a region, None if missing.
+
+        :param account_id: The account ID to look up the VPC of
+        :param region: The name of the region to look in
+        """
+        ec2_client = await self.runner.run(
+            "sts",
+            create_boto3_client,
+            account_id,
+            "ec2",
+            self.org_session._master_credentials,
+            region_name=region,
+        )
+        return await get_default_vpc_id(
+            self.runner, ec2_client, self.org_session.is_new_account(account_id)
+        )
+
+    async def plan_account(self, account: Account, journal=None):
+        """Asyncio version of Planner.plan_account().
+
+        The steps are planned concurrently, each reading the account within the
+        limits of its own service. The default VPCs of all regions are looked up
+        at the same time.
+
+        :param account: Instance of Account class
+        :param journal: AccountJournal of the account, steps that have been completed
+                        in an interrupted run are not read and not planned again
+        :return: AccountPlan
+        """
+        planner = Planner(self.org_session)
+        account_id = await self.get_account_id(account.full_name)
+
+        async def plan_default_vpcs():
+            regions = await self.runner.run(
+                "ec2", planner._get_default_vpc_regions, account, journal
+            )
+            if regions and account_id is not None:
+                vpc_ids = await asyncio.gather(
+                    *(self.get_default_vpc_id(account_id, region) for region in regions)
+                )
+                regions = [region for region, vpc_id in zip(regions, vpc_ids) if vpc_id]
+            return planner._default_vpc_changes(regions)
+
+        steps = await asyncio.gather(
+            self.runner.run(
+                "organizations", planner._plan_move, account, account_id, journal
+            ),
+            plan_default_vpcs(),
+            self.runner.run("iam", planner._plan_alias, account, account_id, journal),
+            self.runner.run(
+                "account",
+                planner._plan_alternate_contacts,
+                account,
+                account_id,
+                journal,
+            ),
+            self.runner.run(
+                "organizations", planner._plan_tags, account, account_id, journal
+            ),
+        )
+
+        changes = planner._plan_create(account, account_id)
+        for step in steps:
+            changes.extend(step)
+
+        return AccountPlan(account, account_id, changes)
+
+    async def delete_default_vpc(self, account_id, region):
+        """Delete the default VPC of an account in a region.
+
+        :param account_id: The account ID to remove the VPC from
+        :param region: The name of the region the VPC is resided
+        """
+        ec2_client = await self.runner.run(
+            "sts",
+            create_boto3_client,
+            account_id,
+            "ec2",
+            self.org_session._master_credentials,
+            region_name=region,
+        )
+        logging.info(f"Deleting default VPC from {account_id} in region {region}")
+        return await delete_default_vpc(
+            self.runner,
+            ec2_client,
+            account_id,
+            new_account=self.org_session.is_new_account(account_id),
+        )
+
+
+async def get_default_vpc_id(runner, client, new_account=False):
+    """Asyncio version of vpc.get_default_vpc_id().
+
+    :param runner: Instance of AsyncRunner class
+    :param client: EC2 boto3 client instance
+    :param new_account: Set this to True if the account was created in this run
+    :return: The ID of the default VPC, None if there is no default VPC
+    """
+    vpc_response = await runner.call(
+        client,
+        "describe_vpcs",
+        retryable_codes=NEW_ACCOUNT_ERROR_CODES if new_account else (),
+        Filters=[{"Name": "isDefault", "Values": ["true"]}],
+    )
+
+    if not vpc_response["Vpcs"]:
+        return None
+
+    return vpc_response["Vpcs"][0]["VpcId"]
+
+
+async def delete_default_vpc(
+    runner, client, account_id, dry_run=False, new_account=False
+):
+    """Asyncio version of vpc.delete_default_vpc().
+
+    The subnets are deleted concurrently, and waiting for the dependencies of a
+    resource to clear is done with asyncio.sleep.
+
+    :param runner: Instance of AsyncRunner class
+    :param client: EC2 boto3 client instance
+    :param account_id: AWS account id
+    :param dry_run: Set this to True to only check permissions for the delete calls
+    :param new_account: Set this to True if the account was created in this run
+    """
+
+    async def describe(method, **kwargs):
+        return await runner.call(
+            client,
+            method,
+            retryable_codes=NEW_ACCOUNT_ERROR_CODES if new_account else (),
+            **kwargs,
+        )
+
+    async def delete(method, **kwargs):
+        return await runner.call(
+            client, method, policy=dependency_retry_policy, **kwargs
+        )
+
+    default_vpc_id = await get_default_vpc_id(runner, client, new_account)
+    if default_vpc_id is None:
+        logging.info(f"No default VPC found in account {account_id}")
+        return
+
+    logging.info(f"Found default VPC Id {default_vpc_id}")
+
+    subnet_response = await describe(
+        "describe_subnets",
+        Filters=[{"Name": "vpc-id", "Values": [default_vpc_id]}],
+    )
+    default_subnets = subnet_response["Subnets"]
+
+    logging.info(f"Deleting default {len(default_subnets)} subnets")
+    await asyncio.gather(
+        *(
+            delete("delete_subnet", SubnetId=subnet["SubnetId"], DryRun=dry_run)
+            for subnet in default_subnets
+        )
+    )
+
+    igw_response = await describe(
+        "describe_internet_gateways",
+        Filters=[{"Name": "attachment.vpc-id", "Values": [default_vpc_id]}],
+    )
+
+    for igw in igw_response["InternetGateways"]:
+        default_igw = igw["InternetGatewayId"]
+
+        logging.info(f"Detaching Internet Gateway {default_igw}")
+        await runner.call(
+            client,
+            "detach_internet_gateway",
+            InternetGatewayId=default_igw,
+            VpcId=default_vpc_id,
+            DryRun=dry_run,
+        )
+
+        logging.info(f"Deleting Internet Gateway {default_igw}")
+        await delete("delete_internet_gateway", InternetGatewayId=default_igw)
+
+    logging.info(f"Deleting Default VPC {default_vpc_id}")
+    return await delete("delete_vpc", VpcId=default_vpc_id, DryRun=dry_run)
+
+
+async def reconcile_account(org, account: Account, new_account_id=None, journal=None):
+    """Asyncio version of reconcile.reconcile_account().
+
+    :param org: Instance of AsyncOrganization class
+    :param account: Instance of Account class
+    :param new_account_id: ID of an account that has just been created, we first
+                           wait until its role can be assumed
+    :param journal: Optional AccountJournal to record and skip completed steps
+    :return: ReconcileResult
+    """
+    with capture_result(org.org_session, account, new_account_id) as result:
+        if new_account_id is not None:
+            with api_metrics.context(step="wait_for_account_access"), tracer.span(
+                "wait_for_account_access"
+            ):
+                await org.wait_for_account_access(new_account_id)
+
+        with api_metrics.context(step="plan"), tracer.span("plan"):
+            plan = await org.plan_account(account, journal)
+        result.account_id = await apply_plan(org, plan, journal)
+
+    return result
+
+
+async def apply_plan(org, plan: AccountPlan, journal=None):
+    """Asyncio version of reconcile.apply_plan().
+
+    The default VPCs of all regions are deleted concurrently.
+
+    :param org: Instance of AsyncOrganization class
+    :param plan: Instance of AccountPlan class
+    :param journal: Optional AccountJournal to record completed steps in
+    :return: account_id
+    """
+    account = plan.account
+    account_id = plan.account_id
+
+    if not plan.has_changes:
+        logging.info(f"Account {account.full_name} ({account_id}) is up to date")
+
+    async def delete_default_vpc_in_region(region):
+        with tracer.span(f"delete_default_vpc:{region}", region=region):
+            await org.delete_default_vpc(account_id, region)
+        if journal:
+            journal.mark_done(f"delete_default_vpc:{region}")
+
+    for change in plan.changes:
+        with applying_change(change, account, account_id, journal):
+            if change.action == "delete_default_vpc":
+                await asyncio.gather(
+                    *(
+                        delete_default_vpc_in_region(region)
+                        for region in change.params["regions"]
+                    )
+                )
+            elif change.action == "create_account":
+                account_id = await apply_change(org, change, account, account_id)
+            else:
+                await apply_change(org, change, account, account_id)
+
+    return account_id
+
+
+async def reconcile_accounts_async(
+    org, accounts, workers=1, state=None, on_result=None
+):
+    """Reconcile all given accounts as asyncio tasks.
+
+    Works like reconcile.reconcile_accounts(), with at most workers accounts
+    being reconciled at the same time.
+
+    :param org: Instance of AsyncOrganization class
+    :param accounts: List of Account class instances
+    :param workers: Amount of accounts to reconcile at the same time
+    :param state: Optional StateStore to journal completed steps in
+    :param on_result: Optional callable called with the account and its
+                      ReconcileResult as soon as the account has finished
+    :return: List of ReconcileResult in the order of the given accounts
+    """
+    results = ResultCollector(accounts, on_result)
+    journals = [state.journal(account) if state else None for account in accounts]
+    slots = asyncio.Semaphore(workers)
+    tasks = {}
+
+    async def reconcile(index, new_account_id=None):
+        async with slots:
+            result = await reconcile_account(
+                org, accounts[index], new_account_id, journals[index]
+            )
+        results.add(index, result)
+
+    with tracer.span("lookup_accounts", "run"):
+        account_ids = await org.runner.run(
+            "organizations",
+            lambda: [
+                org.org_session.get_account_id(account.full_name)
+                for account in accounts
+            ],
+        )
+
+    missing = []
+    for index, account in enumerate(accounts):
+        if account_ids[index]:
+            tasks[index] = asyncio.create_task(reconcile(index))
+        else:
+            missing.append((index, account))
+
+    with api_metrics.context(step="create_account"):
+        try:
+            creation_start = monotonic()
+            create_requests, failed = await org.runner.run(
+                "organizations",
+                _get_create_requests,
+                org.org_session,
+                missing,
+                journals,
+            )
+            for index, result in failed.items():
+                results.add(index, result)
+
+            async for response in org.wait_for_create_account_requests(
+                list(create_requests)
+            ):
+                index = create_requests.pop(response["Id"])
+                failed = handle_create_status(
+                    response, accounts[index], journals[index], creation_start
+                )
+                if failed is not None:
+                    results.add(index, failed)
+                    continue
+
+                tasks[index] = asyncio.create_task(
+                    reconcile(index, response["AccountId"])
+                )
+        except Exception as e:
+            logging.exception("Failed to create new accounts")
+            results.fail([index for index, _ in missing if index not in tasks], e)
+
+    await asyncio.gather(*tasks.values())
+
+    return results.to_list()
+
+
+def reconcile_accounts(
+    org_session,
+    accounts,
+    workers=1,
+    state=None,
+    service_concurrency=None,
+    on_result=None,
+):
+    """Reconcile all given accounts on an asyncio event loop.
+
+    :param org_session: Instance of Organization class
+    :param accounts: List of Account class instances
+    :param workers: Amount of accounts to reconcile at the same time
+    :param state: Optional StateStore to journal completed steps in
+    :param service_concurrency: Dict of {service: calls in flight} overriding
+                                DEFAULT_SERVICE_CONCURRENCY
+    :param on_result: Optional callable called with the account and its
+                      ReconcileResult as soon as the account has finished
+    :return: List of ReconcileResult in the order of the given accounts
+    """
+    runner = AsyncRunner(service_concurrency)
+    try:
+        return asyncio.run(
+            reconcile_accounts_async(
+                AsyncOrganization(org_session, runner),
+                accounts,
+                workers,
+                state,
+                on_result,
+            )
+        )
+    finally:
+        runner.close()
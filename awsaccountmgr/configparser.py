@@ -7,106 +7,290 @@ import yaml
 import os
 from .account import Account
 
+# Use the libyaml based loader when available, it's an order of magnitude faster
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+CONFIG_FILE_EXTENSIONS = (".yml", ".yaml")
+
+SUPPORTED_KEYS = [
+    "OrganizationalUnitPath",
+    "Email",
+    "AccountFullName",
+    "DeleteDefaultVPC",
+    "AllowDirectMoveBetweenOU",
+    "AllowBilling",
+    "Alias",
+    "Tags",
+    "AlternateContacts",
+]
+
+
+class ConfigValidationError(ValueError):
+    """Raised when the configuration contains one or more errors."""
+
+    def __init__(self, errors):
+        """Initialize ConfigValidationError.
+
+        :param errors: List of error messages
+        """
+        self.errors = errors
+        super().__init__(
+            f"Found {len(errors)} error(s) in configuration:\n" + "\n".join(errors)
+        )
+
+
+def list_config_files(folder):
+    """Returns the sorted paths of the yaml files in the given folder."""
+    return sorted(
+        os.path.join(folder, filename)
+        for filename in os.listdir(folder)
+        if filename.lower().endswith(CONFIG_FILE_EXTENSIONS)
+        and os.path.isfile(os.path.join(folder, filename))
+    )
+
+
+def load_config_file(filename):
+    """Parse a single yaml configuration file.
+
+    :return: Tuple of (filename, config, error), error is None when parsing succeeded
+    """
+    try:
+        with open(filename, "r") as stream:
+            return filename, yaml.load(stream, Loader=YamlLoader), None
+    except (OSError, yaml.YAMLError) as e:
+        return filename, None, f"{filename}: Could not parse file: {e}"
+
+
+def iter_config_files(folder):
+    """Parse the configuration files in the given folder one by one.
+
+    The files are parsed on the calling thread, the yaml loaders hold the GIL so
+    parsing on multiple threads isn't any faster.
+
+    :param folder: Folder containing config files
+
+    :return: Generator of (filename, config, error) tuples in file name order
+    """
+    for filename in list_config_files(folder):
+        yield load_config_file(filename)
+
+
+def iter_accounts(folder):
+    """Validate all configuration files, then yield their Account objects.
+
+    All files are validated in a single pass before the first account is
+    yielded, so every error in the configuration is reported at once.
+
+    :param folder: Folder containing config files
+    :raises ConfigValidationError: When the configuration contains errors
+
+    :return: Generator of Account objects
+    """
+    errors = []
+    account_configs = []
+
+    for filename, config, error in iter_config_files(folder):
+        if error is not None:
+            errors.append(error)
+            continue
+
+        if not isinstance(config, dict) or "Accounts" not in config:
+            errors.append(f"{filename}: Missing Accounts key in configuration")
+            continue
+
+        errors.extend(
+            f"{filename}: {error}" for error in get_config_errors(config["Accounts"])
+        )
+        if isinstance(config["Accounts"], list):
+            account_configs.extend(
+                (filename, account)
+                for account in config["Accounts"]
+                if isinstance(account, dict)
+            )
+
+    errors.extend(get_duplicate_errors(account_configs))
+
+    if errors:
+        raise ConfigValidationError(errors)
+
+    for _, account in account_configs:
+        yield Account.load_from_config(account)
+
 
 def read_config_files(folder):
     """Retrieve account objects from yaml configuration files in given folder.
 
     :param folder: Folder containing config files
+    :raises ConfigValidationError: When the configuration contains errors
 
-    :return: list of tuples [(full_account_name, email, ou_path), ]
+    :return: list of Account objects
     """
-    files = [os.path.join(folder, f) for f in os.listdir(folder)]
+    return list(iter_accounts(folder))
 
-    accounts = []
-    for filename in files:
-        with open(filename, "r") as stream:
-            config = yaml.safe_load(stream)
 
-            validate_config(config["Accounts"])
+def get_duplicate_errors(account_configs):
+    """Check that account names, emails and aliases are unique across all files.
 
-            for account in config["Accounts"]:
-                accounts.append(Account.load_from_config(account))
+    The alias of an account defaults to its name, accounts with Alias set to
+    False have no alias. Two default aliases can only clash when the account
+    names are duplicates, which is already reported, so only clashes involving
+    an explicit alias are reported.
 
-    return accounts
+    :param account_configs: List of (filename, account config) tuples
+    :return: List of error messages
+    """
+    errors = []
+    seen = {"AccountFullName": {}, "Email": {}}
+    # {alias: [(filename, explicit), ...]} of every account using the alias
+    aliases = {}
+
+    for filename, account in account_configs:
+        if "AccountFullName" not in account or "Email" not in account:
+            continue
+
+        name = str(account["AccountFullName"]).strip()
+        values = {
+            "AccountFullName": name,
+            "Email": str(account["Email"]).strip().lower(),
+        }
+        for key, value in values.items():
+            if value not in seen[key]:
+                seen[key][value] = filename
+            else:
+                errors.append(
+                    f"{filename}: Duplicate {key} {value}, "
+                    f"already defined in {seen[key][value]}"
+                )
+
+        alias = account.get("Alias")
+        if alias is False:
+            continue
+
+        alias = str(alias).strip() if alias else name
+        explicit = alias != name
+        clashes = [
+            other_filename
+            for other_filename, other_explicit in aliases.get(alias, [])
+            if explicit or other_explicit
+        ]
+        if clashes:
+            errors.append(
+                f"{filename}: Duplicate Alias {alias}, already defined in {clashes[0]}"
+            )
+        aliases.setdefault(alias, []).append((filename, explicit))
+
+    return errors
 
 
 def validate_config(configuration):
-    """Validate configuration."""
-    supported_keys = [
-        "OrganizationalUnitPath",
-        "Email",
-        "AccountFullName",
-        "DeleteDefaultVPC",
-        "AllowDirectMoveBetweenOU",
-        "AllowBilling",
-        "Alias",
-        "Tags",
-        "AlternateContacts",
-    ]
+    """Validate configuration.
+
+    :raises ConfigValidationError: With all errors found in the configuration
+    """
+    errors = get_config_errors(configuration)
+    if errors:
+        raise ConfigValidationError(errors)
+
+
+def get_config_errors(configuration):
+    """Validate configuration and return a list of all errors found."""
+    errors = []
 
     if not isinstance(configuration, list):
-        raise ValueError(f"Configuration invalid: {configuration}")
+        return [f"Configuration invalid: {configuration}"]
 
     for account in configuration:
+        if not isinstance(account, dict):
+            errors.append(f"Configuration invalid: {account}")
+            continue
 
         # Mandatory parameters
         if "AccountFullName" not in account:
-            raise ValueError(f"Missing AccountFullName in configuration: {account}")
+            errors.append(f"Missing AccountFullName in configuration: {account}")
+            continue
         if "OrganizationalUnitPath" not in account:
-            raise ValueError(
-                f"Missing OrganizationalUnitPath in configuration: {account}"
-            )
+            errors.append(f"Missing OrganizationalUnitPath in configuration: {account}")
         if "Email" not in account:
-            raise ValueError(f"Missing Email in configuration: {account}")
+            errors.append(f"Missing Email in configuration: {account}")
 
         # Optional parameters
         if "DeleteDefaultVPC" in account and not isinstance(
             account["DeleteDefaultVPC"], bool
         ):
-            raise ValueError(
+            errors.append(
                 f'{account["AccountFullName"]} DeleteDefaultVPC param should be Boolean'
             )
 
         if "AllowDirectMoveBetweenOU" in account and not isinstance(
             account["AllowDirectMoveBetweenOU"], bool
         ):
-            raise ValueError(
+            errors.append(
                 f'{account["AccountFullName"]} AllowDirectMoveBetweenOU param should be Boolean'
             )
 
         if "AllowBilling" in account and not isinstance(account["AllowBilling"], bool):
-            raise ValueError(
+            errors.append(
                 f'{account["AccountFullName"]} AllowBilling param should be Boolean'
             )
 
-        if "Alias" in account and not isinstance(account["Alias"], str):
-            raise ValueError(
-                f'{account["AccountFullName"]} Alias param should be String'
+        if (
+            "Alias" in account
+            and account["Alias"] is not False
+            and not isinstance(account["Alias"], str)
+        ):
+            errors.append(
+                f'{account["AccountFullName"]} Alias param should be String or False'
             )
 
         if "AlternateContacts" in account:
             if not isinstance(account["AlternateContacts"], dict):
-                raise ValueError(
+                errors.append(
                     f'{account["AlternateContacts"]} AlternateContacts param should be a dict'
                 )
-            for contact_type, contact_value in account["AlternateContacts"].items():
-                if not isinstance(contact_value, dict):
-                    raise ValueError(
-                        f"AlternateContacts {contact_type} should be a dict but found {contact_value}"
-                    )
+            else:
+                for contact_type, contact_value in account["AlternateContacts"].items():
+                    if not isinstance(contact_value, dict):
+                        errors.append(
+                            f"AlternateContacts {contact_type} should be a dict but found {contact_value}"
+                        )
 
         if "Tags" in account:
-            if not isinstance(account["Tags"], list):
-                raise ValueError(
-                    f'{account["AccountFullName"]} Tags param should be a List'
-                )
-            for tag in account["Tags"]:
-                if not isinstance(tag, dict):
-                    raise ValueError(
-                        f'{account["AccountFullName"]} Tags should be a Dict but found {tag}'
-                    )
+            errors.extend(_get_tag_errors(account))
 
         # Invalid parameters
         for key in account:
-            if key not in supported_keys:
-                raise ValueError(f"Key {key} not supported in configuration: {account}")
+            if key not in SUPPORTED_KEYS:
+                errors.append(f"Key {key} not supported in configuration: {account}")
+
+    return errors
+
+
+def _get_tag_errors(account):
+    """Validate the Tags param of a single account configuration."""
+    if isinstance(account["Tags"], dict):
+        tags = [account["Tags"]]
+    elif isinstance(account["Tags"], list):
+        tags = account["Tags"]
+    else:
+        return [f'{account["AccountFullName"]} Tags param should be a Dict or a List']
+
+    errors = []
+    tag_keys = set()
+    for tag in tags:
+        if not isinstance(tag, dict):
+            errors.append(
+                f'{account["AccountFullName"]} Tags should be a Dict but found {tag}'
+            )
+            continue
+        for key, value in tag.items():
+            if isinstance(value, (dict, list)) or value is None:
+                errors.append(
+                    f'{account["AccountFullName"]} Tag {key} should have a single value'
+                )
+            if key in tag_keys:
+                errors.append(
+                    f'{account["AccountFullName"]} Tag {key} is defined more than once'
+                )
+            tag_keys.add(key)
+
+    return errors
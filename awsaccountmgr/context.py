@@ -0,0 +1,24 @@
+"""Carry the context of the caller over to worker threads.
+
+The metrics labels of api_metrics.context() and the current span of the tracer
+are kept in contextvars. Threads of a pool don't inherit the context of the
+thread submitting the work, and asyncio only copies it into tasks, so work
+handed to a thread is bound to the context of the caller with bind_context().
+"""
+import contextvars
+
+
+def bind_context(function):
+    """Returns a function that runs in the context of the caller of bind_context.
+
+    Every call runs in its own copy of that context, so the function can be
+    called from several threads at the same time.
+
+    :param function: The function to run in a worker thread
+    """
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
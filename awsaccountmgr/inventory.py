@@ -0,0 +1,339 @@
+"""Export an inventory of all accounts in the organization.
+
+The OU tree is crawled and the accounts of every OU are listed page by page.
+Details that take a call per account, like tags, aliases and alternate contacts,
+are retrieved concurrently for a bounded window of accounts. Records are written
+as soon as they are complete, so memory use doesn't grow with the size of the
+organization. Only the requested fields are retrieved.
+
+The same inventory is used to import an existing organization, by writing the
+configuration files that describe its current state.
+"""
+import csv
+import json
+import logging
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+import yaml
+from .account import Account
+from .configparser import (
+    ConfigValidationError,
+    get_config_errors,
+    get_duplicate_errors,
+    iter_config_files,
+)
+from .metrics import api_metrics
+
+# Fields of an inventory record, in the order of the CSV columns
+FIELDS = (
+    "Id",
+    "Name",
+    "Email",
+    "Status",
+    "JoinedMethod",
+    "JoinedTimestamp",
+    "ParentId",
+    "OrganizationalUnitPath",
+    "Tags",
+    "Alias",
+    "AlternateContacts",
+)
+
+# Fields that need one or more API calls per account
+DETAIL_FIELDS = ("Tags", "Alias", "AlternateContacts")
+
+
+def parse_fields(fields):
+    """Returns the list of fields from a comma separated string, all fields if empty.
+
+    :raises ValueError: When an unknown field is given
+    """
+    if not fields:
+        return list(FIELDS)
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s) {', '.join(unknown)}, choose from {', '.join(FIELDS)}"
+        )
+
+    return selected
+
+
+def _get_details(org_session, account, fields):
+    """Returns the fields of an account that need API calls of their own."""
+    details = {}
+    account_id = account["Id"]
+
+    with api_metrics.context(account=account["Name"], step="export"):
+        if "Tags" in fields:
+            details["Tags"] = org_session.get_account_tags(account_id)
+
+        if "Alias" in fields:
+            aliases = org_session.get_account_aliases(account_id)
+            details["Alias"] = aliases[0] if aliases else None
+            # The IAM client of a member account isn't used again, release it to
+            # keep memory use flat for large organizations
+            org_session.remove_account_clients(account_id)
+
+        if "AlternateContacts" in fields:
+            details["AlternateContacts"] = {
+                contact_type.capitalize(): contact.to_config()
+                for contact_type, contact in org_session.get_alternate_contacts(
+                    account_id
+                ).items()
+                if contact is not None
+            }
+
+    return details
+
+
+def iter_accounts(org_session, fields=FIELDS, workers=8):
+    """Yields an inventory record for every account in the organization.
+
+    Records are yielded in the order their details are complete. Accounts
+    whose details can't be retrieved, for instance because the role can't be
+    assumed in a suspended account, are yielded with those fields set to None
+    and the error under 'Error'.
+
+    :param org_session: Instance of Organization class
+    :param fields: The fields to include in the records, see FIELDS
+    :param workers: Amount of accounts to retrieve the details of at the same time
+    :return: Generator of dicts
+    """
+    detail_fields = [field for field in fields if field in DETAIL_FIELDS]
+
+    def to_record(account, ou_id, details=None, error=None):
+        values = dict(
+            account,
+            ParentId=ou_id,
+            OrganizationalUnitPath=org_session.ou_tree.get_path(ou_id),
+            **(details or {}),
+        )
+        record = {field: values.get(field) for field in fields}
+        if error is not None:
+            record["Error"] = str(error)
+        return record
+
+    def accounts():
+        for ou_id in org_session.ou_tree.crawl():
+            for account in org_session.iter_accounts_for_parent(ou_id):
+                yield account, ou_id
+
+    if not detail_fields:
+        for account, ou_id in accounts():
+            yield to_record(account, ou_id)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+
+        def completed(futures):
+            for future in futures:
+                account, ou_id = pending.pop(future)
+                try:
+                    yield to_record(account, ou_id, future.result())
+                except Exception as e:
+                    logging.warning(
+                        f"Failed to retrieve details of account {account['Name']}: {e}"
+                    )
+                    yield to_record(account, ou_id, error=e)
+
+        for account, ou_id in accounts():
+            future = executor.submit(_get_details, org_session, account, detail_fields)
+            pending[future] = (account, ou_id)
+
+            # Only keep a window of accounts in memory
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from completed(done)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from completed(done)
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonLinesWriter:
+    """Write records as one JSON object per line."""
+
+    def __init__(self, stream, fields):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, default=_to_json) + "\n")
+
+
+class CsvWriter:
+    """Write records as CSV rows, nested values are written as JSON."""
+
+    def __init__(self, stream, fields):
+        self._writer = csv.DictWriter(
+            stream, fieldnames=list(fields) + ["Error"], extrasaction="ignore"
+        )
+        self._writer.writeheader()
+
+    @staticmethod
+    def _to_cell(value):
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=_to_json)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def write(self, record):
+        self._writer.writerow(
+            {field: self._to_cell(value) for field, value in record.items()}
+        )
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}
+
+
+def export_accounts(
+    org_session, stream, output_format="jsonl", fields=FIELDS, workers=8
+):
+    """Write the inventory of all accounts to a stream.
+
+    :param org_session: Instance of Organization class
+    :param stream: Text stream to write to, eg. sys.stdout or an opened file
+    :param output_format: Either 'jsonl' or 'csv'
+    :param fields: The fields to include, see FIELDS
+    :param workers: Amount of accounts to retrieve the details of at the same time
+    :return: Tuple of (amount of accounts written, amount of accounts with errors)
+    """
+    writer = WRITERS[output_format](stream, fields)
+    written = 0
+    failed = 0
+
+    for record in iter_accounts(org_session, fields, workers):
+        writer.write(record)
+        written += 1
+        if "Error" in record:
+            failed += 1
+
+    return written, failed
+
+
+# Fields needed to describe an account in a configuration file
+IMPORT_FIELDS = (
+    "Name",
+    "Email",
+    "OrganizationalUnitPath",
+    "Tags",
+    "Alias",
+    "AlternateContacts",
+)
+
+
+def to_account(record):
+    """Returns the Account matching the current state of an inventory record.
+
+    The tags are always managed. The alias is only managed when the account
+    has one, so applying the configuration doesn't change the account.
+    """
+    config = {
+        "AccountFullName": record["Name"],
+        "OrganizationalUnitPath": record["OrganizationalUnitPath"],
+        "Email": record["Email"],
+        "Alias": record["Alias"] or False,
+        "Tags": record["Tags"],
+    }
+    if record["AlternateContacts"]:
+        config["AlternateContacts"] = record["AlternateContacts"]
+
+    return Account.load_from_config(config)
+
+
+def get_config_filename(ou_path):
+    """Returns the configuration file name for the accounts in an OU path.
+
+    Accounts are grouped by their top-level OU, accounts in the root OU are
+    written to root.yml.
+    """
+    top_level_ou = ou_path.strip("/").split("/")[0] or "root"
+    return re.sub(r"[^\w.-]+", "-", top_level_ou) + ".yml"
+
+
+def import_accounts(org_session, folder, workers=8, overwrite=False):
+    """Write configuration files describing the current state of all accounts.
+
+    Accounts whose details can't be retrieved are left out, so they are not
+    managed when the configuration is applied.
+
+    :param org_session: Instance of Organization class
+    :param folder: The folder to write the configuration files to
+    :param workers: Amount of accounts to retrieve the details of at the same time
+    :param overwrite: Set this to True to replace existing configuration files
+    :raises FileExistsError: When a configuration file exists and overwrite is False
+    :raises ConfigValidationError: When the configuration would be invalid, eg.
+                                   because AWS allows duplicate account names.
+                                   No files are written then.
+    :return: Tuple of (dict of {filename: amount of accounts}, amount of accounts left out)
+    """
+    files = {}
+    failed = 0
+
+    for record in iter_accounts(org_session, IMPORT_FIELDS, workers):
+        if "Error" in record:
+            failed += 1
+            continue
+
+        filename = get_config_filename(record["OrganizationalUnitPath"])
+        files.setdefault(filename, []).append(to_account(record).to_config())
+
+    paths = {filename: os.path.join(folder, filename) for filename in files}
+    if not overwrite:
+        existing = [path for path in paths.values() if os.path.exists(path)]
+        if existing:
+            raise FileExistsError(
+                f"Configuration file(s) {', '.join(existing)} already exist"
+            )
+
+    # Make sure the files are accepted when they are applied, before writing them
+    errors = [
+        f"{paths[filename]}: {error}"
+        for filename, accounts in sorted(files.items())
+        for error in get_config_errors(accounts)
+    ]
+    account_configs = [
+        (paths[filename], account)
+        for filename, accounts in sorted(files.items())
+        for account in accounts
+    ]
+    if os.path.isdir(folder):
+        # Configuration files that are kept are applied together with the new ones
+        for path, config, error in iter_config_files(folder):
+            if path not in paths.values() and isinstance(config, dict):
+                accounts = config.get("Accounts")
+                if isinstance(accounts, list):
+                    account_configs.extend(
+                        (path, account)
+                        for account in accounts
+                        if isinstance(account, dict)
+                    )
+    errors.extend(get_duplicate_errors(account_configs))
+    if errors:
+        raise ConfigValidationError(errors)
+
+    os.makedirs(folder, exist_ok=True)
+    for filename, accounts in sorted(files.items()):
+        accounts.sort(key=lambda account: account["AccountFullName"])
+        with open(paths[filename], "w") as stream:
+            yaml.safe_dump(
+                {"Accounts": accounts},
+                stream,
+                sort_keys=False,
+                default_flow_style=False,
+                allow_unicode=True,
+            )
+
+    return {filename: len(accounts) for filename, accounts in files.items()}, failed
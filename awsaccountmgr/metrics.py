@@ -0,0 +1,301 @@
+"""Instrumentation of AWS API calls.
+
+Every client created through the session registry reports its calls to the
+ApiMetrics instance. Call count, errors, attempts, throttles and latency are
+recorded per operation, and call count and latency also per account and per
+reconcile step. The account and step are taken from the context set with
+api_metrics.context() in the code making the calls.
+
+At the end of a run the metrics can be written as a JSON report and as a
+Prometheus textfile for the node exporter textfile collector.
+"""
+import contextvars
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import monotonic, time
+from .ratelimit import THROTTLING_ERROR_CODES
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_labels = contextvars.ContextVar("awsaccountmgr_metrics_labels", default={})
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+
+    def to_dict(self):
+        return {
+            "Count": self.count,
+            "Sum": round(self.sum, 6),
+            "Max": round(self.max, 6),
+            "Buckets": {
+                str(bound): count for bound, count in zip(self.buckets, self.counts)
+            },
+        }
+
+
+class OperationMetrics:
+    """Counters of a single service operation."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.attempts = 0
+        self.throttles = 0
+        self.latency = LatencyHistogram()
+
+    @property
+    def retries(self):
+        return self.attempts - self.calls
+
+    def to_dict(self):
+        return {
+            "Calls": self.calls,
+            "Errors": dict(self.errors),
+            "Attempts": self.attempts,
+            "Retries": self.retries,
+            "Throttles": self.throttles,
+            "Latency": self.latency.to_dict(),
+        }
+
+
+class ApiMetrics:
+    """Thread-safe collection of AWS API call metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time()
+        self.operations = {}
+        self.accounts = {}
+        self.steps = {}
+
+    @contextmanager
+    def context(self, **labels):
+        """Attribute the API calls made within this block to an account or step.
+
+        Contexts can be nested, the labels of the outer context are kept unless
+        they are overridden, eg.
+
+            with api_metrics.context(account="my-account"):
+                with api_metrics.context(step="move_account"):
+                    ...
+
+        :param labels: The account and/or step to attribute calls to
+        """
+        token = _labels.set(dict(_labels.get(), **labels))
+        try:
+            yield
+        finally:
+            _labels.reset(token)
+
+    def record(self, name, duration, attempts=1, throttles=0, error_code=None):
+        """Record a finished API call.
+
+        :param name: Name of the operation, eg. 'organizations.MoveAccount'
+        :param duration: Seconds spent on the call, including retries
+        :param attempts: Amount of requests sent for the call
+        :param throttles: Amount of attempts that were throttled
+        :param error_code: The error code the call failed with, None on success
+        """
+        labels = _labels.get()
+
+        with self._lock:
+            if name not in self.operations:
+                self.operations[name] = OperationMetrics()
+            operation = self.operations[name]
+            operation.calls += 1
+            operation.attempts += max(1, attempts)
+            operation.throttles += throttles
+            operation.latency.observe(duration)
+            if error_code is not None:
+                operation.errors[error_code] = operation.errors.get(error_code, 0) + 1
+
+            for key, totals in (("account", self.accounts), ("step", self.steps)):
+                if labels.get(key) is None:
+                    continue
+                total = totals.setdefault(
+                    labels[key], {"Calls": 0, "Throttles": 0, "Seconds": 0.0}
+                )
+                total["Calls"] += 1
+                total["Throttles"] += throttles
+                total["Seconds"] += duration
+
+    def register(self, client):
+        """Record all calls made by the given client."""
+        service = client.meta.service_model.service_id.hyphenize()
+
+        def before_call(context, **kwargs):
+            context["metrics_start"] = monotonic()
+            context["metrics_attempts"] = 0
+            context["metrics_throttles"] = 0
+
+        def response_received(context, parsed_response, **kwargs):
+            context["metrics_attempts"] = context.get("metrics_attempts", 0) + 1
+            error_code = (parsed_response or {}).get("Error", {}).get("Code")
+            if error_code in THROTTLING_ERROR_CODES:
+                context["metrics_throttles"] = context.get("metrics_throttles", 0) + 1
+
+        def record_call(context, operation_name, error_code):
+            if "metrics_start" not in context:
+                return
+            self.record(
+                f"{service}.{operation_name}",
+                monotonic() - context.pop("metrics_start"),
+                context.get("metrics_attempts", 1),
+                context.get("metrics_throttles", 0),
+                error_code,
+            )
+
+        def after_call(http_response, parsed, model, context, **kwargs):
+            error_code = None
+            if http_response.status_code >= 300:
+                error_code = parsed.get("Error", {}).get("Code") or str(
+                    http_response.status_code
+                )
+            record_call(context, model.name, error_code)
+
+        def after_call_error(exception, context, event_name, **kwargs):
+            # Event names are formatted as after-call-error.<service>.<operation>
+            operation_name = event_name.rsplit(".", 1)[-1]
+            record_call(context, operation_name, type(exception).__name__)
+
+        client.meta.events.register(f"before-call.{service}", before_call)
+        client.meta.events.register(f"response-received.{service}", response_received)
+        client.meta.events.register(f"after-call.{service}", after_call)
+        client.meta.events.register(f"after-call-error.{service}", after_call_error)
+
+    def report(self):
+        """Returns all metrics as a JSON serializable dict."""
+        with self._lock:
+            return {
+                "Started": self.started,
+                "Duration": round(time() - self.started, 3),
+                "Operations": {
+                    name: operation.to_dict()
+                    for name, operation in sorted(self.operations.items())
+                },
+                "Accounts": _round_totals(self.accounts),
+                "Steps": _round_totals(self.steps),
+            }
+
+    def format_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        report = self.report()
+        lines = [
+            "# HELP awsaccountmgr_run_duration_seconds Duration of the run.",
+            "# TYPE awsaccountmgr_run_duration_seconds gauge",
+            f"awsaccountmgr_run_duration_seconds {report['Duration']}",
+        ]
+
+        counters = (
+            ("api_calls_total", "AWS API calls.", "Calls"),
+            ("api_attempts_total", "AWS API requests including retries.", "Attempts"),
+            ("api_retries_total", "Retried AWS API requests.", "Retries"),
+            ("api_throttles_total", "Throttled AWS API requests.", "Throttles"),
+        )
+        for metric, description, key in counters:
+            lines.append(f"# HELP awsaccountmgr_{metric} {description}")
+            lines.append(f"# TYPE awsaccountmgr_{metric} counter")
+            for name, operation in report["Operations"].items():
+                lines.append(
+                    f"awsaccountmgr_{metric}{{{_operation_labels(name)}}} {operation[key]}"
+                )
+
+        lines.append("# HELP awsaccountmgr_api_errors_total Failed AWS API calls.")
+        lines.append("# TYPE awsaccountmgr_api_errors_total counter")
+        for name, operation in report["Operations"].items():
+            for error_code, count in sorted(operation["Errors"].items()):
+                labels = f'{_operation_labels(name)},error="{_escape(error_code)}"'
+                lines.append(f"awsaccountmgr_api_errors_total{{{labels}}} {count}")
+
+        metric = "awsaccountmgr_api_call_duration_seconds"
+        lines.append(f"# HELP {metric} Duration of AWS API calls including retries.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, operation in report["Operations"].items():
+            labels = _operation_labels(name)
+            latency = operation["Latency"]
+            for bound, count in latency["Buckets"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {latency["Count"]}')
+            lines.append(f"{metric}_sum{{{labels}}} {latency['Sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {latency['Count']}")
+
+        for label, key in (("account", "Accounts"), ("step", "Steps")):
+            for metric, description, total_key in (
+                ("api_calls_total", "AWS API calls", "Calls"),
+                ("api_throttles_total", "Throttled AWS API requests", "Throttles"),
+                ("api_seconds_total", "Seconds spent in AWS API calls", "Seconds"),
+            ):
+                name = f"awsaccountmgr_{label}_{metric}"
+                lines.append(f"# HELP {name} {description} per {label}.")
+                lines.append(f"# TYPE {name} counter")
+                for value, total in sorted(report[key].items()):
+                    lines.append(
+                        f'{name}{{{label}="{_escape(value)}"}} '
+                        f"{round(total[total_key], 6)}"
+                    )
+
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """Write the metrics report as JSON to the given path."""
+        _write_atomic(path, json.dumps(self.report(), indent=2) + "\n")
+
+    def write_prometheus(self, path):
+        """Write the metrics to a Prometheus textfile at the given path.
+
+        The file is replaced atomically so the textfile collector never reads a
+        partially written file.
+        """
+        _write_atomic(path, self.format_prometheus())
+
+    def clear(self):
+        with self._lock:
+            self.started = time()
+            self.operations.clear()
+            self.accounts.clear()
+            self.steps.clear()
+
+
+def _round_totals(totals):
+    return {
+        name: dict(total, Seconds=round(total["Seconds"], 6))
+        for name, total in totals.items()
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _operation_labels(name):
+    service, operation = name.split(".", 1)
+    return f'service="{_escape(service)}",operation="{_escape(operation)}"'
+
+
+def _write_atomic(path, content):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as stream:
+        stream.write(content)
+    os.replace(temporary_path, path)
+
+
+api_metrics = ApiMetrics()
@@ -1,29 +1,261 @@
 #!/usr/bin/env python3
-import boto3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
-from .sts import create_boto3_client
+from .context import bind_context
+from .ratelimit import rate_limiter
+from .retry import NEW_ACCOUNT_ERROR_CODES, RetryPolicy, retry_policy
+from .session import registry
+from .sts import assume_role, create_boto3_client, remove_role_clients
 from .account import Account, AlternateContact
 
 
+class OrganizationalUnitTree:
+    """Cached view of the organizational unit hierarchy.
+
+    The children of an OU are retrieved from the API once, the first time a path
+    through that OU is resolved. Resolving many paths that share the same parents
+    therefore costs about one API call per OU instead of one per path segment.
+    """
+
+    def __init__(self, root_ou_id, list_children):
+        """Initialize the OU tree.
+
+        :param root_ou_id: The ID of the root Organizational Unit
+        :param list_children: Callable returning the list of child OUs of a given parent ID
+        """
+        self.root_ou_id = root_ou_id
+        self._list_children = list_children
+        self._lock = threading.RLock()
+        self.invalidate()
+
+    @staticmethod
+    def normalize_path(ou_path):
+        """Returns the canonical form of an OU path.
+
+        Both '/us/dev', 'us/dev/' and 'us//dev' result in '/us/dev'. The root OU
+        is represented by '/'.
+        """
+        return "/" + "/".join(name for name in ou_path.strip().split("/") if name)
+
+    def invalidate(self):
+        """Drop all cached OUs so they are retrieved from the API again."""
+        with self._lock:
+            self._children = {}
+            self._path_to_id = {"/": self.root_ou_id}
+            self._id_to_path = {self.root_ou_id: "/"}
+
+    def _get_children(self, parent_id):
+        """Returns a dict of {name: ou_id} for the child OUs of parent_id."""
+        with self._lock:
+            if parent_id not in self._children:
+                parent_path = self._id_to_path[parent_id].rstrip("/")
+                children = {}
+
+                for ou in self._list_children(parent_id):
+                    children[ou["Name"]] = ou["Id"]
+                    path = f"{parent_path}/{ou['Name']}"
+                    self._path_to_id[path] = ou["Id"]
+                    self._id_to_path[ou["Id"]] = path
+
+                self._children[parent_id] = children
+
+            return self._children[parent_id]
+
+    def get_id(self, ou_path):
+        """Retrieve the ID of the OU at the given path.
+
+        :param ou_path: Path of the OU in slash notation (eg. us/dev) or the root ID
+        :return: ou_id
+        """
+        if ou_path.strip() == self.root_ou_id:
+            return self.root_ou_id
+
+        path = self.normalize_path(ou_path)
+
+        with self._lock:
+            if path in self._path_to_id:
+                return self._path_to_id[path]
+
+            ou_id = self.root_ou_id
+            for name in path.strip("/").split("/"):
+                children = self._get_children(ou_id)
+
+                if name not in children:
+                    raise ValueError(
+                        f"Could not find ou with name {name} of path {ou_path} "
+                        f"in OU list {list(children)}."
+                    )
+                ou_id = children[name]
+
+            return ou_id
+
+    def get_path(self, ou_id):
+        """Retrieve the path of the OU with the given ID.
+
+        Crawls the full tree if the OU has not been seen yet.
+
+        :param ou_id: ID of the organizational unit
+        :return: ou_path in '/a/b' notation
+        """
+        with self._lock:
+            if ou_id not in self._id_to_path:
+                self.crawl()
+
+            if ou_id not in self._id_to_path:
+                raise ValueError(f"Could not find ou with id {ou_id}.")
+
+            return self._id_to_path[ou_id]
+
+    def crawl(self):
+        """Retrieve the full OU tree breadth-first starting at the root OU.
+
+        :return: List of all OU IDs (including the root) in breadth-first order
+        """
+        ou_ids = []
+        queue = deque([self.root_ou_id])
+
+        while queue:
+            ou_id = queue.popleft()
+            ou_ids.append(ou_id)
+            queue.extend(self._get_children(ou_id).values())
+
+        return ou_ids
+
+    @property
+    def path_to_id(self):
+        """Dict of all OU paths resolved so far to their ID."""
+        with self._lock:
+            return dict(self._path_to_id)
+
+    @property
+    def id_to_path(self):
+        """Dict of all OU IDs resolved so far to their path."""
+        with self._lock:
+            return dict(self._id_to_path)
+
+
+class CreateAccountPoller:
+    """Bookkeeping of create account requests that are polled until completed.
+
+    The poller decides which requests to describe in a round and how long to wait
+    before the next, see Organization.wait_for_create_account_requests(). Making
+    the calls and waiting is left to the caller, so both backends share it.
+    """
+
+    def __init__(self, request_ids, poll_interval=1, max_poll_interval=16):
+        """Initialize CreateAccountPoller.
+
+        :param request_ids: Iterable of CreateAccountRequestIds
+        :param poll_interval: Initial seconds to wait between polling rounds
+        :param max_poll_interval: Maximum seconds to wait between polling rounds
+        """
+        self.in_progress = list(request_ids)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._interval = poll_interval
+        self._completed_in_round = False
+
+    def to_describe(self, running):
+        """Returns the requests to describe in this round.
+
+        :param running: Set of the request IDs that are listed as in progress
+        """
+        return [
+            request_id for request_id in self.in_progress if request_id not in running
+        ]
+
+    def complete(self, status):
+        """Returns True if the described request succeeded or failed.
+
+        :param status: CreateAccountStatus dict of a described request
+        """
+        if status["State"] == "IN_PROGRESS":
+            return False
+
+        self.in_progress.remove(status["Id"])
+        self._completed_in_round = True
+        return True
+
+    def next_interval(self):
+        """Returns the seconds to wait before the next round."""
+        if self._completed_in_round:
+            self._interval = self.poll_interval
+            self._completed_in_round = False
+
+        interval = self._interval
+        self._interval = min(interval * 2, self.max_poll_interval)
+        return interval
+
+
 class Organization:
     """Interact with AWS Organization API."""
 
-    def __init__(self, root_ou_id, credentials):
+    # Maximum amount of tags per tag_resource and untag_resource call
+    MAX_TAGS_PER_CALL = 50
+
+    CONTACT_TYPES = ("BILLING", "OPERATIONS", "SECURITY")
+
+    # Maximum amount of accounts returned per list_accounts_for_parent call
+    ACCOUNTS_PER_PAGE = 20
+
+    def __init__(self, root_ou_id, credentials, expected_parent_lookups=None):
         """Initialise the boto3 organisation session.
 
-        :param org_client: A 'organizations' boto3 client in the Master account
         :param root_ou_id: The ID of the root Organizational Unit
-        :param credentials: Tuple of (key, secret, token) of the master account
+        :param credentials: Tuple of (key, secret, token) of the master account, or
+                            a callable returning the current ones. The callable is
+                            called on every use, so credentials that expire during
+                            the run can be refreshed, eg. through assume_role
+        :param expected_parent_lookups: The amount of accounts whose parent OU will be
+                                        looked up, if known. When this takes fewer
+                                        calls than building the parent map of the
+                                        whole organization, eg. for a shard of the
+                                        accounts, parents are looked up per account
         """
-        self._master_credentials = credentials
+        self._get_master_credentials = (
+            credentials if callable(credentials) else lambda: credentials
+        )
         self.root_ou_id = root_ou_id
 
-        self._org_client = create_boto3_client(
-            self.get_master_account_id(), "organizations", self._master_credentials
+        # Lookup tables for the organization accounts, filled from a single
+        # list_accounts pass on first use. See _get_account_index()
+        self._account_index = None
+        self._account_index_lock = threading.Lock()
+
+        self.ou_tree = OrganizationalUnitTree(
+            root_ou_id, self.list_organizational_units_for_parent
         )
 
-        self._account_client = create_boto3_client(
-            self.get_master_account_id(), "account", self._master_credentials
+        # Map of account_id to parent OU id, see _get_account_parents()
+        self._account_parents = None
+        self._account_parents_lock = threading.Lock()
+        self.expected_parent_lookups = expected_parent_lookups
+
+        # IDs of the accounts created in this run, see add_created_account()
+        self.created_account_ids = set()
+
+        self.master_account_id = self.get_master_account_id()
+
+    # The master credentials and clients are looked up on every use instead of
+    # once, so the credential cache refreshes them before they expire. Both
+    # lookups are served from the credential cache and the client registry.
+
+    @property
+    def _master_credentials(self):
+        return self._get_master_credentials()
+
+    @property
+    def _org_client(self):
+        return create_boto3_client(
+            self.master_account_id, "organizations", self._master_credentials
+        )
+
+    @property
+    def _account_client(self):
+        return create_boto3_client(
+            self.master_account_id, "account", self._master_credentials
         )
 
     def list_organizational_units_for_parent(self, parent_ou):
@@ -37,6 +269,17 @@ class Organization:
         ]
         return organizational_units
 
+    def iter_accounts_for_parent(self, parent_ou):
+        """Yields the accounts directly under the given parent, page by page."""
+        for page in self._org_client.get_paginator("list_accounts_for_parent").paginate(
+            ParentId=parent_ou
+        ):
+            yield from page["Accounts"]
+
+    def list_accounts_for_parent(self, parent_ou):
+        """Returns a list of accounts directly under the given parent."""
+        return list(self.iter_accounts_for_parent(parent_ou))
+
     def list_accounts(self):
         """Retrieves all accounts in organization."""
         existing_accounts = [
@@ -46,51 +289,164 @@ class Organization:
         ]
         return existing_accounts
 
+    @staticmethod
+    def _add_to_account_index(index, account):
+        """Add a single account description to the given account index."""
+        index["id"][account["Id"]] = account
+        index["name"][account["Name"].strip()] = account
+        index["email"][account["Email"].strip().lower()] = account
+
+    def _get_account_index(self):
+        """Returns the account index, building it from list_accounts if needed.
+
+        The index holds three dicts keyed by account id, name and email that
+        all point to the account description returned by the API.
+        """
+        with self._account_index_lock:
+            if self._account_index is None:
+                index = {"id": {}, "name": {}, "email": {}}
+                for account in self.list_accounts():
+                    self._add_to_account_index(index, account)
+                self._account_index = index
+
+            return self._account_index
+
+    def invalidate_account_index(self):
+        """Drop the account index so the next lookup rebuilds it from the API."""
+        with self._account_index_lock:
+            self._account_index = None
+
+    def refresh_account(self, account_id):
+        """Retrieve a single account from the API and update the account index.
+
+        :param account_id: ID of the account to refresh
+        :return: The account description
+        """
+        account = self._org_client.describe_account(AccountId=account_id)["Account"]
+        index = self._get_account_index()
+
+        with self._account_index_lock:
+            self._add_to_account_index(index, account)
+
+        return account
+
+    def add_created_account(self, account_id):
+        """Add an account that has been created in this run to the account index.
+
+        :param account_id: ID of the new account
+        :return: The account description
+        """
+        self.created_account_ids.add(account_id)
+        return self.refresh_account(account_id)
+
+    def is_new_account(self, account_id):
+        """Returns True if the account has been created in this run.
+
+        The services of a new account can refuse calls for a while after its
+        creation, those errors are only retried for new accounts.
+        """
+        return account_id in self.created_account_ids
+
+    def get_account(self, key):
+        """Retrieves the account description by ID, name or email address.
+
+        :param key: The ID, name or email address of the account
+        :return: Account description, None if account does not exist
+        """
+        index = self._get_account_index()
+        key = key.strip()
+
+        return (
+            index["id"].get(key)
+            or index["name"].get(key)
+            or index["email"].get(key.lower())
+        )
+
     def get_account_id(self, account_name):
         """Retrieves the account ID.
 
         :param account_name: The name of the account
         :return: Id of account, None if account does not exist
         """
-        for account in self.list_accounts():
-            if account["Name"].strip() == account_name.strip():
-                return account["Id"]
+        account = self._get_account_index()["name"].get(account_name.strip())
+
+        if account is None:
+            return None
 
-        return None
+        return account["Id"]
 
     def get_ou_id(self, ou_path, parent_ou_id=None):
         """Retrieve an organisational unit id.
 
         :param ou_path: the name of the organisational unit. For nested ou's use / notation, eg. eu/eudev
         :param parent_ou_id: The parent from where to start parsing the ou_path, defaults to root
-        :return: (ou_id, parent_id)
+        :return: ou_id
         """
         # Return root OU if '/' is provided
         if ou_path.strip() == "/":
             return self.root_ou_id
 
-        # Set initial OU to start looking for given ou_path
-        if parent_ou_id is None:
-            parent_ou_id = self.root_ou_id
+        if parent_ou_id is not None and parent_ou_id != self.root_ou_id:
+            parent_path = self.ou_tree.get_path(parent_ou_id)
+            ou_path = f"{parent_path}/{ou_path}"
 
-        # Parse ou_path and find the ID
-        ou_hierarchy = ou_path.strip("/").split("/")
-        hierarchy_index = 0
+        return self.ou_tree.get_id(ou_path)
 
-        while hierarchy_index < len(ou_hierarchy):
-            org_units = self.list_organizational_units_for_parent(parent_ou_id)
+    def _get_account_parents(self):
+        """Returns the account to parent map, building it if needed.
 
-            for ou in org_units:
-                if ou["Name"] == ou_hierarchy[hierarchy_index]:
-                    parent_ou_id = ou["Id"]
-                    hierarchy_index += 1
-                    break
-            else:
-                raise ValueError(
-                    f"Could not find ou with name {ou_hierarchy} in OU list {org_units}."
-                )
+        The map is filled by crawling the OU tree and listing the accounts of
+        every OU, which costs one call per OU instead of one per account. When
+        fewer parents will be looked up than the map takes calls, the map starts
+        empty and is filled per account by get_account_parent_id().
+        """
+        if self.expected_parent_lookups is not None:
+            # Listing the accounts of all OUs takes at least this many calls
+            map_calls = len(self._get_account_index()["id"]) / self.ACCOUNTS_PER_PAGE
+        with self._account_parents_lock:
+            if self._account_parents is None:
+                parents = {}
+                if (
+                    self.expected_parent_lookups is not None
+                    and self.expected_parent_lookups < map_calls
+                ):
+                    self._account_parents = parents
+                    return parents
+                for ou_id in self.ou_tree.crawl():
+                    for account in self.list_accounts_for_parent(ou_id):
+                        parents[account["Id"]] = ou_id
+                self._account_parents = parents
+
+            return self._account_parents
+
+    def invalidate_account_parents(self):
+        """Drop the account to parent map so it's rebuilt on next use."""
+        with self._account_parents_lock:
+            self._account_parents = None
+
+    def get_account_parent_id(self, account_id):
+        """Retrieve the ID of the OU the account currently resides in.
+
+        Falls back to list_parents for accounts that are not in the parent
+        map, for instance accounts that have been created during this run.
+
+        :param account_id: ID of the account
+        :return: ID of the parent OU
+        """
+        parents = self._get_account_parents()
+
+        with self._account_parents_lock:
+            if account_id in parents:
+                return parents[account_id]
+
+        # TODO error handling and check if an account always returns just one item
+        response = self._org_client.list_parents(ChildId=account_id)
+        parent_id = response["Parents"][0]["Id"]
 
-        return parent_ou_id
+        with self._account_parents_lock:
+            parents[account_id] = parent_id
+
+        return parent_id
 
     def move_account(self, account_id, ou_path, allow_direct_move=False):
         """Move the account to an organisation unit.
@@ -109,9 +465,7 @@ class Organization:
         else:
             ou_id = self.root_ou_id
 
-        # TODO error handling and check if an account always returns just one item
-        response = self._org_client.list_parents(ChildId=account_id)
-        source_parent_id = response["Parents"][0]["Id"]
+        source_parent_id = self.get_account_parent_id(account_id)
 
         if source_parent_id == ou_id:
             # Account is already resided in ou_path
@@ -133,26 +487,103 @@ class Organization:
             DestinationParentId=ou_id,
         )
 
+        with self._account_parents_lock:
+            if self._account_parents is not None:
+                self._account_parents[account_id] = ou_id
+
+    def get_account_tags(self, account_id):
+        """Retrieves the tags of the given account.
+
+        :param account_id: ID of the AWS account
+        :return: Dict of {key: value}
+        """
+        tags = {
+            tag["Key"]: tag["Value"]
+            for page in self._org_client.get_paginator(
+                "list_tags_for_resource"
+            ).paginate(ResourceId=account_id)
+            for tag in page["Tags"]
+        }
+        return tags
+
     def create_account_tags(self, account_id, tags):
         """Adds tags to given account.
 
         :param account_id: ID of the AWS account
-        :param tags: Dict of tags to apply to account
+        :param tags: List of {key: value} dicts of tags to apply to account
         """
-        # TODO: Make the tag definition fully declarative
-        # meaning that any tag not referenced will be removed
-        # from the account. use org_client.untag_resource()
-        formatted_tags = [
-            {"Key": key, "Value": value} for tag in tags for key, value in tag.items()
-        ]
-        self._org_client.tag_resource(ResourceId=account_id, Tags=formatted_tags)
+        self.update_account_tags(
+            account_id, {key: value for tag in tags for key, value in tag.items()}
+        )
+
+    @staticmethod
+    def diff_tags(current, desired):
+        """Compare the current tags of an account with the desired tags.
+
+        :param current: Dict of {key: value} of the tags on the account
+        :param desired: Dict of {key: value} of the tags the account should have
+        :return: Tuple of (dict of tags to add or update, list of tag keys to remove)
+        """
+        to_set = {
+            key: value for key, value in desired.items() if current.get(key) != value
+        }
+        to_remove = sorted(
+            key for key in current if key not in desired and not key.startswith("aws:")
+        )
+        return to_set, to_remove
+
+    def update_account_tags(self, account_id, tags, remove_keys=()):
+        """Add, update and remove tags of an account.
+
+        Issues a single tag_resource and untag_resource call per account unless
+        the amount of tags exceeds the API limits.
+
+        :param account_id: ID of the AWS account
+        :param tags: Dict of {key: value} of tags to add or update
+        :param remove_keys: List of tag keys to remove
+        """
+        formatted_tags = [{"Key": key, "Value": value} for key, value in tags.items()]
+        for index in range(0, len(formatted_tags), self.MAX_TAGS_PER_CALL):
+            self._org_client.tag_resource(
+                ResourceId=account_id,
+                Tags=formatted_tags[index : index + self.MAX_TAGS_PER_CALL],
+            )
+
+        remove_keys = list(remove_keys)
+        for index in range(0, len(remove_keys), self.MAX_TAGS_PER_CALL):
+            self._org_client.untag_resource(
+                ResourceId=account_id,
+                TagKeys=remove_keys[index : index + self.MAX_TAGS_PER_CALL],
+            )
+
+    def sync_account_tags(self, account_id, tags):
+        """Make the tags of an account match the given tags exactly.
+
+        Tags on the account that are not in tags are removed.
+
+        :param account_id: ID of the AWS account
+        :param tags: Dict of {key: value} of the tags the account should have
+        :return: Tuple of (dict of tags added or updated, list of tag keys removed)
+        """
+        to_set, to_remove = self.diff_tags(self.get_account_tags(account_id), tags)
+        self.update_account_tags(account_id, to_set, to_remove)
+        return to_set, to_remove
 
     @staticmethod
     def get_master_account_id():
-        """Retrieves the master account id from API."""
-        org_client = boto3.client("organizations")
-        response = org_client.describe_organization()
-        return response["Organization"]["MasterAccountId"]
+        """Retrieves the master account id from API, memoized for the run."""
+        return registry.describe_organization()["MasterAccountId"]
+
+    def remove_account_clients(self, account_id):
+        """Drop the clients and rate limits of a member account that has been handled.
+
+        The clients of the master account are used for the whole run and kept.
+
+        :param account_id: ID of the account, nothing is dropped when None
+        """
+        if account_id is not None and account_id != self.master_account_id:
+            remove_role_clients(account_id, source_role=self._master_credentials)
+            rate_limiter.remove_account(account_id)
 
     def create_account_alias(self, account_id, account_alias):
         """Creates or updates the account alias for given account_id."""
@@ -164,30 +595,86 @@ class Organization:
         except iam_client.exceptions.EntityAlreadyExistsException:
             pass  # Alias already exists
 
-    def remove_alternate_contact(self, account_id, contact_type):
-        """Removes the contact type from the account."""
+    def get_account_aliases(self, account_id):
+        """Retrieves the list of account aliases for given account_id."""
+
+        iam_client = create_boto3_client(account_id, "iam", self._master_credentials)
+
+        return iam_client.list_account_aliases()["AccountAliases"]
 
-        if contact_type.upper() not in ["BILLING", "OPERATIONS", "SECURITY"]:
+    def _get_contact_kwargs(self, account_id, contact_type):
+        """Returns the common parameters of the alternate contact calls.
+
+        The AccountId parameter is only allowed for member accounts, the contacts
+        of the management account are managed without it.
+        """
+        if contact_type.upper() not in self.CONTACT_TYPES:
             raise ValueError(f"Contact type {contact_type} is not supported.")
 
-        if account_id == self.get_master_account_id():
-            try:
-                self._account_client.delete_alternate_contact(
-                    AlternateContactType=contact_type.upper()
-                )
-            except Exception:
-                # Alternate contact doesn't exist, but botocore exception doesn't
-                # seem to be published: botocore.errorfactory.ResourceNotFoundException
-                pass
-        else:
-            try:
-                self._account_client.delete_alternate_contact(
-                    AccountId=account_id, AlternateContactType=contact_type.upper()
-                )
-            except Exception:
-                # Alternate contact doesn't exist, but botocore exception doesn't
-                # seem to be published: botocore.errorfactory.ResourceNotFoundException
-                pass
+        kwargs = {"AlternateContactType": contact_type.upper()}
+        if account_id != self.master_account_id:
+            kwargs["AccountId"] = account_id
+        return kwargs
+
+    def get_alternate_contact(self, account_id, contact_type):
+        """Retrieves the alternate contact of the given type.
+
+        :param account_id: ID of the AWS account
+        :param contact_type: Type of contact to retrieve
+        :return: AlternateContact class instance, None if the contact is not set
+        """
+        kwargs = self._get_contact_kwargs(account_id, contact_type)
+
+        account_client = self._account_client
+        try:
+            response = account_client.get_alternate_contact(**kwargs)
+        except account_client.exceptions.ResourceNotFoundException:
+            return None
+
+        contact = response["AlternateContact"]
+        return AlternateContact(
+            contact_type.upper(),
+            name=contact.get("Name"),
+            email=contact.get("EmailAddress"),
+            phone=contact.get("PhoneNumber"),
+            title=contact.get("Title"),
+        )
+
+    def get_alternate_contacts(self, account_id, contact_types=CONTACT_TYPES):
+        """Retrieves the alternate contacts of the given types concurrently.
+
+        :param account_id: ID of the AWS account
+        :param contact_types: Types of contacts to retrieve
+        :return: Dict of {contact type: AlternateContact or None if not set}
+        """
+        contact_types = [contact_type.upper() for contact_type in contact_types]
+        if not contact_types:
+            return {}
+
+        get_contact = bind_context(self.get_alternate_contact)
+        with ThreadPoolExecutor(max_workers=len(contact_types)) as executor:
+            contacts = executor.map(
+                lambda contact_type: get_contact(account_id, contact_type),
+                contact_types,
+            )
+            return dict(zip(contact_types, contacts))
+
+    def remove_alternate_contact(self, account_id, contact_type):
+        """Removes the contact type from the account.
+
+        :param account_id: ID of the AWS account
+        :param contact_type: Type of contact to remove
+        :return: True if the contact was removed, False if it wasn't set
+        """
+        kwargs = self._get_contact_kwargs(account_id, contact_type)
+
+        account_client = self._account_client
+        try:
+            account_client.delete_alternate_contact(**kwargs)
+        except account_client.exceptions.ResourceNotFoundException:
+            return False
+
+        return True
 
     def update_alternate_contact(
         self, account_id: str, contact_type: str, contact_details: AlternateContact
@@ -198,32 +685,180 @@ class Organization:
         :param contact_type: Type of contact to update
         :param contact_details: AlternateContact class instance
         """
+        self._account_client.put_alternate_contact(
+            **self._get_contact_kwargs(account_id, contact_type),
+            EmailAddress=contact_details.email,
+            Name=contact_details.name,
+            PhoneNumber=contact_details.phone,
+            Title=contact_details.title,
+        )
 
-        if contact_type.upper() not in ["BILLING", "OPERATIONS", "SECURITY"]:
-            raise ValueError(f"Contact type {contact_type} is not supported.")
+    @staticmethod
+    def diff_alternate_contacts(current, desired):
+        """Compare the current alternate contacts of an account with the desired ones.
 
-        if account_id == self.get_master_account_id():
-            self._account_client.put_alternate_contact(
-                AlternateContactType=contact_type,
-                EmailAddress=contact_details.email,
-                Name=contact_details.name,
-                PhoneNumber=contact_details.phone,
-                Title=contact_details.title,
-            )
+        :param current: Dict of {contact type: AlternateContact or None} on the account
+        :param desired: Dict of {contact type: AlternateContact or None}, None to
+                        remove the contact
+        :return: Dict of {contact type: AlternateContact to put, or None to delete}
+        """
+        changes = {}
+        for contact_type, contact in desired.items():
+            existing = current.get(contact_type.upper())
+            if contact is not None and contact != existing:
+                changes[contact_type.upper()] = contact
+            elif contact is None and existing is not None:
+                changes[contact_type.upper()] = None
+        return changes
+
+    def update_alternate_contacts(self, account_id, contacts):
+        """Put and delete alternate contacts concurrently.
+
+        All calls are made, even when one of them fails. The first error is
+        raised afterwards.
+
+        :param account_id: ID of the AWS account
+        :param contacts: Dict of {contact type: AlternateContact to put, or None to
+                         delete}
+        """
+        if not contacts:
+            return
+
+        def update(contact_type, contact):
+            if contact is None:
+                self.remove_alternate_contact(account_id, contact_type)
+            else:
+                self.update_alternate_contact(account_id, contact_type, contact)
 
+        update = bind_context(update)
+        with ThreadPoolExecutor(max_workers=len(contacts)) as executor:
+            futures = [
+                executor.submit(update, contact_type, contact)
+                for contact_type, contact in contacts.items()
+            ]
+        for future in futures:
+            future.result()
+
+    def submit_create_account(self, account: Account):
+        """Request the creation of a new account without waiting for it.
+
+        :param account: Class instance of Account
+        :return: The CreateAccountRequestId
+        """
+        if account.allow_billing is True:
+            allow_billing = "ALLOW"
         else:
-            self._account_client.put_alternate_contact(
-                AccountId=account_id,
-                AlternateContactType=contact_type,
-                EmailAddress=contact_details.email,
-                Name=contact_details.name,
-                PhoneNumber=contact_details.phone,
-                Title=contact_details.title,
-            )
+            allow_billing = "DENY"
+
+        response = self._org_client.create_account(
+            Email=account.email,
+            AccountName=account.full_name,
+            # RoleName=role_name,  # defaults to OrganizationAccountAccessRole
+            IamUserAccessToBilling=allow_billing,
+        )["CreateAccountStatus"]
+
+        return response["Id"]
+
+    def list_create_account_status(self, states=("IN_PROGRESS",)):
+        """Returns the create account requests in the given states.
+
+        :param states: List of states, eg. IN_PROGRESS, SUCCEEDED or FAILED
+        :return: List of CreateAccountStatus dicts
+        """
+        statuses = [
+            status
+            for page in self._org_client.get_paginator(
+                "list_create_account_status"
+            ).paginate(States=list(states))
+            for status in page["CreateAccountStatuses"]
+        ]
+        return statuses
+
+    def wait_for_create_account_requests(
+        self, request_ids, poll_interval=1, max_poll_interval=16
+    ):
+        """Poll the given create account requests until they are completed.
+
+        Each round lists the requests that are still in progress with a single
+        paginated call, only the requests that left that list are described. The
+        time between rounds is doubled up to max_poll_interval, and reset whenever
+        a request completes.
+
+        :param request_ids: Iterable of CreateAccountRequestIds
+        :param poll_interval: Initial seconds to wait between polling rounds
+        :param max_poll_interval: Maximum seconds to wait between polling rounds
+        :return: Generator of CreateAccountStatus dicts, yielded as soon as a request
+                 succeeded or failed
+        """
+        poller = CreateAccountPoller(request_ids, poll_interval, max_poll_interval)
+
+        while poller.in_progress:
+            running = {status["Id"] for status in self.list_create_account_status()}
+
+            for request_id in poller.to_describe(running):
+                response = self._org_client.describe_create_account_status(
+                    CreateAccountRequestId=request_id
+                )["CreateAccountStatus"]
+
+                if poller.complete(response):
+                    if response["State"] == "SUCCEEDED":
+                        self.add_created_account(response["AccountId"])
+                    yield response
+
+            if poller.in_progress:
+                sleep(poller.next_interval())
+
+    @staticmethod
+    def create_account_error(account: Account, status):
+        """Returns the error of a create account request that failed.
+
+        :param account: Class instance of Account
+        :param status: CreateAccountStatus dict of the failed request
+        """
+        return IOError(
+            f"Failed to create account {account.full_name}: {status['FailureReason']}"
+        )
+
+    @staticmethod
+    def account_access_policy(timeout=300):
+        """Returns the RetryPolicy to wait with until a new account can be accessed.
+
+        :param timeout: Maximum amount of seconds to wait
+        """
+        return RetryPolicy(
+            max_attempts=100,
+            base_delay=1,
+            max_delay=16,
+            deadline=timeout,
+            stats=retry_policy.stats,
+        )
+
+    def wait_for_account_access(
+        self, account_id, role_name="OrganizationAccountAccessRole", timeout=300
+    ):
+        """Wait until the role in a new account can be assumed.
+
+        The role is created asynchronously after the account itself, so we
+        keep trying to assume it with an exponential backoff.
+
+        :param account_id: ID of the new account
+        :param role_name: The name of the role to assume
+        :param timeout: Maximum amount of seconds to wait
+        """
+        self.account_access_policy(timeout).call(
+            assume_role,
+            account_id,
+            role_name,
+            self._master_credentials,
+            retryable_codes=NEW_ACCOUNT_ERROR_CODES,
+        )
 
     def create_account(self, account: Account):
         """Creates a new the account if it doesn't exist.
 
+        Waits until the account is created and its OrganizationAccountAccessRole
+        can be assumed.
+
         :param account: Class instance of Account
 
         :return: account_id
@@ -241,32 +876,13 @@ class Organization:
                     'FailureReason': 'ACCOUNT_LIMIT_EXCEEDED'
                 }
         """
-        if account.allow_billing is True:
-            allow_billing = "ALLOW"
-        else:
-            allow_billing = "DENY"
-
-        response = self._org_client.create_account(
-            Email=account.email,
-            AccountName=account.full_name,
-            # RoleName=role_name,  # defaults to OrganizationAccountAccessRole
-            IamUserAccessToBilling=allow_billing,
-        )["CreateAccountStatus"]
-
-        while response["State"] == "IN_PROGRESS":
-            response = self._org_client.describe_create_account_status(
-                CreateAccountRequestId=response["Id"]
-            )["CreateAccountStatus"]
-
-            if response.get("FailureReason"):
-                raise IOError(
-                    f"Failed to create account {account.full_name}: {response['FailureReason']}"
-                )
+        request_id = self.submit_create_account(account)
 
-            sleep(1)  # waiting for a sec before checking account status again
+        for response in self.wait_for_create_account_requests([request_id]):
+            if response["State"] == "FAILED":
+                raise self.create_account_error(account, response)
+            account_id = response["AccountId"]
 
-        account_id = response["AccountId"]
-        # TODO: Instead of sleeping, query for the role.
-        sleep(10)  # Wait until OrganizationalRole is created in new account
+        self.wait_for_account_access(account_id)
 
         return account_id
@@ -0,0 +1,306 @@
+"""Compute the changes needed to bring accounts in line with the configuration.
+
+The Planner reads the current state of an account (parent OU, default VPCs,
+alias, alternate contacts and tags) and compares it with the Account object
+from the configuration files. The result is an AccountPlan containing an
+ordered list of Change objects, empty when the account is already up to date.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .account import Account
+from .context import bind_context
+from .scheduler import vpc_scheduler
+from .session import registry
+from .sts import create_boto3_client
+from .vpc import get_default_vpc_id
+
+
+class Change:
+    """A single mutating action on an account."""
+
+    def __init__(self, action, description, **params):
+        """Initialize Change.
+
+        :param action: Name of the action, eg. 'move_account' or 'tag_resource'
+        :param description: Human readable description of the change
+        :param params: Parameters needed to apply the change
+        """
+        self.action = action
+        self.description = description
+        self.params = params
+
+    def __str__(self):
+        return self.description
+
+    def __repr__(self):
+        return f"Change({self.action}, {self.params})"
+
+    @property
+    def step(self):
+        """Name of the change in the step journal."""
+        return self.action
+
+
+class AccountPlan:
+    """The changes needed for a single account."""
+
+    def __init__(self, account: Account, account_id=None, changes=None, error=None):
+        """Initialize AccountPlan.
+
+        :param account: Instance of Account class
+        :param account_id: ID of the account, None if the account doesn't exist yet
+        :param changes: Ordered list of Change objects
+        :param error: The exception raised while planning, None on success
+        """
+        self.account = account
+        self.account_id = account_id
+        self.changes = changes or []
+        self.error = error
+
+    @property
+    def has_changes(self):
+        return bool(self.changes)
+
+
+class Planner:
+    """Compare the current state of accounts with their configuration."""
+
+    def __init__(self, org_session, check_default_vpcs=True):
+        """Initialize Planner.
+
+        :param org_session: Instance of Organization class
+        :param check_default_vpcs: Set this to False to skip looking up default VPCs
+                                   in every region, a deletion is then always planned
+                                   for accounts with DeleteDefaultVPC set
+        """
+        self.org_session = org_session
+        self.check_default_vpcs = check_default_vpcs
+
+    @staticmethod
+    def _is_done(journal, step):
+        return journal is not None and journal.is_done(step)
+
+    @staticmethod
+    def _plan_create(account, account_id):
+        if account_id is not None:
+            return []
+
+        return [Change("create_account", f"Create account with email {account.email}")]
+
+    def _plan_move(self, account, account_id, journal=None):
+        if self._is_done(journal, "move_account"):
+            return []
+
+        ou_id = self.org_session.get_ou_id(account.ou_path)
+
+        if account_id is not None:
+            parent_id = self.org_session.get_account_parent_id(account_id)
+        else:
+            # New accounts are created in the root OU
+            parent_id = self.org_session.root_ou_id
+
+        if parent_id == ou_id:
+            return []
+
+        source = self.org_session.ou_tree.get_path(parent_id)
+        return [
+            Change(
+                "move_account",
+                f"Move account from {source} to {account.ou_path}",
+                ou_path=account.ou_path,
+                allow_direct_move=account.allow_direct_move_between_ou,
+            )
+        ]
+
+    def _get_default_vpc_id(self, account_id, region):
+        return get_default_vpc_id(
+            create_boto3_client(
+                account_id,
+                "ec2",
+                self.org_session._master_credentials,
+                region_name=region,
+            ),
+            self.org_session.is_new_account(account_id),
+        )
+
+    def _get_default_vpc_regions(self, account, journal=None):
+        """Returns the regions the default VPC of an account should be deleted from."""
+        if not account.delete_default_vpc:
+            return []
+
+        return [
+            region
+            for region in registry.get_regions()
+            if not self._is_done(journal, f"delete_default_vpc:{region}")
+        ]
+
+    def _plan_default_vpcs(self, account, account_id, journal=None):
+        regions = self._get_default_vpc_regions(account, journal)
+        if regions and account_id is not None and self.check_default_vpcs:
+            # Look up all regions at the same time on the run-wide scheduler
+            lookup = bind_context(self._get_default_vpc_id)
+            futures = [
+                (region, vpc_scheduler.submit(region, lookup, account_id, region))
+                for region in regions
+            ]
+            regions = [region for region, future in futures if future.result()]
+
+        return self._default_vpc_changes(regions)
+
+    @staticmethod
+    def _default_vpc_changes(regions):
+        if not regions:
+            return []
+
+        return [
+            Change(
+                "delete_default_vpc",
+                f"Delete default VPC in {len(regions)} region(s): {', '.join(regions)}",
+                regions=regions,
+            )
+        ]
+
+    def _plan_alias(self, account, account_id, journal=None):
+        if account.alias is None or self._is_done(journal, "create_account_alias"):
+            return []
+
+        if account_id is not None:
+            if self.org_session.get_account_aliases(account_id) == [account.alias]:
+                return []
+
+        return [
+            Change(
+                "create_account_alias",
+                f"Set account alias to {account.alias}",
+                account_alias=account.alias,
+            )
+        ]
+
+    def _plan_alternate_contacts(self, account, account_id, journal=None):
+        if not account.update_alternate_contacts or self._is_done(
+            journal, "update_alternate_contacts"
+        ):
+            return []
+
+        desired = account.alternate_contacts
+        current = {}
+        if account_id is not None:
+            current = self.org_session.get_alternate_contacts(account_id, desired)
+
+        contacts = self.org_session.diff_alternate_contacts(current, desired)
+        if not contacts:
+            return []
+
+        descriptions = []
+        for contact_type, contact in contacts.items():
+            if contact is None:
+                contact = current[contact_type]
+                descriptions.append(
+                    f"remove {contact_type.lower()} contact {contact.name} "
+                    f"<{contact.email}>"
+                )
+            else:
+                descriptions.append(
+                    f"set {contact_type.lower()} contact to {contact.name} "
+                    f"<{contact.email}>"
+                )
+
+        return [
+            Change(
+                "update_alternate_contacts",
+                _capitalize(" and ".join(descriptions)),
+                contacts=contacts,
+            )
+        ]
+
+    def _plan_tags(self, account, account_id, journal=None):
+        if not account.update_tags or self._is_done(journal, "update_account_tags"):
+            return []
+
+        current = {}
+        if account_id is not None:
+            current = self.org_session.get_account_tags(account_id)
+
+        to_set, to_remove = self.org_session.diff_tags(current, account.tags_dict)
+        if not to_set and not to_remove:
+            return []
+
+        descriptions = []
+        if to_set:
+            descriptions.append(f"set tags {to_set}")
+        if to_remove:
+            descriptions.append(f"remove tags {to_remove}")
+
+        return [
+            Change(
+                "update_account_tags",
+                _capitalize(" and ".join(descriptions)),
+                tags=to_set,
+                remove_keys=to_remove,
+            )
+        ]
+
+    def plan_account(self, account: Account, journal=None):
+        """Compute the changes for a single account.
+
+        :param account: Instance of Account class
+        :param journal: AccountJournal of the account, steps that have been completed
+                        in an interrupted run are not read and not planned again
+        :return: AccountPlan
+        """
+        account_id = self.org_session.get_account_id(account.full_name)
+        changes = self._plan_create(account, account_id)
+        changes.extend(self._plan_move(account, account_id, journal))
+        changes.extend(self._plan_default_vpcs(account, account_id, journal))
+        changes.extend(self._plan_alias(account, account_id, journal))
+        changes.extend(self._plan_alternate_contacts(account, account_id, journal))
+        changes.extend(self._plan_tags(account, account_id, journal))
+
+        return AccountPlan(account, account_id, changes)
+
+    def plan(self, accounts, workers=1):
+        """Compute the changes for all given accounts concurrently.
+
+        Errors are captured on the AccountPlan of the failing account.
+
+        :param accounts: List of Account class instances
+        :param workers: Amount of accounts to read the state of at the same time
+        :return: List of AccountPlan in the order of the given accounts
+        """
+
+        def plan_or_error(account):
+            try:
+                return self.plan_account(account)
+            except Exception as e:
+                logging.exception(f"Failed to plan account {account.full_name}")
+                return AccountPlan(account, error=e)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(plan_or_error, accounts))
+
+
+def _capitalize(description):
+    # str.capitalize() would also lowercase tag keys and contact names
+    return description[:1].upper() + description[1:]
+
+
+def format_plan(plans):
+    """Returns a human readable overview of the planned changes."""
+    lines = []
+
+    for plan in plans:
+        name = f"{plan.account.full_name} ({plan.account_id or 'new account'})"
+        if plan.error is not None:
+            lines.append(f"{name}: failed to plan: {plan.error}")
+        elif plan.has_changes:
+            lines.append(f"{name}:")
+            lines.extend(f"  - {change}" for change in plan.changes)
+
+    changed = [plan for plan in plans if plan.has_changes]
+    failed = [plan for plan in plans if plan.error is not None]
+    lines.append(
+        f"Plan: {sum(len(plan.changes) for plan in changed)} change(s) for "
+        f"{len(changed)} account(s), {len(plans) - len(changed) - len(failed)} "
+        f"account(s) up to date, {len(failed)} failed."
+    )
+    return "\n".join(lines)
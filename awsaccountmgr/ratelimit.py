@@ -0,0 +1,275 @@
+"""Client side rate limiting of AWS API calls.
+
+Every client created through the session registry acquires a token from a
+per-service bucket, and optionally a per-operation bucket, before each request
+is sent. The buckets adapt to the API: the rate is halved when a throttling error
+is returned and slowly restored after successful calls.
+
+AWS applies its quotas per account, so clients of member accounts get buckets
+of their own. EC2 quotas are also per region.
+"""
+import contextlib
+import contextvars
+import logging
+import threading
+import weakref
+from time import monotonic, sleep
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "SlowDown",
+}
+
+# Requests per second per account, the Organizations API in particular has very
+# low limits
+DEFAULT_SERVICE_RATES = {
+    "organizations": 5,
+    "account": 5,
+    "iam": 10,
+    "sts": 20,
+    "ec2": 20,
+}
+
+DEFAULT_OPERATION_RATES = {
+    "organizations.CreateAccount": 1,
+    "organizations.MoveAccount": 2,
+}
+
+# Services that are throttled per region on top of per account
+REGIONAL_SERVICES = ("ec2",)
+
+# Set while the tokens of the requests have been reserved by the caller
+_reserved = contextvars.ContextVar("reserved", default=False)
+
+
+class TokenBucket:
+    """Thread-safe token bucket with an adaptive refill rate."""
+
+    def __init__(self, rate, capacity=None, min_rate=0.1, recovery=0.05):
+        """Initialize TokenBucket.
+
+        :param rate: Maximum amount of tokens added per second
+        :param capacity: Maximum amount of tokens in the bucket, defaults to rate
+        :param min_rate: Lower bound of the rate when backing off on throttling
+        :param recovery: Fraction of the maximum rate restored after each success
+        """
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.min_rate = min(min_rate, self.max_rate)
+        self.recovery = recovery
+        self._tokens = self.capacity
+        self._last_refill = monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def acquire(self):
+        """Take a token from the bucket, blocking until one is available.
+
+        :return: Seconds spent waiting for the token
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+
+            sleep(wait)
+            waited += wait
+
+    def reserve(self):
+        """Take a token from the bucket without blocking.
+
+        The token may be taken in advance, the caller should wait the returned
+        amount of seconds before using it, eg. with asyncio.sleep.
+
+        :return: Seconds to wait before the token is available
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def throttled(self):
+        """Halve the rate after the API returned a throttling error."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        """Increase the rate towards its maximum after a successful call."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(
+                    self.max_rate, self.rate + self.max_rate * self.recovery
+                )
+
+
+class RateLimiter:
+    """Per-service and per-operation token buckets for AWS API calls."""
+
+    def __init__(self, service_rates=None, operation_rates=None):
+        """Initialize RateLimiter.
+
+        :param service_rates: Dict of {service: requests per second}, eg. {"organizations": 5}
+        :param operation_rates: Dict of {service.Operation: requests per second},
+                                eg. {"organizations.CreateAccount": 1}
+        """
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._clients = weakref.WeakKeyDictionary()
+        self.service_rates = dict(DEFAULT_SERVICE_RATES)
+        self.operation_rates = dict(DEFAULT_OPERATION_RATES)
+        self.configure(service_rates, operation_rates)
+
+    def configure(self, service_rates=None, operation_rates=None):
+        """Override rates and reset all buckets.
+
+        A rate of None or 0 disables limiting for that service or operation.
+        """
+        with self._lock:
+            self.service_rates.update(service_rates or {})
+            self.operation_rates.update(operation_rates or {})
+            self._buckets.clear()
+
+    def configure_from_strings(self, rate_limits):
+        """Override rates from a list of strings like 'organizations=2' or 'ec2.DeleteVpc=5'."""
+        service_rates = {}
+        operation_rates = {}
+        for rate_limit in rate_limits:
+            try:
+                name, rate = rate_limit.split("=")
+                rate = float(rate)
+            except ValueError:
+                raise ValueError(
+                    f"Invalid rate limit {rate_limit}, expected <service>[.<Operation>]=<rate>"
+                )
+
+            if "." in name:
+                operation_rates[name] = rate
+            else:
+                service_rates[name] = rate
+
+        self.configure(service_rates, operation_rates)
+
+    def _get_bucket(self, key, rate):
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(rate)
+            return self._buckets[key]
+
+    def remove_account(self, account_id):
+        """Drop the buckets of an account that isn't called anymore in this run."""
+        with self._lock:
+            for key in [key for key in self._buckets if key[1][0] == account_id]:
+                del self._buckets[key]
+
+    def buckets_for(self, service, operation, region=None, account_id=None):
+        """Returns the token buckets that apply to the given operation.
+
+        :param service: The name of the service, eg. 'ec2'
+        :param operation: The name of the operation, eg. 'DescribeVpcs'
+        :param region: The region of the client
+        :param account_id: The account the client makes its calls as, None for
+                           the account of the default credentials
+        """
+        buckets = []
+        scope = (account_id, region if service in REGIONAL_SERVICES else None)
+
+        service_rate = self.service_rates.get(service)
+        if service_rate:
+            buckets.append(self._get_bucket((service, scope), service_rate))
+
+        operation_rate = self.operation_rates.get(f"{service}.{operation}")
+        if operation_rate:
+            buckets.append(
+                self._get_bucket((f"{service}.{operation}", scope), operation_rate)
+            )
+
+        return buckets
+
+    def reserve(self, client, operation):
+        """Reserve the tokens for a request of a registered client without blocking.
+
+        Send the request within reserved() once the returned amount of seconds
+        have passed.
+
+        :param client: A client registered with register()
+        :param operation: The name of the operation, eg. 'DescribeVpcs'
+        :return: Seconds to wait before sending the request
+        """
+        service, region, account_id = self._clients[client]
+        return max(
+            [
+                bucket.reserve()
+                for bucket in self.buckets_for(service, operation, region, account_id)
+            ],
+            default=0.0,
+        )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def reserved():
+        """Don't wait for tokens for the requests in this context, see reserve()."""
+        token = _reserved.set(True)
+        try:
+            yield
+        finally:
+            _reserved.reset(token)
+
+    def register(self, client, account_id=None):
+        """Hook the rate limiter into the botocore event system of a client.
+
+        Tokens are acquired for every attempt, including retries, so the limiter
+        also paces botocore's own retries.
+
+        :param client: The boto3 client to limit
+        :param account_id: The account the client makes its calls as, None for
+                           the account of the default credentials
+        """
+        service = client.meta.service_model.service_id.hyphenize()
+        region = client.meta.region_name
+        self._clients[client] = (service, region, account_id)
+
+        def before_request(operation_name, **kwargs):
+            if _reserved.get():
+                return
+            for bucket in self.buckets_for(service, operation_name, region, account_id):
+                bucket.acquire()
+
+        def after_attempt(response, operation, **kwargs):
+            if response is None:
+                return None
+
+            error_code = response[1].get("Error", {}).get("Code")
+            for bucket in self.buckets_for(service, operation.name, region, account_id):
+                if error_code in THROTTLING_ERROR_CODES:
+                    logger.debug(f"Throttled on {service}.{operation.name}")
+                    bucket.throttled()
+                elif error_code is None:
+                    bucket.succeeded()
+
+            return None
+
+        client.meta.events.register(f"request-created.{service}", before_request)
+        client.meta.events.register_first(f"needs-retry.{service}", after_attempt)
+
+
+rate_limiter = RateLimiter()
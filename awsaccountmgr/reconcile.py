@@ -0,0 +1,468 @@
+"""Reconcile the configured accounts with the AWS organization.
+
+Accounts are reconciled concurrently on a thread pool. The steps for a single
+account always run in order: create, move, delete default VPC, alias, alternate
+contacts and tags. Errors are collected per account so one failing account does
+not stop the rest of the run. The default VPCs of all accounts are deleted by the
+workers of the run-wide vpc_scheduler.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from time import monotonic
+from .account import Account
+from .context import bind_context
+from .metrics import api_metrics
+from .organization import Organization
+from .plan import AccountPlan, Planner
+from .scheduler import vpc_scheduler
+from .sts import create_boto3_client
+from .tracing import tracer
+from .vpc import delete_default_vpc
+
+# Changes applied with the Organization method of the same name, called with the
+# account ID and the params of the change
+ACCOUNT_ID_ACTIONS = (
+    "move_account",
+    "create_account_alias",
+    "update_alternate_contacts",
+    "update_account_tags",
+)
+
+
+class ReconcileResult:
+    """Outcome of reconciling a single account."""
+
+    def __init__(self, full_name, account_id=None, error=None, duration=0.0):
+        """Initialize ReconcileResult.
+
+        :param full_name: Full name of the account
+        :param account_id: ID of the account, None if it could not be determined
+        :param error: The exception raised while reconciling, None on success
+        :param duration: Seconds spent reconciling the account
+        """
+        self.full_name = full_name
+        self.account_id = account_id
+        self.error = error
+        self.duration = duration
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+    def to_dict(self):
+        """Returns the result as a JSON serializable dict."""
+        return {
+            "AccountFullName": self.full_name,
+            "AccountId": self.account_id,
+            "Succeeded": self.succeeded,
+            "Error": None if self.error is None else str(self.error),
+            "Duration": round(self.duration, 3),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Initialize ReconcileResult from the output of to_dict().
+
+        The error is restored as its message.
+        """
+        return cls(
+            data["AccountFullName"],
+            data["AccountId"],
+            error=data["Error"],
+            duration=data["Duration"],
+        )
+
+
+class ResultCollector:
+    """Collects the results of a run, shared by the thread and asyncio backends."""
+
+    def __init__(self, accounts, on_result=None):
+        """Initialize ResultCollector.
+
+        :param accounts: List of Account class instances of the run
+        :param on_result: Optional callable called with the account and its
+                          ReconcileResult as soon as the account has finished,
+                          eg. StateStore.record
+        """
+        self.accounts = accounts
+        self.on_result = on_result
+        self._lock = threading.Lock()
+        self._results = {}
+
+    def add(self, index, result):
+        """Store the result of the account at the given index.
+
+        :param index: Index of the account in the accounts of the run
+        :param result: Instance of ReconcileResult class
+        """
+        with self._lock:
+            self._results[index] = result
+            finished = len(self._results)
+
+        logging.info(
+            f"Finished account {result.full_name} ({finished}/{len(self.accounts)})"
+        )
+        if self.on_result is not None:
+            try:
+                self.on_result(self.accounts[index], result)
+            except Exception:
+                logging.exception(
+                    f"Failed to record the result of account {result.full_name}"
+                )
+
+    def fail(self, indexes, error):
+        """Store the error as the result of the given accounts without a result.
+
+        :param indexes: Iterable of indexes of the accounts that failed
+        :param error: The exception the accounts failed with
+        """
+        with self._lock:
+            indexes = [index for index in indexes if index not in self._results]
+
+        for index in indexes:
+            result = ReconcileResult(self.accounts[index].full_name, error=error)
+            self.add(index, result)
+
+    def to_list(self):
+        """Returns the list of ReconcileResult in the order of the accounts."""
+        return [self._results[index] for index in range(len(self.accounts))]
+
+
+@contextmanager
+def capture_result(org_session, account: Account, new_account_id=None):
+    """Reconcile an account within the block and capture the outcome.
+
+    The yielded ReconcileResult gets the duration of the block, and the error
+    raised within it instead of raising. Set its account_id at the end of the
+    block. The clients of the account are dropped afterwards.
+
+    :param org_session: Instance of Organization class
+    :param account: Instance of Account class
+    :param new_account_id: ID of the account if it has just been created
+    """
+    result = ReconcileResult(account.full_name)
+    start = monotonic()
+    try:
+        with api_metrics.context(account=account.full_name), tracer.span(
+            account.full_name, "account", account=account.full_name
+        ):
+            yield result
+    except Exception as e:
+        logging.exception(f"Failed to reconcile account {account.full_name}")
+        result.account_id = None
+        result.error = e
+    finally:
+        result.duration = monotonic() - start
+        # The clients of the account aren't used again in this run
+        org_session.remove_account_clients(
+            new_account_id or org_session.get_account_id(account.full_name)
+        )
+
+
+def reconcile_account(org_session, account: Account, new_account_id=None, journal=None):
+    """Reconcile a single account and capture the outcome.
+
+    :param org_session: Instance of Organization class
+    :param account: Instance of Account class
+    :param new_account_id: ID of an account that has just been created, we first
+                           wait until its role can be assumed
+    :param journal: Optional AccountJournal to record and skip completed steps
+    :return: ReconcileResult
+    """
+    with capture_result(org_session, account, new_account_id) as result:
+        if new_account_id is not None:
+            with api_metrics.context(step="wait_for_account_access"), tracer.span(
+                "wait_for_account_access"
+            ):
+                org_session.wait_for_account_access(new_account_id)
+
+        result.account_id = create_or_update_account(org_session, account, journal)
+
+    return result
+
+
+def _get_create_requests(org_session, accounts, journals):
+    """Submit create_account requests for missing accounts.
+
+    Requests that are still in progress from an interrupted run are resumed
+    instead of submitted again. They are found through the request ID in the
+    journal, or by account name through list_create_account_status.
+
+    :return: Tuple of ({request_id: index}, {index: ReconcileResult} of failed requests)
+    """
+    create_requests = {}
+    failed = {}
+    in_progress = None
+
+    for index, account in accounts:
+        journal = journals[index]
+        request_id = journal.get_create_request() if journal else None
+
+        if request_id is None:
+            if in_progress is None:
+                in_progress = {
+                    status["AccountName"]: status["Id"]
+                    for status in org_session.list_create_account_status()
+                }
+            request_id = in_progress.get(account.full_name)
+
+        if request_id is not None:
+            logging.info(f"Resuming creation of account {account.full_name}")
+            create_requests[request_id] = index
+            continue
+
+        logging.info(f"Creating new account {account.full_name}")
+        try:
+            with api_metrics.context(account=account.full_name):
+                request_id = org_session.submit_create_account(account)
+            create_requests[request_id] = index
+            if journal:
+                journal.record_create_request(request_id)
+        except Exception as e:
+            logging.exception(f"Failed to create account {account.full_name}")
+            failed[index] = ReconcileResult(account.full_name, error=e)
+
+    return create_requests, failed
+
+
+def handle_create_status(response, account: Account, journal=None, start=None):
+    """Record the outcome of a create account request that has completed.
+
+    :param response: CreateAccountStatus dict of a request that succeeded or failed
+    :param account: Instance of Account class that was requested
+    :param journal: Optional AccountJournal of the account
+    :param start: The time.monotonic() the request was submitted, for the trace
+    :return: ReconcileResult if the creation failed, None if the new account can
+             be reconciled
+    """
+    if start is not None:
+        tracer.add_span("create_account", start, monotonic(), account=account.full_name)
+
+    if response["State"] == "FAILED":
+        error = Organization.create_account_error(account, response)
+        logging.error(str(error))
+        if journal:
+            journal.clear_create_request()
+        return ReconcileResult(account.full_name, error=error)
+
+    if journal:
+        journal.mark_done("create_account")
+    return None
+
+
+def reconcile_accounts(org_session, accounts, workers=1, state=None, on_result=None):
+    """Reconcile all given accounts using a pool of worker threads.
+
+    Existing accounts are handed to the workers straight away. For missing
+    accounts all create_account requests are submitted first, after which
+    they are polled together and each account is handed to the workers as
+    soon as its creation has finished.
+
+    :param org_session: Instance of Organization class
+    :param accounts: List of Account class instances
+    :param workers: Amount of accounts to reconcile at the same time
+    :param state: Optional StateStore to journal completed steps in, steps completed
+                  in an interrupted run are skipped
+    :param on_result: Optional callable called with the account and its
+                      ReconcileResult as soon as the account has finished
+    :return: List of ReconcileResult in the order of the given accounts
+    """
+    results = ResultCollector(accounts, on_result)
+    journals = [state.journal(account) if state else None for account in accounts]
+    started = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+
+        def submit(index, new_account_id=None):
+            future = executor.submit(
+                reconcile_account,
+                org_session,
+                accounts[index],
+                new_account_id,
+                journals[index],
+            )
+            # The results are stored by the worker threads, all of them have
+            # been stored once the executor has shut down
+            future.add_done_callback(lambda future: results.add(index, future.result()))
+            started.add(index)
+
+        missing = []
+        with tracer.span("lookup_accounts", "run"):
+            account_ids = [
+                org_session.get_account_id(account.full_name) for account in accounts
+            ]
+
+        for index, account in enumerate(accounts):
+            if account_ids[index]:
+                submit(index)
+            else:
+                missing.append((index, account))
+
+        with api_metrics.context(step="create_account"):
+            try:
+                creation_start = monotonic()
+                create_requests, failed = _get_create_requests(
+                    org_session, missing, journals
+                )
+                for index, result in failed.items():
+                    results.add(index, result)
+
+                for response in org_session.wait_for_create_account_requests(
+                    create_requests
+                ):
+                    index = create_requests.pop(response["Id"])
+                    failed = handle_create_status(
+                        response, accounts[index], journals[index], creation_start
+                    )
+                    if failed is not None:
+                        results.add(index, failed)
+                        continue
+
+                    submit(index, response["AccountId"])
+            except Exception as e:
+                logging.exception("Failed to create new accounts")
+                results.fail([index for index, _ in missing if index not in started], e)
+
+    return results.to_list()
+
+
+def format_summary(results):
+    """Returns a human readable summary of the reconcile results."""
+    failed = [result for result in results if not result.succeeded]
+    lines = [
+        f"Reconciled {len(results)} account(s): "
+        f"{len(results) - len(failed)} succeeded, {len(failed)} failed."
+    ]
+    for result in failed:
+        lines.append(f"  {result.full_name}: {result.error}")
+
+    return "\n".join(lines)
+
+
+def create_or_update_account(org_session, account: Account, journal=None):
+    """Creates or updates a single AWS account.
+
+    The current state of the account is compared with its configuration and
+    only the resulting changes are applied.
+
+    :param org_session: Instance of Organization class
+    :param account: Instance of Account class
+    :param journal: Optional AccountJournal to record and skip completed steps
+    :return: account_id
+    """
+    with api_metrics.context(step="plan"), tracer.span("plan"):
+        plan = Planner(org_session).plan_account(account, journal)
+    return apply_plan(org_session, plan, journal)
+
+
+def apply_plan(org_session, plan: AccountPlan, journal=None):
+    """Apply the changes of an account plan in order.
+
+    :param org_session: Instance of Organization class
+    :param plan: Instance of AccountPlan class
+    :param journal: Optional AccountJournal to record completed steps in
+    :return: account_id
+    """
+    account = plan.account
+    account_id = plan.account_id
+
+    if not plan.has_changes:
+        logging.info(f"Account {account.full_name} ({account_id}) is up to date")
+
+    for change in plan.changes:
+        with applying_change(change, account, account_id, journal):
+            if change.action == "delete_default_vpc":
+                delete_default_vpcs(
+                    org_session, account_id, change.params["regions"], journal
+                )
+            elif change.action == "create_account":
+                account_id = apply_change(org_session, change, account, account_id)
+            else:
+                apply_change(org_session, change, account, account_id)
+
+    return account_id
+
+
+def apply_change(org_session, change, account: Account, account_id):
+    """Apply a change of an account plan, except for deleting default VPCs.
+
+    Works with both Organization and AsyncOrganization, the latter returns a
+    coroutine to await.
+
+    :param org_session: Instance of Organization or AsyncOrganization class
+    :param change: Instance of Change class
+    :param account: Instance of Account class
+    :param account_id: ID of the account, None if it doesn't exist yet
+    :return: The ID of the new account for create_account
+    """
+    if change.action == "create_account":
+        return org_session.create_account(account)
+
+    if change.action in ACCOUNT_ID_ACTIONS:
+        return getattr(org_session, change.action)(account_id, **change.params)
+
+    raise ValueError(f"Unsupported change action {change.action}")
+
+
+@contextmanager
+def applying_change(change, account: Account, account_id, journal=None):
+    """Log, measure and journal a change of an account plan applied within the block.
+
+    The default VPC regions are journaled one by one as they are deleted.
+
+    :param change: Instance of Change class
+    :param account: Instance of Account class
+    :param account_id: ID of the account, None if it doesn't exist yet
+    :param journal: Optional AccountJournal to record the completed step in
+    """
+    logging.info(f"Account {account.full_name} ({account_id}): {change}")
+
+    with api_metrics.context(step=change.action), tracer.span(change.step):
+        yield
+
+    if journal and change.action != "delete_default_vpc":
+        journal.mark_done(change.step)
+
+
+def delete_default_vpcs(org_session, account_id, regions, journal=None):
+    """Delete the default VPCs of an account on the run-wide vpc_scheduler.
+
+    :param org_session: Instance of Organization class
+    :param account_id: The account ID to remove the VPCs from
+    :param regions: List of the regions to remove the default VPC from
+    :param journal: Optional AccountJournal to record the completed regions in
+    """
+    delete = bind_context(schedule_delete_default_vpc)
+    futures = [
+        vpc_scheduler.submit(region, delete, account_id, org_session, region, journal)
+        for region in regions
+    ]
+    wait(futures)
+    for future in futures:
+        future.result()
+
+
+def schedule_delete_default_vpc(account_id, org_session, region, journal=None):
+    """Delete the default VPC of a region, run as a task of the vpc_scheduler
+
+    :param account_id: The account ID to remove the VPC from
+    :param org_session: The Organization class instance
+    :param region: The name of the region the VPC is resided
+    :param journal: Optional AccountJournal to record the completed region in
+    """
+    # Remove VPC in given region
+    with tracer.span(f"delete_default_vpc:{region}", region=region):
+        ec2_client = create_boto3_client(
+            account_id, "ec2", org_session._master_credentials, region_name=region
+        )
+        logging.info(f"Deleting default VPC from {account_id} in region {region}")
+        delete_default_vpc(
+            ec2_client,
+            account_id,
+            new_account=org_session.is_new_account(account_id),
+        )
+
+    if journal:
+        journal.mark_done(f"delete_default_vpc:{region}")
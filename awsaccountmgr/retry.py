@@ -0,0 +1,300 @@
+"""Retry AWS API calls with exponential backoff and full jitter.
+
+The RetryPolicy replaces botocore's own retry handler on every client created
+through the session registry. Only errors that are known to be transient are
+retried, the delay between attempts grows exponentially with random jitter and
+each call has a wall-clock deadline. Attempts, retries and time spent backing
+off are recorded per operation in RetryStats.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+from time import monotonic, sleep
+from .ratelimit import THROTTLING_ERROR_CODES
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERROR_CODES = THROTTLING_ERROR_CODES | {
+    "ConcurrentModificationException",
+    "IDPCommunicationError",
+    "InternalError",
+    "InternalFailure",
+    "PriorRequestNotComplete",
+    "RequestTimeout",
+    "RequestTimeoutException",
+    "ServiceUnavailable",
+    "ServiceUnavailableException",
+}
+
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# Errors returned while a newly created account is still being set up
+NEW_ACCOUNT_ERROR_CODES = {
+    "AccessDenied",
+    "AuthFailure",
+    "InvalidClientTokenId",
+    "UnauthorizedOperation",
+}
+
+
+# Set while failed calls are retried by the caller instead of by the client
+_retried_by_caller = contextvars.ContextVar("retried_by_caller", default=False)
+
+
+@contextlib.contextmanager
+def retried_by_caller():
+    """Don't retry AWS errors of the calls in this context, the caller retries them.
+
+    Use this with RetryPolicy.call_async(), so the delay between attempts is an
+    asyncio.sleep instead of a sleep on the thread making the call. Connection
+    errors are still retried by the client.
+    """
+    token = _retried_by_caller.set(True)
+    try:
+        yield
+    finally:
+        _retried_by_caller.reset(token)
+
+
+class RetryStats:
+    """Thread-safe counters of attempts and retries per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.operations = {}
+
+    def _get(self, name):
+        if name not in self.operations:
+            self.operations[name] = {
+                "Calls": 0,
+                "Attempts": 0,
+                "Retries": 0,
+                "GaveUp": 0,
+                "BackoffSeconds": 0.0,
+                "Errors": {},
+            }
+        return self.operations[name]
+
+    def record_retry(self, name, error_code, delay):
+        """Record a failed attempt that will be retried after delay seconds."""
+        with self._lock:
+            operation = self._get(name)
+            operation["Retries"] += 1
+            operation["BackoffSeconds"] += delay
+            operation["Errors"][error_code] = operation["Errors"].get(error_code, 0) + 1
+
+    def record_call(self, name, attempts, gave_up=False):
+        """Record a finished call that took the given amount of attempts."""
+        with self._lock:
+            operation = self._get(name)
+            operation["Calls"] += 1
+            operation["Attempts"] += attempts
+            if gave_up:
+                operation["GaveUp"] += 1
+
+    def report(self):
+        """Returns a copy of the counters per operation."""
+        with self._lock:
+            return {
+                name: dict(operation, Errors=dict(operation["Errors"]))
+                for name, operation in self.operations.items()
+            }
+
+    def format_summary(self):
+        """Returns the operations that needed retries, most time spent first."""
+        retried = sorted(
+            (
+                (name, operation)
+                for name, operation in self.report().items()
+                if operation["Retries"]
+            ),
+            key=lambda item: item[1]["BackoffSeconds"],
+            reverse=True,
+        )
+        lines = [
+            f"{name}: {operation['Calls']} calls, {operation['Retries']} retries, "
+            f"{operation['BackoffSeconds']:.1f}s backing off, {operation['GaveUp']} "
+            f"gave up, errors {operation['Errors']}"
+            for name, operation in retried
+        ]
+        return "\n".join(lines) or "No retries needed."
+
+    def clear(self):
+        with self._lock:
+            self.operations.clear()
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter and a wall-clock deadline."""
+
+    def __init__(
+        self,
+        max_attempts=10,
+        base_delay=0.5,
+        max_delay=20,
+        deadline=300,
+        retryable_codes=None,
+        stats=None,
+    ):
+        """Initialize RetryPolicy.
+
+        :param max_attempts: Maximum amount of attempts per call, including the first
+        :param base_delay: Upper bound in seconds of the delay before the first retry
+        :param max_delay: Upper bound in seconds of the delay between any two attempts
+        :param deadline: Seconds after which a call is no longer retried
+        :param retryable_codes: Set of AWS error codes to retry, defaults to
+                                RETRYABLE_ERROR_CODES
+        :param stats: RetryStats instance to record attempts in
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retryable_codes = retryable_codes or RETRYABLE_ERROR_CODES
+        self.stats = stats or RetryStats()
+
+    def get_delay(self, attempts):
+        """Returns the full jitter delay after the given amount of failed attempts."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        )
+
+    def _should_retry(self, attempts, start, delay):
+        return (
+            attempts < self.max_attempts
+            and monotonic() - start + delay <= self.deadline
+        )
+
+    def _get_call_delay(self, name, error, attempts, start, retryable_codes):
+        """Returns the seconds to wait before retrying a failed call, None to raise."""
+        error_code = error.response.get("Error", {}).get("Code")
+        if error_code not in retryable_codes:
+            self.stats.record_call(name, attempts)
+            return None
+
+        delay = self.get_delay(attempts)
+        if not self._should_retry(attempts, start, delay):
+            self.stats.record_call(name, attempts, gave_up=True)
+            return None
+
+        # Throttling is expected when running close to the rate limits
+        log = logger.debug if error_code in THROTTLING_ERROR_CODES else logger.warning
+        log(f"Error running {name}: {error}. Retrying in {delay:.1f} seconds.")
+        self.stats.record_retry(name, error_code, delay)
+        return delay
+
+    def call(self, function, *args, retryable_codes=None, **kwargs):
+        """Call function and retry it on retryable AWS errors.
+
+        :param function: The function to call, eg. client.describe_vpcs
+        :param retryable_codes: Error codes to retry for this call, defaults to the
+                                retryable_codes of the policy
+        :return: The response of the function call
+        """
+        from botocore.exceptions import ClientError
+
+        name = getattr(function, "__name__", repr(function))
+        retryable_codes = retryable_codes or self.retryable_codes
+        start = monotonic()
+        attempts = 0
+
+        while True:
+            attempts += 1
+            try:
+                response = function(*args, **kwargs)
+                self.stats.record_call(name, attempts)
+                return response
+            except ClientError as e:
+                delay = self._get_call_delay(name, e, attempts, start, retryable_codes)
+                if delay is None:
+                    raise
+                sleep(delay)
+
+    async def call_async(self, function, *args, retryable_codes=None, **kwargs):
+        """Await a coroutine function and retry it on retryable AWS errors.
+
+        Same as call(), but the delay between attempts is an asyncio.sleep, so
+        waiting for a retry doesn't hold a thread.
+
+        :param function: The coroutine function to call, eg. a client method wrapped
+                         with AsyncRunner.wrap()
+        :param retryable_codes: Error codes to retry for this call, defaults to the
+                                retryable_codes of the policy
+        :return: The response of the function call
+        """
+        from botocore.exceptions import ClientError
+
+        name = getattr(function, "__name__", repr(function))
+        retryable_codes = retryable_codes or self.retryable_codes
+        start = monotonic()
+        attempts = 0
+
+        while True:
+            attempts += 1
+            try:
+                response = await function(*args, **kwargs)
+                self.stats.record_call(name, attempts)
+                return response
+            except ClientError as e:
+                delay = self._get_call_delay(name, e, attempts, start, retryable_codes)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def _get_retryable_error(self, response, caught_exception):
+        """Returns the error code if the attempt should be retried, else None."""
+        from botocore.exceptions import ConnectionError, HTTPClientError
+
+        if caught_exception is not None:
+            if isinstance(caught_exception, (ConnectionError, HTTPClientError)):
+                return type(caught_exception).__name__
+            return None
+
+        http_response, parsed = response
+        error_code = parsed.get("Error", {}).get("Code")
+        if error_code in self.retryable_codes:
+            return error_code
+        if http_response.status_code in RETRYABLE_STATUS_CODES:
+            return error_code or str(http_response.status_code)
+
+        return None
+
+    def register(self, client):
+        """Use this policy for all calls made by the given client.
+
+        The client should be created with botocore retries disabled, otherwise
+        botocore retries calls this policy has given up on.
+        """
+        service = client.meta.service_model.service_id.hyphenize()
+
+        def needs_retry(
+            response, operation, attempts, caught_exception, request_dict, **kwargs
+        ):
+            context = request_dict["context"]
+            start = context.setdefault("retry_start", monotonic())
+            name = f"{service}.{operation.name}"
+
+            if caught_exception is None and _retried_by_caller.get():
+                return None
+
+            error_code = self._get_retryable_error(response, caught_exception)
+            if error_code is None:
+                self.stats.record_call(name, attempts)
+                return None
+
+            delay = self.get_delay(attempts)
+            if not self._should_retry(attempts, start, delay):
+                self.stats.record_call(name, attempts, gave_up=True)
+                return None
+
+            logger.debug(f"{name} failed with {error_code}, retrying in {delay:.1f}s")
+            self.stats.record_retry(name, error_code, delay)
+            return delay
+
+        client.meta.events.register_first(f"needs-retry.{service}", needs_retry)
+
+
+retry_policy = RetryPolicy()
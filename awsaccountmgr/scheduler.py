@@ -0,0 +1,157 @@
+"""Run-wide scheduling of the default VPC lookups and teardown.
+
+Looking up and deleting the default VPCs of an account is a task per region.
+Instead of a thread pool per account, the tasks of all accounts are queued on a single
+scheduler with a fixed amount of worker threads. Workers take tasks round robin
+across the regions and only a few tasks per region run at the same time, so the
+EC2 endpoint of one region isn't flooded while the workers could be busy in
+other regions.
+"""
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from time import monotonic
+
+
+class RegionScheduler:
+    """Fixed pool of worker threads taking tasks fairly across regions."""
+
+    def __init__(
+        self,
+        workers=16,
+        max_per_region=4,
+        name="Default VPCs",
+        progress_interval=10,
+    ):
+        """Initialize RegionScheduler.
+
+        :param workers: Amount of tasks to run at the same time
+        :param max_per_region: Amount of tasks of a single region to run at the same time
+        :param name: Name of the work in the progress messages
+        :param progress_interval: Minimum seconds between two progress messages
+        """
+        self._condition = threading.Condition()
+        self.workers = workers
+        self.max_per_region = max_per_region
+        self.name = name
+        self.progress_interval = progress_interval
+        self._threads = 0
+        self._queues = {}
+        self._regions = deque()
+        self._running = {}
+        self._counts = {"Queued": 0, "Running": 0, "Done": 0, "Failed": 0}
+        self._last_progress = monotonic()
+
+    def configure(self, workers=None, max_per_region=None):
+        """Change the amount of workers and the amount of tasks per region.
+
+        Workers above the new amount stop once they finished their current task.
+
+        :raises ValueError: When an amount is below 1, the queued tasks would
+                            never run
+        """
+        for name, value in (("workers", workers), ("max_per_region", max_per_region)):
+            if value is not None and value < 1:
+                raise ValueError(f"{name} should be at least 1, got {value}")
+
+        with self._condition:
+            if workers is not None:
+                self.workers = workers
+            if max_per_region is not None:
+                self.max_per_region = max_per_region
+            self._condition.notify_all()
+
+    def submit(self, region, function, *args, **kwargs):
+        """Queue a task for the given region.
+
+        :param region: The name of the region the task calls
+        :param function: The function to call on a worker thread
+        :return: concurrent.futures.Future of the return value of the function
+        """
+        future = Future()
+        with self._condition:
+            if region not in self._queues:
+                self._queues[region] = deque()
+                self._running[region] = 0
+                self._regions.append(region)
+            self._queues[region].append((future, function, args, kwargs))
+            self._counts["Queued"] += 1
+
+            while self._threads < self.workers:
+                self._threads += 1
+                threading.Thread(target=self._work, daemon=True).start()
+            self._condition.notify()
+
+        return future
+
+    def _next_task(self):
+        """Returns (region, task) of the next region in turn, None if nothing can run."""
+        for _ in range(len(self._regions)):
+            region = self._regions[0]
+            self._regions.rotate(-1)
+            if self._queues[region] and self._running[region] < self.max_per_region:
+                return region, self._queues[region].popleft()
+
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._threads > self.workers:
+                        self._threads -= 1
+                        return
+                    next_task = self._next_task()
+                    if next_task is not None:
+                        break
+                    self._condition.wait()
+
+                region, (future, function, args, kwargs) = next_task
+                self._running[region] += 1
+                self._counts["Queued"] -= 1
+                self._counts["Running"] += 1
+
+            failed = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except Exception as e:
+                    failed = True
+                    future.set_exception(e)
+
+            with self._condition:
+                self._running[region] -= 1
+                self._counts["Running"] -= 1
+                self._counts["Failed" if failed else "Done"] += 1
+                # A slot of this region is free again
+                self._condition.notify_all()
+
+            self._log_progress()
+
+    def progress(self):
+        """Returns the amount of queued, running, done and failed tasks."""
+        with self._condition:
+            return dict(self._counts)
+
+    def format_progress(self):
+        """Returns a human readable progress message."""
+        progress = self.progress()
+        total = sum(progress.values())
+        return (
+            f"{self.name}: {progress['Done'] + progress['Failed']}/{total} task(s) "
+            f"finished, {progress['Failed']} failed, {progress['Running']} running, "
+            f"{progress['Queued']} queued"
+        )
+
+    def _log_progress(self):
+        with self._condition:
+            idle = not self._counts["Queued"] and not self._counts["Running"]
+            if not idle and monotonic() - self._last_progress < self.progress_interval:
+                return
+            self._last_progress = monotonic()
+
+        logging.info(self.format_progress())
+
+
+vpc_scheduler = RegionScheduler()
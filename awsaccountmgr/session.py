@@ -0,0 +1,240 @@
+"""Run-scoped registry of boto3 sessions and clients.
+
+Creating a boto3 client is relatively expensive and every client holds its own
+connection pool. The registry hands out a single client per credentials, service
+and region combination so connections are reused for the duration of a run.
+All clients are created from the default session with explicit credentials, so
+the service models are loaded once instead of once per account.
+
+Cache lookups don't wait for clients that are being built. boto3 sessions
+aren't thread-safe, so the clients themselves are created one at a time under
+a separate lock. The cache holds a bounded amount of clients and drops the
+least recently used ones, which also releases the clients of credentials that
+have since been refreshed.
+
+boto3 is only imported when the first session is created, so the configuration
+can be loaded and validated on machines without boto3 installed.
+"""
+import threading
+from collections import OrderedDict
+from .metrics import api_metrics
+from .ratelimit import rate_limiter
+from .retry import retry_policy
+
+
+class ClientRegistry:
+    """Create and reuse boto3 sessions and clients."""
+
+    def __init__(self, max_pool_connections=10, max_clients=500):
+        """Initialize ClientRegistry.
+
+        :param max_pool_connections: Size of the connection pool of each client, this
+                                     should match the amount of threads using a client
+        :param max_clients: Amount of clients to keep, the least recently used
+                            clients are dropped above it
+        """
+        self._lock = threading.RLock()
+        # boto3 sessions aren't thread-safe, clients are created one at a time
+        self._create_lock = threading.Lock()
+        self._key_locks = {}
+        self._sessions = {}
+        self._clients = OrderedDict()
+        self.max_clients = max_clients
+        self._organization = None
+        self._regions = None
+        self._max_pool_connections = max_pool_connections
+        self._config = None
+        self._event_handlers = []
+
+    @property
+    def config(self):
+        """The botocore Config used for all clients, created on first use."""
+        with self._lock:
+            if self._config is None:
+                self._config = self._create_config(self._max_pool_connections)
+
+            return self._config
+
+    @staticmethod
+    def _create_config(max_pool_connections):
+        from botocore.config import Config
+
+        # Retries are handled by retry_policy, so botocore's own retries are disabled
+        return Config(
+            max_pool_connections=max_pool_connections,
+            retries={"mode": "standard", "total_max_attempts": 1},
+        )
+
+    def configure(self, max_pool_connections, max_clients=None):
+        """Change the connection pool size and drop all existing clients.
+
+        :param max_pool_connections: Size of the connection pool of each client
+        :param max_clients: Amount of clients to keep, None to leave it unchanged
+        """
+        with self._lock:
+            self._max_pool_connections = max_pool_connections
+            if max_clients is not None:
+                self.max_clients = max_clients
+            self._config = None
+            self._clients.clear()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def add_event_handler(self, event_name, handler):
+        """Register a botocore event handler on all sessions and clients.
+
+        Handlers are registered on the sessions and clients created so far and on
+        every session created later, eg. to record or replace AWS API calls.
+
+        :param event_name: Name of the botocore event, eg. 'before-send'
+        :param handler: Function to call when the event is emitted
+        """
+        with self._lock:
+            self._event_handlers.append((event_name, handler))
+            for session in self._sessions.values():
+                session.events.register(event_name, handler)
+            for client in self._clients.values():
+                client.meta.events.register(event_name, handler)
+
+    def remove_event_handler(self, event_name, handler):
+        """Unregister a handler that was added with add_event_handler()."""
+        with self._lock:
+            self._event_handlers.remove((event_name, handler))
+            for session in self._sessions.values():
+                session.events.unregister(event_name, handler)
+            for client in self._clients.values():
+                client.meta.events.unregister(event_name, handler)
+
+    def get_session(self, credentials=None):
+        """Returns the boto3 session for the given credentials.
+
+        :param credentials: Tuple of (key, secret, token), None for the default credentials
+        """
+        with self._lock:
+            session = self._sessions.get(credentials)
+        if session is not None:
+            return session
+
+        import boto3
+
+        with self._key_lock(("session", credentials)):
+            # Another thread might have created the session while we were waiting
+            with self._lock:
+                session = self._sessions.get(credentials)
+            if session is not None:
+                return session
+
+            if credentials is None:
+                session = boto3.Session()
+            else:
+                session = boto3.Session(
+                    aws_access_key_id=credentials[0],
+                    aws_secret_access_key=credentials[1],
+                    aws_session_token=credentials[2],
+                )
+            with self._lock:
+                for event_name, handler in self._event_handlers:
+                    session.events.register(event_name, handler)
+                self._sessions[credentials] = session
+
+            return session
+
+    def _get_cached_client(self, key):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+            return client
+
+    def client(self, service, credentials=None, region_name=None, account_id=None):
+        """Returns a boto3 client, creating it on first use.
+
+        :param service: The type of boto3 client, eg. 'sts' or 'ec2'
+        :param credentials: Tuple of (key, secret, token), None for the default credentials
+        :param region_name: The region to initialize the client in
+        :param account_id: The account the credentials belong to, calls are rate
+                           limited per account
+        """
+        if credentials is not None:
+            credentials = tuple(credentials)
+        key = (credentials, service, region_name)
+
+        client = self._get_cached_client(key)
+        if client is not None:
+            return client
+
+        kwargs = {}
+        if credentials is not None:
+            kwargs = {
+                "aws_access_key_id": credentials[0],
+                "aws_secret_access_key": credentials[1],
+                "aws_session_token": credentials[2],
+            }
+
+        with self._key_lock(key):
+            # Another thread might have created the client while we were waiting
+            client = self._get_cached_client(key)
+            if client is not None:
+                return client
+
+            session = self.get_session()
+            with self._create_lock:
+                client = session.client(
+                    service, region_name=region_name, config=self.config, **kwargs
+                )
+            rate_limiter.register(client, account_id)
+            retry_policy.register(client)
+            api_metrics.register(client)
+
+            with self._lock:
+                self._clients[key] = client
+                self._key_locks.pop(key, None)
+                while len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+
+            return client
+
+    def remove_clients(self, credentials):
+        """Drop the clients created for the given credentials.
+
+        Use this once an account has been handled, so the clients of thousands of
+        accounts aren't kept in memory for the rest of the run.
+
+        :param credentials: Tuple of (key, secret, token)
+        """
+        credentials = tuple(credentials)
+        with self._lock:
+            for key in [key for key in self._clients if key[0] == credentials]:
+                del self._clients[key]
+
+    def describe_organization(self):
+        """Returns the organization description, retrieved once per run."""
+        with self._key_lock("organization"):
+            if self._organization is None:
+                self._organization = self.client(
+                    "organizations"
+                ).describe_organization()["Organization"]
+
+            return self._organization
+
+    def get_regions(self):
+        """Returns the names of the enabled regions, retrieved once per run."""
+        with self._key_lock("regions"):
+            if self._regions is None:
+                response = self.client("ec2").describe_regions(AllRegions=False)
+                self._regions = [region["RegionName"] for region in response["Regions"]]
+
+            return self._regions
+
+    def clear(self):
+        """Remove all sessions, clients and memoized responses."""
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+            self._organization = None
+            self._regions = None
+
+
+registry = ClientRegistry()
@@ -0,0 +1,118 @@
+"""Split the configured accounts over multiple runs.
+
+Accounts are assigned to one of N shards by a stable hash of their full name, so
+every runner selects the same accounts regardless of the order of the files or
+the Python hash seed. Adding or removing an account doesn't move other accounts
+to a different shard.
+
+Each shard can write a result report, and the reports of all shards are merged
+into a single run summary afterwards.
+"""
+import hashlib
+import json
+from .reconcile import ReconcileResult
+
+
+def parse_shard(shard):
+    """Returns (index, count) from a string like '2/4', index starts at 1.
+
+    :raises ValueError: When the string is not a valid shard
+    """
+    try:
+        index, count = (int(value) for value in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {shard}, expected <index>/<count>, eg. 1/4")
+
+    if not 1 <= index <= count:
+        raise ValueError(
+            f"Invalid shard {shard}, index should be between 1 and {count}"
+        )
+
+    return index, count
+
+
+def get_shard_index(full_name, count):
+    """Returns the shard, starting at 1, the account with the given name belongs to."""
+    digest = hashlib.sha256(full_name.strip().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def select_shard(accounts, index, count):
+    """Returns the accounts that belong to the given shard, in their original order.
+
+    :param accounts: List of Account class instances
+    :param index: The shard to select, starting at 1
+    :param count: The total amount of shards
+    """
+    return [
+        account
+        for account in accounts
+        if get_shard_index(account.full_name, count) == index
+    ]
+
+
+def write_report(path, results, shard=None):
+    """Write the results of a run to a JSON report.
+
+    :param path: The file to write the report to
+    :param results: List of ReconcileResult
+    :param shard: Tuple of (index, count) of the shard that ran, None if not sharded
+    """
+    report = {
+        "Shard": None if shard is None else {"Index": shard[0], "Count": shard[1]},
+        "Accounts": [result.to_dict() for result in results],
+    }
+    with open(path, "w") as stream:
+        json.dump(report, stream, indent=2)
+
+
+def merge_reports(paths):
+    """Combine the reports of all shards of a run.
+
+    :param paths: The report files written by the shards
+    :return: Tuple of (list of ReconcileResult, list of problems with the reports,
+             eg. missing shards)
+    """
+    results = []
+    problems = []
+    shards = {}
+    seen = {}
+
+    for path in paths:
+        with open(path) as stream:
+            report = json.load(stream)
+
+        shard = report.get("Shard") or {"Index": 1, "Count": 1}
+        key = (shard["Index"], shard["Count"])
+        if key in shards:
+            problems.append(
+                f"{path}: Shard {key[0]}/{key[1]} already reported in {shards[key]}"
+            )
+            continue
+        shards[key] = path
+
+        for account in report["Accounts"]:
+            name = account["AccountFullName"]
+            if name in seen:
+                problems.append(
+                    f"{path}: Account {name} already reported in {seen[name]}"
+                )
+                continue
+            seen[name] = path
+            results.append(ReconcileResult.from_dict(account))
+
+    counts = {count for _, count in shards}
+    if len(counts) > 1:
+        problems.append(
+            f"Reports of different shard counts: {', '.join(map(str, sorted(counts)))}"
+        )
+    for count in counts:
+        missing = [
+            str(index) for index in range(1, count + 1) if (index, count) not in shards
+        ]
+        if missing:
+            problems.append(
+                f"Missing report of shard(s) {', '.join(missing)} of {count}"
+            )
+
+    return results, problems
@@ -0,0 +1,242 @@
+"""Local state store to support incremental and resumed runs.
+
+For every account the store records a hash of its normalized definition and
+the result of the last time it was applied. An incremental run only reconciles
+accounts whose definition changed since then, or whose last run failed.
+
+While an account is being reconciled every completed step is written to a
+journal, together with the request ID of a pending account creation. When a
+run is interrupted the next run skips the steps that were already completed
+for the same definition. The completed steps are cleared as soon as the result
+of the account has been recorded, successful or not, so they only ever skip
+steps when resuming an interrupted run. A failing step therefore doesn't stop
+later runs from checking the other steps for drift. A pending account creation
+is kept until the account has been reconciled successfully.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from time import time
+
+STATE_FILENAME = ".awsaccountmgr-state.sqlite"
+
+
+def default_state_path(config_folder):
+    """Returns the path of the state file next to the given config folder."""
+    parent_folder = os.path.dirname(os.path.abspath(config_folder))
+    return os.path.join(parent_folder, STATE_FILENAME)
+
+
+def definition_hash(account):
+    """Returns a hash of the normalized definition of an account.
+
+    :param account: Instance of Account class
+    """
+    config = account.to_config()
+    config["OrganizationalUnitPath"] = "/" + "/".join(
+        name for name in account.ou_path.strip().split("/") if name
+    )
+    definition = json.dumps(config, sort_keys=True)
+    return hashlib.sha256(definition.encode("utf-8")).hexdigest()
+
+
+class StateStore:
+    """SQLite backed record of applied account definitions."""
+
+    def __init__(self, path):
+        """Initialize StateStore, creating the database if it doesn't exist.
+
+        :param path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS accounts ("
+                " full_name TEXT PRIMARY KEY,"
+                " definition_hash TEXT NOT NULL,"
+                " account_id TEXT,"
+                " succeeded INTEGER NOT NULL,"
+                " error TEXT,"
+                " applied_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS steps ("
+                " full_name TEXT NOT NULL,"
+                " definition_hash TEXT NOT NULL,"
+                " step TEXT NOT NULL,"
+                " completed_at REAL NOT NULL,"
+                " PRIMARY KEY (full_name, step))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS create_requests ("
+                " full_name TEXT PRIMARY KEY,"
+                " request_id TEXT NOT NULL,"
+                " requested_at REAL NOT NULL)"
+            )
+
+    def get(self, full_name):
+        """Returns the last recorded state of an account as a dict, None if unknown."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT definition_hash, account_id, succeeded, error, applied_at"
+                " FROM accounts WHERE full_name = ?",
+                (full_name,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "DefinitionHash": row[0],
+            "AccountId": row[1],
+            "Succeeded": bool(row[2]),
+            "Error": row[3],
+            "AppliedAt": row[4],
+        }
+
+    def needs_reconcile(self, account):
+        """Returns True if the account changed since, or failed during, the last run.
+
+        :param account: Instance of Account class
+        """
+        state = self.get(account.full_name)
+        return (
+            state is None
+            or not state["Succeeded"]
+            or state["DefinitionHash"] != definition_hash(account)
+        )
+
+    def journal(self, account):
+        """Returns the step journal of an account.
+
+        :param account: Instance of Account class
+        """
+        return AccountJournal(self, account)
+
+    def completed_steps(self, full_name, definition_hash):
+        """Returns the set of steps completed for the given account definition."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT step FROM steps WHERE full_name = ? AND definition_hash = ?",
+                (full_name, definition_hash),
+            ).fetchall()
+
+        return {row[0] for row in rows}
+
+    def mark_step(self, full_name, definition_hash, step):
+        """Record that a step has been completed for the given account definition."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO steps"
+                " (full_name, definition_hash, step, completed_at) VALUES (?, ?, ?, ?)",
+                (full_name, definition_hash, step, time()),
+            )
+
+    def get_create_request(self, full_name):
+        """Returns the CreateAccountRequestId of a pending account, None if unknown."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT request_id FROM create_requests WHERE full_name = ?",
+                (full_name,),
+            ).fetchone()
+
+        return None if row is None else row[0]
+
+    def record_create_request(self, full_name, request_id):
+        """Record the CreateAccountRequestId of an account that is being created."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO create_requests"
+                " (full_name, request_id, requested_at) VALUES (?, ?, ?)",
+                (full_name, request_id, time()),
+            )
+
+    def clear_create_request(self, full_name):
+        """Remove the CreateAccountRequestId of an account."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM create_requests WHERE full_name = ?", (full_name,)
+            )
+
+    def clear_steps(self, full_name):
+        """Remove all completed steps of an account."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM steps WHERE full_name = ?", (full_name,)
+            )
+
+    def clear_journal(self, full_name):
+        """Remove all completed steps and pending requests of an account."""
+        self.clear_steps(full_name)
+        self.clear_create_request(full_name)
+
+    def record(self, account, result):
+        """Record the result of reconciling an account.
+
+        The completed steps of the account are cleared, the next run checks every
+        step again. A pending account creation is only cleared when the account
+        was reconciled successfully.
+
+        :param account: Instance of Account class
+        :param result: Instance of ReconcileResult class
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO accounts"
+                " (full_name, definition_hash, account_id, succeeded, error, applied_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    account.full_name,
+                    definition_hash(account),
+                    result.account_id,
+                    int(result.succeeded),
+                    None if result.error is None else str(result.error),
+                    time(),
+                ),
+            )
+
+        if result.succeeded:
+            self.clear_journal(account.full_name)
+        else:
+            self.clear_steps(account.full_name)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class AccountJournal:
+    """Completed reconcile steps of a single account definition."""
+
+    def __init__(self, store, account):
+        """Initialize AccountJournal.
+
+        :param store: Instance of StateStore class
+        :param account: Instance of Account class
+        """
+        self.store = store
+        self.full_name = account.full_name
+        self.definition_hash = definition_hash(account)
+        self._completed = store.completed_steps(self.full_name, self.definition_hash)
+
+    def is_done(self, step):
+        """Returns True if the step was completed in an earlier, interrupted run."""
+        return step in self._completed
+
+    def mark_done(self, step):
+        """Record that a step has been completed."""
+        self.store.mark_step(self.full_name, self.definition_hash, step)
+        self._completed.add(step)
+
+    def get_create_request(self):
+        return self.store.get_create_request(self.full_name)
+
+    def record_create_request(self, request_id):
+        self.store.record_create_request(self.full_name, request_id)
+
+    def clear_create_request(self):
+        self.store.clear_create_request(self.full_name)
@@ -1,6 +1,122 @@
 """Helper fuction for working with cross-account roles."""
-import boto3
 import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from .session import registry
+
+
+class CredentialCache:
+    """Thread-safe cache for assumed role credentials.
+
+    Credentials are reused until shortly before they expire. Once they enter the
+    refresh window a new set is retrieved on a background thread while the
+    current credentials keep being handed out.
+    """
+
+    def __init__(self, refresh_before=300, expire_before=60):
+        """Initialize CredentialCache.
+
+        :param refresh_before: Seconds before expiration to start a background refresh
+        :param expire_before: Seconds before expiration the credentials are no longer used
+        """
+        self.refresh_before = timedelta(seconds=refresh_before)
+        self.expire_before = timedelta(seconds=expire_before)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._key_locks = {}
+        self._refreshing = set()
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _remaining(self, entry):
+        return entry[1] - datetime.now(timezone.utc)
+
+    def _refresh(self, key, fetch):
+        credentials, expiration = fetch()
+        with self._lock:
+            self._entries[key] = (credentials, expiration)
+        return credentials
+
+    def _refresh_in_background(self, key, fetch):
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._refresh(key, fetch)
+            except Exception as e:
+                logging.warning(f"Failed to refresh credentials for {key[:2]}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def get(self, key, fetch):
+        """Retrieve credentials for key, calling fetch when needed.
+
+        :param key: Hashable key identifying the credentials
+        :param fetch: Callable returning a tuple of (credentials, expiration)
+        :return: The cached or refreshed credentials
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+        if entry is not None:
+            remaining = self._remaining(entry)
+            if remaining > self.refresh_before:
+                return entry[0]
+            if remaining > self.expire_before:
+                self._refresh_in_background(key, fetch)
+                return entry[0]
+
+        with self._key_lock(key):
+            # Another thread might have refreshed while we were waiting
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and self._remaining(entry) > self.expire_before:
+                return entry[0]
+
+            return self._refresh(key, fetch)
+
+    def peek(self, key):
+        """Returns the cached credentials for key without retrieving them, None if missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+
+        return None if entry is None else entry[0]
+
+    def clear(self):
+        """Remove all cached credentials."""
+        with self._lock:
+            self._entries.clear()
+
+
+credential_cache = CredentialCache()
+
+
+def _assume_role(role_arn, source_role=None):
+    """Call sts:AssumeRole and return a tuple of (credentials, expiration)."""
+    sts_client = registry.client("sts", source_role)
+
+    sts_response = sts_client.assume_role(
+        RoleArn=role_arn, RoleSessionName="newsession"
+    )
+
+    credentials = sts_response["Credentials"]
+    return (
+        (
+            credentials["AccessKeyId"],
+            credentials["SecretAccessKey"],
+            credentials["SessionToken"],
+        ),
+        credentials["Expiration"],
+    )
 
 
 def assume_role(
@@ -8,6 +124,9 @@ def assume_role(
 ):
     """Assume a role in a different account.
 
+    Credentials are cached per account, role and source identity and reused
+    until shortly before they expire.
+
     :param account_id: The AWS account ID to assume role in
     :param role_name: The name of the role to assume
     :source_role: Tuple of (access_key_id, secret_access_key, session_token) of the role you want
@@ -16,31 +135,30 @@ def assume_role(
     :return: Tuple of (access_key_id, secret_access_key, session_token)
     """
     role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
+    source_identity = source_role[0] if source_role else None
 
-    if source_role is None:
-        sts_client = boto3.client("sts")
-    else:
-        sts_client = boto3.client(
-            "sts",
-            aws_access_key_id=source_role[0],
-            aws_secret_access_key=source_role[1],
-            aws_session_token=source_role[2],
-        )
+    def fetch():
+        logging.debug(f"Assuming role {role_name} on account {account_id}")
+        return _assume_role(role_arn, source_role)
 
-    current_account = sts_client.get_caller_identity().get("Account")
-    logging.debug(
-        f"Account {current_account} assuming role {role_name} on account {account_id}"
-    )
+    return credential_cache.get((account_id, role_name, source_identity), fetch)
 
-    sts_response = sts_client.assume_role(
-        RoleArn=role_arn, RoleSessionName="newsession"
-    )
 
-    return (
-        sts_response["Credentials"]["AccessKeyId"],
-        sts_response["Credentials"]["SecretAccessKey"],
-        sts_response["Credentials"]["SessionToken"],
-    )
+def remove_role_clients(
+    account_id, role_name="OrganizationAccountAccessRole", source_role=None
+):
+    """Drop the clients created with the cached credentials of a role.
+
+    The role isn't assumed when there are no cached credentials.
+
+    :param account_id: The AWS account ID the role was assumed in
+    :param role_name: The name of the assumed role
+    :param source_role: The credentials the role was assumed from
+    """
+    source_identity = source_role[0] if source_role else None
+    credentials = credential_cache.peek((account_id, role_name, source_identity))
+    if credentials is not None:
+        registry.remove_clients(credentials)
 
 
 def create_boto3_client(
@@ -67,11 +185,9 @@ def create_boto3_client(
             account_id, source_role=source_role_credentials
         )
 
-    client = boto3.client(
+    return registry.client(
         client_type,
-        aws_access_key_id=access_key_id,
-        aws_secret_access_key=secret_access_key,
-        aws_session_token=session_token,
+        (access_key_id, secret_access_key, session_token),
         region_name=region_name,
+        account_id=account_id,
     )
-    return client
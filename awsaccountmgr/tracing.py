@@ -0,0 +1,203 @@
+"""Lightweight tracing of the reconcile stages.
+
+Spans are recorded per account and per step when the tracer is enabled. The
+recorded spans can be written as a Chrome trace-event file, which can be opened
+in chrome://tracing or https://ui.perfetto.dev, and summarized as the critical
+path: the chain of stages that determined the duration of the run.
+"""
+import contextvars
+import json
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from time import monotonic
+
+_current_span = contextvars.ContextVar("awsaccountmgr_current_span", default=None)
+
+
+class Span:
+    """A timed stage of the run."""
+
+    __slots__ = ("name", "category", "start", "end", "thread_id", "parent", "args")
+
+    def __init__(self, name, category, start, parent=None, args=None):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.thread_id = threading.get_ident()
+        self.parent = parent
+        self.args = args or {}
+
+    @property
+    def duration(self):
+        return (self.end or monotonic()) - self.start
+
+    @property
+    def account(self):
+        """The account of this span or of its closest parent with an account."""
+        span = self
+        while span is not None:
+            if "account" in span.args:
+                return span.args["account"]
+            span = span.parent
+        return None
+
+
+class Tracer:
+    """Thread-safe recorder of nested spans."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self.started = monotonic()
+        self.spans = []
+
+    def enable(self):
+        """Start recording spans."""
+        with self._lock:
+            self.enabled = True
+            self.started = monotonic()
+            self.spans = []
+
+    @contextmanager
+    def span(self, name, category="step", **args):
+        """Record the duration of the block as a span.
+
+        Spans started within the block, in the same thread or in functions
+        wrapped with context.bind_context(), are recorded as children of this span.
+
+        :param name: Name of the span, eg. 'move_account'
+        :param category: Category of the span, eg. 'account' or 'step'
+        :param args: Additional details shown with the span, eg. account or region
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        span = Span(name, category, monotonic(), _current_span.get(), args)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.end = monotonic()
+            with self._lock:
+                self.spans.append(span)
+
+    def add_span(self, name, start, end, category="step", **args):
+        """Record a span of which the start and end were measured elsewhere.
+
+        :param start: Start of the span as returned by time.monotonic()
+        :param end: End of the span as returned by time.monotonic()
+        """
+        if not self.enabled:
+            return
+
+        span = Span(name, category, start, _current_span.get(), args)
+        span.end = end
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self):
+        """Returns the recorded spans in the Chrome trace-event format."""
+        with self._lock:
+            spans = list(self.spans)
+
+        thread_ids = {}
+        events = []
+        for span in sorted(spans, key=lambda span: span.start):
+            # Number the threads in order of appearance to keep the trace readable
+            tid = thread_ids.setdefault(span.thread_id, len(thread_ids) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self.started) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {key: str(value) for key, value in span.args.items()},
+                }
+            )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """Write the recorded spans as a Chrome trace-event JSON file."""
+        with open(path, "w") as stream:
+            json.dump(self.to_chrome_trace(), stream)
+
+    def critical_path(self):
+        """Returns the chain of innermost spans that determined the run duration.
+
+        Starting from the span that ended last, the span that ended last before
+        it started is taken as the stage it waited for, until the start of the
+        run is reached. Spans on this chain that have children are replaced by
+        the critical path through their children.
+
+        :return: List of Span in chronological order
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        children = {}
+        for span in spans:
+            children.setdefault(id(span.parent), []).append(span)
+
+        def chain(candidates, end):
+            candidates = sorted(candidates, key=lambda span: span.end)
+            ends = [span.end for span in candidates]
+            path = []
+            index = bisect_right(ends, end)
+            while index > 0:
+                span = candidates[index - 1]
+                path.append(span)
+                index = bisect_right(ends, span.start, 0, index - 1)
+
+            leaves = []
+            for span in reversed(path):
+                if id(span) in children:
+                    leaves.extend(chain(children[id(span)], span.end))
+                else:
+                    leaves.append(span)
+            return leaves
+
+        return chain(children.get(id(None), []), float("inf"))
+
+    def format_critical_path(self, limit=10):
+        """Returns a human readable summary of the critical path.
+
+        :param limit: Amount of stages and spans to list
+        """
+        path = self.critical_path()
+        if not path:
+            return "No spans recorded."
+
+        run_duration = path[-1].end - min(span.start for span in self.spans)
+        per_stage = {}
+        for span in path:
+            # Group the regions of the VPC teardown and the contact types
+            stage = span.name.split(":")[0]
+            per_stage[stage] = per_stage.get(stage, 0.0) + span.duration
+
+        lines = [
+            f"Critical path: {len(path)} span(s), "
+            f"{sum(span.duration for span in path):.1f}s of {run_duration:.1f}s run"
+        ]
+        for stage, seconds in sorted(
+            per_stage.items(), key=lambda item: item[1], reverse=True
+        )[:limit]:
+            lines.append(
+                f"  {stage}: {seconds:.1f}s ({seconds / max(run_duration, 1e-9):.0%})"
+            )
+
+        lines.append("Longest spans on the critical path:")
+        for span in sorted(path, key=lambda span: span.duration, reverse=True)[:limit]:
+            lines.append(f"  {span.account or '-'} {span.name}: {span.duration:.1f}s")
+
+        return "\n".join(lines)
+
+
+tracer = Tracer()
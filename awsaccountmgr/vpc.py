@@ -1,98 +1,129 @@
 """Remove default VPC and related resources."""
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from .retry import NEW_ACCOUNT_ERROR_CODES, RetryPolicy, retry_policy
 
 logger = logging.getLogger(__name__)
-from time import sleep
 
+# Deleting a resource fails with DependencyViolation until the resources that
+# depend on it are fully removed, so we poll until it succeeds
+dependency_retry_policy = RetryPolicy(
+    max_attempts=50,
+    base_delay=1,
+    max_delay=5,
+    deadline=180,
+    retryable_codes={"DependencyViolation"},
+    stats=retry_policy.stats,
+)
 
-def retry_function(function, max_retry_seconds=180):
-    """Helper function to retry describe VPC related actions.
 
-    Retrying the given describe_* call. Sometimes the VPC service
-    is not ready when you've just created a new account.
+def retry_describe(function, new_account=False, **kwargs):
+    """Call a describe_* function, retrying while a new account is being set up.
+
+    Sometimes the VPC service is not ready when you've just created a new account.
+    The errors it returns then are only retried for accounts created in this run,
+    for other accounts they are permanent.
 
     :param function: The function to call. NOTE: don't execute it but
                      pass it like client.describe_vpcs   without the closing brackets()
-    :param max_retry_seconds: Maximum amount of seconds to try
+    :param new_account: Set this to True if the account was created in this run
+    :param kwargs: Parameters to pass to the function
 
     :return: The response of the function call
     """
-    while True:
-        try:
-            response = function()
-            break
-        except Exception as e:
-            logger.warning(
-                f"Error running {function.__name__}: {e}. Sleeping for 2 second before trying again."
-            )
-            max_retry_seconds - 2
-            sleep(2)
-            if max_retry_seconds <= 0:
-                raise Exception(
-                    f"Could not successfully execute function {function.__name__} "
-                    f"within retry limit {max_retry_seconds}."
-                )
+    return retry_policy.call(
+        function,
+        retryable_codes=NEW_ACCOUNT_ERROR_CODES if new_account else None,
+        **kwargs,
+    )
+
 
-    return response
+def get_default_vpc_id(client, new_account=False):
+    """Returns the ID of the default VPC, None if there is no default VPC.
 
+    :param client: EC2 boto3 client instance
+    :param new_account: Set this to True if the account was created in this run
+    """
+    vpc_response = retry_describe(
+        client.describe_vpcs,
+        new_account,
+        Filters=[{"Name": "isDefault", "Values": ["true"]}],
+    )
 
-def delete_default_vpc(client, account_id, dry_run=False):
+    if not vpc_response["Vpcs"]:
+        return None
+
+    return vpc_response["Vpcs"][0]["VpcId"]
+
+
+def delete_default_vpc(
+    client, account_id, dry_run=False, max_workers=5, new_account=False
+):
     """Delete the default VPC in the given account id.
 
+    The default VPC and its dependencies are looked up with server-side filters.
+    Subnets are deleted concurrently and the VPC is deleted as soon as its
+    dependencies have cleared.
+
     :param client: EC2 boto3 client instance
     :param account_id: AWS account id
+    :param dry_run: Set this to True to only check permissions for the delete calls
+    :param max_workers: Maximum amount of subnets to delete at the same time
+    :param new_account: Set this to True if the account was created in this run
     """
     # Check and remove default VPC
-    default_vpc_id = None
-
-    vpc_response = retry_function(client.describe_vpcs)
-
-    for vpc in vpc_response["Vpcs"]:
-        if vpc["IsDefault"] is True:
-            default_vpc_id = vpc["VpcId"]
-            break
+    default_vpc_id = get_default_vpc_id(client, new_account)
 
     if default_vpc_id is None:
         logging.info(f"No default VPC found in account {account_id}")
         return
 
     logging.info(f"Found default VPC Id {default_vpc_id}")
-    subnet_response = retry_function(client.describe_subnets)
-
-    default_subnets = [
-        subnet
-        for subnet in subnet_response["Subnets"]
-        if subnet["VpcId"] == default_vpc_id
-    ]
-
-    logging.info(f"Deleting default {len(default_subnets )} subnets")
-    _ = [
-        client.delete_subnet(SubnetId=subnet["SubnetId"], DryRun=dry_run)
-        for subnet in default_subnets
-    ]
-
-    igw_response = retry_function(client.describe_internet_gateways)
-    try:
-        default_igw = [
-            igw["InternetGatewayId"]
-            for igw in igw_response["InternetGateways"]
-            for attachment in igw["Attachments"]
-            if attachment["VpcId"] == default_vpc_id
-        ][0]
-    except IndexError:
-        default_igw = None
-
-    if default_igw:
+
+    subnet_response = retry_describe(
+        client.describe_subnets,
+        new_account,
+        Filters=[{"Name": "vpc-id", "Values": [default_vpc_id]}],
+    )
+    default_subnets = subnet_response["Subnets"]
+
+    logging.info(f"Deleting default {len(default_subnets)} subnets")
+    if default_subnets:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    dependency_retry_policy.call,
+                    client.delete_subnet,
+                    SubnetId=subnet["SubnetId"],
+                    DryRun=dry_run,
+                )
+                for subnet in default_subnets
+            ]
+            for future in futures:
+                future.result()
+
+    igw_response = retry_describe(
+        client.describe_internet_gateways,
+        new_account,
+        Filters=[{"Name": "attachment.vpc-id", "Values": [default_vpc_id]}],
+    )
+
+    for igw in igw_response["InternetGateways"]:
+        default_igw = igw["InternetGatewayId"]
+
         logging.info(f"Detaching Internet Gateway {default_igw}")
         _ = client.detach_internet_gateway(
             InternetGatewayId=default_igw, VpcId=default_vpc_id, DryRun=dry_run
         )
 
         logging.info(f"Deleting Internet Gateway {default_igw}")
-        _ = client.delete_internet_gateway(InternetGatewayId=default_igw)
+        _ = dependency_retry_policy.call(
+            client.delete_internet_gateway, InternetGatewayId=default_igw
+        )
 
-    sleep(10)  # It takes a bit of time for the dependencies to clear
     logging.info(f"Deleting Default VPC {default_vpc_id}")
-    delete_vpc_response = client.delete_vpc(VpcId=default_vpc_id, DryRun=dry_run)
+    delete_vpc_response = dependency_retry_policy.call(
+        client.delete_vpc, VpcId=default_vpc_id, DryRun=dry_run
+    )
 
     return delete_vpc_response
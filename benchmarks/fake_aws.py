@@ -0,0 +1,673 @@
+"""In-process fake of the AWS APIs used by awsaccountmgr.
+
+The fake is hooked into botocore through the session registry. Requests are
+built, signed, rate limited, retried and parsed by botocore as usual, only the
+HTTP round trip is replaced by a response generated from the in-memory state
+of a simulated organization. Latency, page sizes and throttling are configurable
+so the effect of concurrency and API limits can be measured without an AWS
+account.
+"""
+import json
+import random
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from time import monotonic, sleep
+from xml.sax.saxutils import escape
+
+from botocore.awsrequest import AWSResponse
+
+MASTER_ACCOUNT_ID = "111111111111"
+ROOT_OU_ID = "r-fake"
+
+REGIONS = [
+    "us-east-1",
+    "us-east-2",
+    "us-west-1",
+    "us-west-2",
+    "eu-west-1",
+    "eu-west-2",
+    "eu-west-3",
+    "eu-central-1",
+    "eu-north-1",
+    "ap-south-1",
+    "ap-northeast-1",
+    "ap-northeast-2",
+    "ap-northeast-3",
+    "ap-southeast-1",
+    "ap-southeast-2",
+    "ca-central-1",
+    "sa-east-1",
+]
+
+THROTTLING_ERRORS = {
+    "organizations": "TooManyRequestsException",
+    "account": "TooManyRequestsException",
+    "ec2": "RequestLimitExceeded",
+}
+
+_CREDENTIAL_PATTERN = re.compile(r"Credential=([^/]+)/")
+_REGION_PATTERN = re.compile(r"\.([a-z]{2}-[a-z]+-\d)\.")
+
+
+class FakeError(Exception):
+    """An error response of the fake API."""
+
+    def __init__(self, code, message="", status_code=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status_code = status_code
+
+
+class _Raw:
+    """Minimal raw response body, as read by botocore's AWSResponse."""
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class FakeAws:
+    """Simulated organization with member accounts, OUs, tags and default VPCs."""
+
+    def __init__(
+        self,
+        latency=0.0,
+        page_size=20,
+        throttle_rate=0.0,
+        create_account_seconds=0.0,
+        regions=3,
+        seed=0,
+    ):
+        """Initialize FakeAws.
+
+        :param latency: Seconds each request takes, or a dict of seconds per
+                        service or 'service.Operation'
+        :param page_size: Maximum amount of items per page of list calls, or a
+                          dict of sizes per 'service.Operation'
+        :param throttle_rate: Fraction of requests that fail with a throttling
+                              error, or a dict of fractions per service
+        :param create_account_seconds: Seconds until a new account is created
+        :param regions: Amount of enabled regions
+        :param seed: Seed of the random generator used for throttling
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.throttle_rate = throttle_rate
+        self.create_account_seconds = create_account_seconds
+        self.regions = REGIONS[:regions]
+
+        self._lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._call = threading.local()
+        self._sequence = 0
+
+        self.calls = {}
+        self.requests = {}
+        self.throttles = 0
+
+        self.ous = {}
+        self.accounts = {}
+        self.parents = {}
+        self.tags = {}
+        self.aliases = {}
+        self.contacts = {}
+        self.vpcs = {}
+        self.create_requests = {}
+        self.add_account("master", "master@example.com", ROOT_OU_ID, MASTER_ACCOUNT_ID)
+
+    # State setup
+
+    def _next_id(self, prefix, digits=8):
+        with self._lock:
+            self._sequence += 1
+            return f"{prefix}{self._sequence:0{digits}d}"
+
+    def add_ou(self, name, parent_id=ROOT_OU_ID):
+        """Add an organizational unit and return its ID."""
+        ou_id = self._next_id("ou-fake-")
+        self.ous[ou_id] = {"Id": ou_id, "Name": name, "ParentId": parent_id}
+        return ou_id
+
+    def add_account(
+        self,
+        name,
+        email,
+        parent_id=ROOT_OU_ID,
+        account_id=None,
+        tags=None,
+        alias=None,
+        default_vpc=False,
+    ):
+        """Add an existing account and return its ID."""
+        account_id = account_id or self._next_id("9", digits=11)
+        self.accounts[account_id] = {
+            "Id": account_id,
+            "Arn": f"arn:aws:organizations::{MASTER_ACCOUNT_ID}:account/{account_id}",
+            "Email": email,
+            "Name": name,
+            "Status": "ACTIVE",
+            "JoinedMethod": "CREATED",
+            "JoinedTimestamp": datetime(2020, 1, 1, tzinfo=timezone.utc),
+        }
+        self.parents[account_id] = parent_id
+        self.tags[account_id] = dict(tags or {})
+        self.aliases[account_id] = [alias] if alias else []
+        self.contacts[account_id] = {}
+        for region in self.regions:
+            self.vpcs[(account_id, region)] = (
+                self._default_vpc() if default_vpc else None
+            )
+        return account_id
+
+    def _default_vpc(self):
+        return {
+            "VpcId": self._next_id("vpc-"),
+            "Subnets": [self._next_id("subnet-") for _ in range(3)],
+            "InternetGateways": [self._next_id("igw-")],
+        }
+
+    # botocore integration
+
+    def install(self, registry):
+        """Answer all requests of the clients created through the registry."""
+        registry.add_event_handler(
+            "before-parameter-build", self._before_parameter_build
+        )
+        registry.add_event_handler("before-send", self._before_send)
+
+    def uninstall(self, registry):
+        registry.remove_event_handler(
+            "before-parameter-build", self._before_parameter_build
+        )
+        registry.remove_event_handler("before-send", self._before_send)
+
+    def _before_parameter_build(self, params, model, **kwargs):
+        # Requests are sent from the thread that made the call, so the
+        # parameters of the current call are kept per thread
+        self._call.params = params
+        self._call.model = model
+
+        name = f"{model.service_model.service_id.hyphenize()}.{model.name}"
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _before_send(self, request, **kwargs):
+        model = self._call.model
+        service = model.service_model.service_id.hyphenize()
+        name = f"{service}.{model.name}"
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            throttled = self._random.random() < self._get(self.throttle_rate, service)
+
+        latency = self._get(self.latency, name, service)
+        if latency:
+            sleep(latency)
+
+        authorization = request.headers.get("Authorization", b"")
+        if isinstance(authorization, bytes):
+            authorization = authorization.decode()
+        match = _CREDENTIAL_PATTERN.search(authorization)
+        caller = self._get_caller(match.group(1) if match else "")
+        match = _REGION_PATTERN.search(request.url)
+        self._call.region = match.group(1) if match else None
+
+        try:
+            if throttled:
+                with self._lock:
+                    self.throttles += 1
+                raise FakeError(
+                    THROTTLING_ERRORS.get(service, "Throttling"), "Rate exceeded"
+                )
+
+            handler = getattr(
+                self, f"_{service.replace('-', '_')}_{_snake(model.name)}"
+            )
+            with self._lock:
+                result = handler(caller, **self._call.params)
+            return self._response(request, model, 200, self._serialize(model, result))
+        except FakeError as e:
+            return self._response(
+                request, model, e.status_code, self._serialize_error(model, e), e.code
+            )
+
+    @staticmethod
+    def _get(setting, *keys):
+        if not isinstance(setting, dict):
+            return setting
+        for key in keys:
+            if key in setting:
+                return setting[key]
+        return setting.get("default", 0)
+
+    def _get_caller(self, access_key_id):
+        # Assumed role credentials carry the account ID, see _sts_assume_role
+        if access_key_id.startswith("ASIA") and access_key_id[4:] in self.accounts:
+            return access_key_id[4:]
+        return MASTER_ACCOUNT_ID
+
+    def _page(self, name, items, NextToken=None, MaxResults=None):
+        start = int(NextToken or 0)
+        size = MaxResults or self._get(self.page_size, name)
+        page = items[start : start + size]
+        next_token = str(start + size) if start + size < len(items) else None
+        return page, next_token
+
+    # Serialization
+
+    @staticmethod
+    def _response(request, model, status_code, body, error_code=None):
+        headers = {"x-amzn-requestid": "fake-request-id"}
+        if error_code is not None:
+            headers["x-amzn-errortype"] = error_code
+        return AWSResponse(request.url, status_code, headers, _Raw(body.encode()))
+
+    def _serialize(self, model, result):
+        protocol = model.service_model.protocol
+        if protocol in ("json", "rest-json"):
+            return json.dumps(result, default=_json_default)
+
+        body = "".join(
+            _to_xml(shape, result.get(member), member)
+            for member, shape in (
+                model.output_shape.members.items() if model.output_shape else []
+            )
+            if result.get(member) is not None
+        )
+        if protocol == "ec2":
+            return (
+                f"<{model.name}Response>{body}"
+                f"<requestId>fake-request-id</requestId></{model.name}Response>"
+            )
+
+        wrapper = (
+            model.output_shape.serialization.get("resultWrapper", "")
+            if (model.output_shape)
+            else ""
+        )
+        if wrapper:
+            body = f"<{wrapper}>{body}</{wrapper}>"
+        return (
+            f"<{model.name}Response>{body}<ResponseMetadata>"
+            f"<RequestId>fake-request-id</RequestId></ResponseMetadata>"
+            f"</{model.name}Response>"
+        )
+
+    @staticmethod
+    def _serialize_error(model, error):
+        protocol = model.service_model.protocol
+        if protocol in ("json", "rest-json"):
+            return json.dumps({"__type": error.code, "message": error.message})
+
+        message = f"<Code>{error.code}</Code><Message>{escape(error.message)}</Message>"
+        if protocol == "ec2":
+            return (
+                f"<Response><Errors><Error>{message}</Error></Errors>"
+                f"<RequestID>fake-request-id</RequestID></Response>"
+            )
+        return (
+            f"<ErrorResponse><Error><Type>Sender</Type>{message}</Error>"
+            f"<RequestId>fake-request-id</RequestId></ErrorResponse>"
+        )
+
+    # Organizations
+
+    def _get_account(self, account_id):
+        if account_id not in self.accounts:
+            raise FakeError(
+                "AccountNotFoundException", f"Account {account_id} not found"
+            )
+        return self.accounts[account_id]
+
+    def _organizations_describe_organization(self, caller):
+        return {
+            "Organization": {
+                "Id": "o-fake",
+                "Arn": f"arn:aws:organizations::{MASTER_ACCOUNT_ID}:organization/o-fake",
+                "FeatureSet": "ALL",
+                "MasterAccountId": MASTER_ACCOUNT_ID,
+                "MasterAccountEmail": "master@example.com",
+            }
+        }
+
+    def _organizations_list_organizational_units_for_parent(
+        self, caller, ParentId, **kwargs
+    ):
+        ous = [
+            {"Id": ou["Id"], "Name": ou["Name"]}
+            for ou in self.ous.values()
+            if ou["ParentId"] == ParentId
+        ]
+        page, next_token = self._page(
+            "organizations.ListOrganizationalUnitsForParent", ous, **kwargs
+        )
+        return {"OrganizationalUnits": page, "NextToken": next_token}
+
+    def _organizations_list_accounts(self, caller, **kwargs):
+        page, next_token = self._page(
+            "organizations.ListAccounts", list(self.accounts.values()), **kwargs
+        )
+        return {"Accounts": page, "NextToken": next_token}
+
+    def _organizations_list_accounts_for_parent(self, caller, ParentId, **kwargs):
+        accounts = [
+            account
+            for account_id, account in self.accounts.items()
+            if self.parents[account_id] == ParentId
+        ]
+        page, next_token = self._page(
+            "organizations.ListAccountsForParent", accounts, **kwargs
+        )
+        return {"Accounts": page, "NextToken": next_token}
+
+    def _organizations_describe_account(self, caller, AccountId):
+        return {"Account": self._get_account(AccountId)}
+
+    def _organizations_list_parents(self, caller, ChildId, **kwargs):
+        self._get_account(ChildId)
+        parent_id = self.parents[ChildId]
+        parent_type = "ROOT" if parent_id == ROOT_OU_ID else "ORGANIZATIONAL_UNIT"
+        return {"Parents": [{"Id": parent_id, "Type": parent_type}]}
+
+    def _organizations_move_account(
+        self, caller, AccountId, SourceParentId, DestinationParentId
+    ):
+        self._get_account(AccountId)
+        if self.parents[AccountId] != SourceParentId:
+            raise FakeError("AccountNotFoundException", "Account not in source parent")
+        if DestinationParentId != ROOT_OU_ID and DestinationParentId not in self.ous:
+            raise FakeError("DestinationParentNotFoundException", DestinationParentId)
+        self.parents[AccountId] = DestinationParentId
+        return {}
+
+    def _organizations_list_tags_for_resource(self, caller, ResourceId, **kwargs):
+        self._get_account(ResourceId)
+        tags = [
+            {"Key": key, "Value": value} for key, value in self.tags[ResourceId].items()
+        ]
+        page, next_token = self._page(
+            "organizations.ListTagsForResource", tags, **kwargs
+        )
+        return {"Tags": page, "NextToken": next_token}
+
+    def _organizations_tag_resource(self, caller, ResourceId, Tags):
+        self._get_account(ResourceId)
+        self.tags[ResourceId].update({tag["Key"]: tag["Value"] for tag in Tags})
+        return {}
+
+    def _organizations_untag_resource(self, caller, ResourceId, TagKeys):
+        self._get_account(ResourceId)
+        for key in TagKeys:
+            self.tags[ResourceId].pop(key, None)
+        return {}
+
+    def _organizations_create_account(self, caller, Email, AccountName, **kwargs):
+        request_id = self._next_id("car-")
+        self.create_requests[request_id] = {
+            "Id": request_id,
+            "AccountName": AccountName,
+            "Email": Email,
+            "State": "IN_PROGRESS",
+            "RequestedTimestamp": datetime.now(timezone.utc),
+            "Ready": monotonic() + self.create_account_seconds,
+        }
+        return {"CreateAccountStatus": self._get_create_status(request_id)}
+
+    def _get_create_status(self, request_id):
+        request = self.create_requests[request_id]
+        if request["State"] == "IN_PROGRESS" and monotonic() >= request["Ready"]:
+            request["AccountId"] = self.add_account(
+                request["AccountName"], request["Email"]
+            )
+            request["State"] = "SUCCEEDED"
+            request["CompletedTimestamp"] = datetime.now(timezone.utc)
+        return {
+            key: value
+            for key, value in request.items()
+            if key not in ("Email", "Ready")
+        }
+
+    def _organizations_describe_create_account_status(
+        self, caller, CreateAccountRequestId
+    ):
+        if CreateAccountRequestId not in self.create_requests:
+            raise FakeError(
+                "CreateAccountStatusNotFoundException", CreateAccountRequestId
+            )
+        return {"CreateAccountStatus": self._get_create_status(CreateAccountRequestId)}
+
+    def _organizations_list_create_account_status(self, caller, States=(), **kwargs):
+        statuses = [
+            self._get_create_status(request_id) for request_id in self.create_requests
+        ]
+        statuses = [status for status in statuses if status["State"] in States]
+        page, next_token = self._page(
+            "organizations.ListCreateAccountStatus", statuses, **kwargs
+        )
+        return {"CreateAccountStatuses": page, "NextToken": next_token}
+
+    # Account
+
+    def _get_contacts(self, account_id):
+        if account_id not in self.contacts:
+            raise FakeError("AccessDeniedException", f"No access to {account_id}", 403)
+        return self.contacts[account_id]
+
+    def _account_get_alternate_contact(self, caller, AlternateContactType, **kwargs):
+        account_id = kwargs.get("AccountId", caller)
+        contact = self._get_contacts(account_id).get(AlternateContactType)
+        if contact is None:
+            raise FakeError("ResourceNotFoundException", "No contact", 404)
+        return {"AlternateContact": contact}
+
+    def _account_put_alternate_contact(self, caller, AlternateContactType, **kwargs):
+        account_id = kwargs.pop("AccountId", caller)
+        self._get_contacts(account_id)[AlternateContactType] = dict(
+            kwargs, AlternateContactType=AlternateContactType
+        )
+        return {}
+
+    def _account_delete_alternate_contact(self, caller, AlternateContactType, **kwargs):
+        account_id = kwargs.get("AccountId", caller)
+        if self._get_contacts(account_id).pop(AlternateContactType, None) is None:
+            raise FakeError("ResourceNotFoundException", "No contact", 404)
+        return {}
+
+    # STS
+
+    def _sts_assume_role(self, caller, RoleArn, RoleSessionName, **kwargs):
+        account_id = RoleArn.split(":")[4]
+        if account_id not in self.accounts:
+            raise FakeError("AccessDenied", f"Not authorized to assume {RoleArn}", 403)
+        return {
+            "Credentials": {
+                "AccessKeyId": f"ASIA{account_id}",
+                "SecretAccessKey": "fake-secret",
+                "SessionToken": "fake-token",
+                "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
+            },
+            "AssumedRoleUser": {
+                "AssumedRoleId": f"AROAFAKE:{RoleSessionName}",
+                "Arn": f"arn:aws:sts::{account_id}:assumed-role/{RoleSessionName}",
+            },
+        }
+
+    def _sts_get_caller_identity(self, caller):
+        return {
+            "UserId": "AIDAFAKE",
+            "Account": caller,
+            "Arn": f"arn:aws:iam::{caller}:user/benchmark",
+        }
+
+    # IAM
+
+    def _iam_create_account_alias(self, caller, AccountAlias):
+        if self.aliases[caller] == [AccountAlias]:
+            raise FakeError("EntityAlreadyExists", "Alias exists", 409)
+        self.aliases[caller] = [AccountAlias]
+        return {}
+
+    def _iam_list_account_aliases(self, caller, **kwargs):
+        return {"AccountAliases": self.aliases[caller], "IsTruncated": False}
+
+    # EC2
+
+    def _ec2_describe_regions(self, caller, **kwargs):
+        return {
+            "Regions": [
+                {
+                    "RegionName": region,
+                    "Endpoint": f"ec2.{region}.amazonaws.com",
+                    "OptInStatus": "opt-in-not-required",
+                }
+                for region in self.regions
+            ]
+        }
+
+    def _find_vpc(self, caller, vpc_id):
+        for (account_id, region), vpc in self.vpcs.items():
+            if account_id == caller and vpc is not None and vpc["VpcId"] == vpc_id:
+                return account_id, region, vpc
+        raise FakeError("InvalidVpcID.NotFound", f"VPC {vpc_id} not found")
+
+    @staticmethod
+    def _filter_values(filters, name):
+        for item in filters or []:
+            if item["Name"] == name:
+                return item["Values"]
+        return None
+
+    def _ec2_describe_vpcs(self, caller, Filters=None, **kwargs):
+        if self._filter_values(Filters, "isDefault") not in (None, ["true"]):
+            return {"Vpcs": []}
+        vpcs = [
+            {
+                "VpcId": vpc["VpcId"],
+                "IsDefault": True,
+                "CidrBlock": "172.31.0.0/16",
+                "State": "available",
+            }
+            for (account_id, region), vpc in self.vpcs.items()
+            if account_id == caller and region == self._call.region and vpc is not None
+        ]
+        return {"Vpcs": vpcs}
+
+    def _ec2_describe_subnets(self, caller, Filters=None, **kwargs):
+        vpc_ids = self._filter_values(Filters, "vpc-id") or []
+        subnets = []
+        for vpc_id in vpc_ids:
+            _, _, vpc = self._find_vpc(caller, vpc_id)
+            subnets.extend(
+                {"SubnetId": subnet_id, "VpcId": vpc_id} for subnet_id in vpc["Subnets"]
+            )
+        return {"Subnets": subnets}
+
+    def _ec2_describe_internet_gateways(self, caller, Filters=None, **kwargs):
+        vpc_ids = self._filter_values(Filters, "attachment.vpc-id") or []
+        gateways = []
+        for vpc_id in vpc_ids:
+            _, _, vpc = self._find_vpc(caller, vpc_id)
+            gateways.extend(
+                {
+                    "InternetGatewayId": igw_id,
+                    "Attachments": [{"VpcId": vpc_id, "State": "available"}],
+                }
+                for igw_id in vpc["InternetGateways"]
+            )
+        return {"InternetGateways": gateways}
+
+    def _get_vpc_in_region(self, caller):
+        vpc = self.vpcs.get((caller, self._call.region))
+        if vpc is None:
+            raise FakeError("InvalidVpcID.NotFound", "No default VPC")
+        return vpc
+
+    def _ec2_delete_subnet(self, caller, SubnetId, **kwargs):
+        vpc = self._get_vpc_in_region(caller)
+        if SubnetId not in vpc["Subnets"]:
+            raise FakeError("InvalidSubnetID.NotFound", SubnetId)
+        vpc["Subnets"].remove(SubnetId)
+        return {}
+
+    def _ec2_detach_internet_gateway(self, caller, InternetGatewayId, **kwargs):
+        self._get_vpc_in_region(caller)
+        return {}
+
+    def _ec2_delete_internet_gateway(self, caller, InternetGatewayId, **kwargs):
+        vpc = self._get_vpc_in_region(caller)
+        if InternetGatewayId in vpc["InternetGateways"]:
+            vpc["InternetGateways"].remove(InternetGatewayId)
+        return {}
+
+    def _ec2_delete_vpc(self, caller, VpcId, **kwargs):
+        vpc = self._get_vpc_in_region(caller)
+        if vpc["Subnets"] or vpc["InternetGateways"]:
+            raise FakeError("DependencyViolation", f"VPC {VpcId} has dependencies")
+        self.vpcs[(caller, self._call.region)] = None
+        return {}
+
+    # Inspection
+
+    def get_ou_path(self, ou_id):
+        """Returns the path of an OU in slash notation, '/' for the root."""
+        names = []
+        while ou_id != ROOT_OU_ID:
+            names.insert(0, self.ous[ou_id]["Name"])
+            ou_id = self.ous[ou_id]["ParentId"]
+        return "/" + "/".join(names)
+
+    def find_account_id(self, name):
+        """Returns the ID of the account with the given name, None if not found."""
+        for account_id, account in self.accounts.items():
+            if account["Name"] == name:
+                return account_id
+        return None
+
+    # Reporting
+
+    def report(self):
+        """Returns the calls and requests per operation."""
+        with self._lock:
+            return {
+                "Calls": sum(self.calls.values()),
+                "Requests": sum(self.requests.values()),
+                "Throttles": self.throttles,
+                "Operations": dict(sorted(self.calls.items())),
+            }
+
+
+def _snake(name):
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    raise TypeError(f"Can't serialize {value!r}")
+
+
+def _to_xml(shape, value, name):
+    tag = shape.serialization.get("name", name)
+
+    if shape.type_name == "structure":
+        body = "".join(
+            _to_xml(member_shape, value.get(member), member)
+            for member, member_shape in shape.members.items()
+            if value.get(member) is not None
+        )
+    elif shape.type_name == "list":
+        member_name = shape.member.serialization.get("name", "member")
+        body = "".join(_to_xml(shape.member, item, member_name) for item in value)
+        if shape.serialization.get("flattened"):
+            return body
+    elif shape.type_name == "boolean":
+        body = "true" if value else "false"
+    elif shape.type_name == "timestamp":
+        body = value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    else:
+        body = escape(str(value))
+
+    return f"<{tag}>{body}</{tag}>"
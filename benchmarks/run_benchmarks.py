@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Benchmark awsaccountmgr against a simulated organization.
+
+Each scenario is run for organizations of increasing size against the fake
+backend in fake_aws.py. The wall time and the amount of API calls are compared
+with a baseline file, and the script exits with 1 when either one regressed.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 10 100 --latency 0.05
+    python benchmarks/run_benchmarks.py --update-baseline
+    python benchmarks/run_benchmarks.py --rate-limits
+"""
+import json
+import logging
+import os
+import runpy
+import sys
+import tempfile
+from argparse import ArgumentParser
+from time import monotonic
+
+import yaml
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_FOLDER)
+
+# Never talk to a real AWS account, every request is answered by the fake
+os.environ.update(
+    {
+        "AWS_ACCESS_KEY_ID": "AKIDBENCHMARK",
+        "AWS_SECRET_ACCESS_KEY": "benchmark",
+        "AWS_DEFAULT_REGION": "us-east-1",
+        "AWS_CONFIG_FILE": os.devnull,
+        "AWS_SHARED_CREDENTIALS_FILE": os.devnull,
+        "AWS_EC2_METADATA_DISABLED": "true",
+    }
+)
+for variable in ("AWS_PROFILE", "AWS_SESSION_TOKEN"):
+    os.environ.pop(variable, None)
+
+from awsaccountmgr import Organization, registry  # noqa: E402
+from awsaccountmgr.metrics import api_metrics  # noqa: E402
+from awsaccountmgr.ratelimit import (  # noqa: E402
+    DEFAULT_OPERATION_RATES,
+    DEFAULT_SERVICE_RATES,
+    rate_limiter,
+)
+from awsaccountmgr.retry import retry_policy  # noqa: E402
+from awsaccountmgr.sts import credential_cache  # noqa: E402
+from fake_aws import MASTER_ACCOUNT_ID, ROOT_OU_ID, FakeAws  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_SIZES = [10, 100, 1000, 5000]
+# The default rate limits pace all Organizations calls through the master
+# account, so larger organizations take too long to benchmark with them on
+RATE_LIMITS_BASELINE = os.path.join(
+    os.path.dirname(__file__), "baseline-rate-limits.json"
+)
+RATE_LIMITS_SIZES = [10, 100]
+SCENARIOS = ["organization", "reconcile"]
+
+TOP_LEVEL_OUS = ["dev", "test", "acc", "prod"]
+CHILD_OUS = ["eu", "us", "ap"]
+
+
+def build_organization(fake, size):
+    """Fill the fake with OUs and size accounts, and return their configuration.
+
+    Most accounts already match their configuration. A fixed share of them is
+    in the wrong OU, has outdated tags, misses its alias or alternate contact,
+    still has default VPCs, or doesn't exist yet.
+
+    :return: Dict of {top-level OU name: list of account configurations}
+    """
+    ou_ids = {}
+    for name in TOP_LEVEL_OUS:
+        parent_id = fake.add_ou(name)
+        ou_ids[f"/{name}"] = parent_id
+        for child in CHILD_OUS:
+            ou_ids[f"/{name}/{child}"] = fake.add_ou(child, parent_id)
+    ou_paths = sorted(ou_ids)
+
+    configs = {name: [] for name in TOP_LEVEL_OUS}
+    for index in range(size):
+        name = f"account-{index:05d}"
+        ou_path = ou_paths[index % len(ou_paths)]
+        config = {
+            "AccountFullName": name,
+            "OrganizationalUnitPath": ou_path,
+            "Email": f"{name}@example.com",
+            "Tags": {"CostCenter": str(index % 7), "Owner": "benchmark"},
+        }
+        if index % 10 == 5:
+            config["AlternateContacts"] = {
+                "Security": {
+                    "Email": "security@example.com",
+                    "Name": "Security",
+                    "PhoneNumber": "+31000000000",
+                    "Title": "Security",
+                }
+            }
+        if index % 50 == 3:
+            config["DeleteDefaultVPC"] = True
+        configs[ou_path.split("/")[1]].append(config)
+
+        if index % 100 == 4:
+            continue  # Created during the reconcile
+
+        tags = dict(config["Tags"])
+        if index % 10 == 1:
+            tags["CostCenter"] = "outdated"
+        fake.add_account(
+            name,
+            config["Email"],
+            ROOT_OU_ID if index % 10 == 0 else ou_ids[ou_path],
+            tags=tags,
+            alias=None if index % 20 == 2 else name,
+            default_vpc=index % 50 == 3,
+        )
+
+    return configs
+
+
+def run_organization(fake, configs, args):
+    """Look up the ID, parent OU and OU path of every configured account."""
+    organization = Organization(ROOT_OU_ID, ("ASIA" + MASTER_ACCOUNT_ID, "x", "x"))
+    for accounts in configs.values():
+        for account in accounts:
+            account_id = organization.get_account_id(account["AccountFullName"])
+            if account_id is not None:
+                parent_id = organization.get_account_parent_id(account_id)
+                organization.ou_tree.get_path(parent_id)
+            organization.get_ou_id(account["OrganizationalUnitPath"])
+    return True
+
+
+def run_reconcile(fake, configs, args):
+    """Run the command line tool on configuration files for all accounts."""
+    with tempfile.TemporaryDirectory() as folder:
+        config_folder = os.path.join(folder, "config")
+        os.mkdir(config_folder)
+        for name, accounts in configs.items():
+            with open(os.path.join(config_folder, f"{name}.yml"), "w") as stream:
+                yaml.safe_dump({"Accounts": accounts}, stream)
+
+        argv = [
+            "awsaccountmgr",
+            ROOT_OU_ID,
+            config_folder,
+            "--full",
+            "--workers",
+            str(args.workers),
+            "--backend",
+            args.backend,
+            "--logging-level",
+            "WARNING",
+            "--state-file",
+            os.path.join(folder, "state.sqlite"),
+        ]
+        sys.argv = argv
+        try:
+            runpy.run_path(
+                os.path.join(ROOT_FOLDER, "bin", "awsaccountmgr"), run_name="__main__"
+            )
+        except SystemExit as e:
+            if e.code:
+                return False
+
+    return is_reconciled(fake, configs)
+
+
+def is_reconciled(fake, configs):
+    """Check that the fake organization matches the configuration."""
+    account_ids = {
+        account["Name"]: account_id for account_id, account in fake.accounts.items()
+    }
+    for accounts in configs.values():
+        for config in accounts:
+            account_id = account_ids.get(config["AccountFullName"])
+            vpcs = [fake.vpcs.get((account_id, region)) for region in fake.regions]
+            if (
+                account_id is None
+                or fake.get_ou_path(fake.parents[account_id])
+                != config["OrganizationalUnitPath"]
+                or fake.tags[account_id] != config["Tags"]
+                or fake.aliases[account_id] != [config["AccountFullName"]]
+                or sorted(fake.contacts[account_id])
+                != sorted(key.upper() for key in config.get("AlternateContacts", {}))
+                or (config.get("DeleteDefaultVPC") and any(vpcs))
+            ):
+                logging.error(f"Account {config['AccountFullName']} not reconciled")
+                return False
+    return True
+
+
+def run_scenario(scenario, size, args):
+    """Run a single scenario and return its measurements."""
+    registry.clear()
+    credential_cache.clear()
+    api_metrics.clear()
+    retry_policy.stats.clear()
+    if args.rate_limits:
+        rate_limiter.configure(DEFAULT_SERVICE_RATES, DEFAULT_OPERATION_RATES)
+    else:
+        # A rate of 0 disables the limit
+        rate_limiter.configure(
+            {service: 0 for service in DEFAULT_SERVICE_RATES},
+            {operation: 0 for operation in DEFAULT_OPERATION_RATES},
+        )
+
+    fake = FakeAws(
+        latency=args.latency,
+        page_size=args.page_size,
+        throttle_rate=args.throttle_rate,
+        regions=args.regions,
+    )
+    configs = build_organization(fake, size)
+    fake.install(registry)
+    try:
+        start = monotonic()
+        succeeded = globals()[f"run_{scenario}"](fake, configs, args)
+        seconds = monotonic() - start
+    finally:
+        fake.uninstall(registry)
+
+    return dict(fake.report(), Seconds=round(seconds, 3), Succeeded=succeeded)
+
+
+def compare(results, baseline, args):
+    """Returns the list of regressions compared to the baseline results."""
+    regressions = []
+    for scenario, sizes in results.items():
+        for size, result in sizes.items():
+            expected = baseline.get(scenario, {}).get(size)
+            if expected is None:
+                continue
+
+            max_seconds = expected["Seconds"] * (1 + args.time_tolerance) + 0.25
+            if result["Seconds"] > max_seconds:
+                regressions.append(
+                    f"{scenario} {size}: took {result['Seconds']:.2f}s, "
+                    f"baseline {expected['Seconds']:.2f}s"
+                )
+            if result["Calls"] > expected["Calls"] * (1 + args.call_tolerance):
+                regressions.append(
+                    f"{scenario} {size}: made {result['Calls']} calls, "
+                    f"baseline {expected['Calls']}"
+                )
+    return regressions
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    settings = {
+        "Latency": args.latency,
+        "PageSize": args.page_size,
+        "ThrottleRate": args.throttle_rate,
+        "Regions": args.regions,
+        "Workers": args.workers,
+        "Backend": args.backend,
+        "RateLimits": args.rate_limits,
+    }
+
+    results = {}
+    for scenario in args.scenarios:
+        results[scenario] = {}
+        for size in args.sizes:
+            result = run_scenario(scenario, size, args)
+            results[scenario][str(size)] = result
+            print(
+                f"{scenario:>12} {size:>6} accounts: {result['Seconds']:8.2f}s "
+                f"{result['Calls']:7} calls {result['Requests']:7} requests "
+                f"{result['Throttles']:5} throttled"
+                + ("" if result["Succeeded"] else "  FAILED")
+            )
+
+    report = {"Settings": settings, "Results": results}
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(report, stream, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as stream:
+            json.dump(report, stream, indent=2)
+            stream.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    failed = [
+        f"{scenario} {size}: run failed"
+        for scenario, sizes in results.items()
+        for size, result in sizes.items()
+        if not result["Succeeded"]
+    ]
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as stream:
+            baseline = json.load(stream)
+        if baseline["Settings"] != settings:
+            print(
+                f"Baseline was recorded with different settings: {baseline['Settings']}"
+            )
+            sys.exit(2)
+        failed.extend(compare(results, baseline["Results"], args))
+    else:
+        print(f"No baseline found at {args.baseline}, use --update-baseline")
+
+    if failed:
+        print("Regressions:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="The amounts of accounts to benchmark, defaults to 10 100 1000 5000, "
+        "or 10 100 with --rate-limits",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=SCENARIOS,
+        default=SCENARIOS,
+        help="The scenarios to run, defaults to all",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds every simulated API request takes, defaults to 0",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=20,
+        help="Maximum amount of items per page of list calls, defaults to 20",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests that are throttled, defaults to 0",
+    )
+    parser.add_argument(
+        "--regions",
+        type=int,
+        default=3,
+        help="The amount of enabled regions, defaults to 3",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=16,
+        help="The amount of accounts to reconcile concurrently, defaults to 16",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["threads", "asyncio"],
+        default="threads",
+        help="The reconcile backend of the command line tool, defaults to threads",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="Keep the default client side rate limits, by default they are lifted "
+        "so the benchmark measures the tool instead of the limits",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="The baseline file to compare with, defaults to benchmarks/baseline.json, "
+        "or benchmarks/baseline-rate-limits.json with --rate-limits",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing",
+    )
+    parser.add_argument(
+        "--time-tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed relative increase of the wall time, defaults to 0.5",
+    )
+    parser.add_argument(
+        "--call-tolerance",
+        type=float,
+        default=0.0,
+        help="Allowed relative increase of the amount of API calls, defaults to 0",
+    )
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+
+    args = parser.parse_args()
+    if args.sizes is None:
+        args.sizes = RATE_LIMITS_SIZES if args.rate_limits else DEFAULT_SIZES
+    if args.baseline is None:
+        args.baseline = RATE_LIMITS_BASELINE if args.rate_limits else DEFAULT_BASELINE
+
+    return args
+
+
+if __name__ == "__main__":
+    main()
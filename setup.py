@@ -20,11 +20,11 @@ setuptools.setup(
     url="https://github.com/thiezn/awsaccountmgr/",
     packages=setuptools.find_packages(),
     classifiers=[
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    install_requires=["boto3", "pyyaml"],
+    python_requires=">=3.7",
+    install_requires=["boto3", "pyyaml>=5.1"],
     scripts=["bin/awsaccountmgr"],
 )
@@ -0,0 +1,56 @@
+import os
+import sys
+import pytest
+
+# The fake AWS backend of the benchmarks answers the requests of the tests
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+)
+
+from fake_aws import MASTER_ACCOUNT_ID, ROOT_OU_ID, FakeAws  # noqa: E402
+from awsaccountmgr.metrics import api_metrics  # noqa: E402
+from awsaccountmgr.ratelimit import rate_limiter  # noqa: E402
+from awsaccountmgr.retry import retry_policy  # noqa: E402
+from awsaccountmgr.session import registry  # noqa: E402
+from awsaccountmgr.sts import credential_cache  # noqa: E402
+
+MASTER_CREDENTIALS = ("ASIA" + MASTER_ACCOUNT_ID, "fake-secret", "fake-token")
+
+
+def _clear():
+    registry.clear()
+    credential_cache.clear()
+    api_metrics.clear()
+    retry_policy.stats.clear()
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    """A FakeAws organization answering all calls made through the registry."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIDTEST")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_CONFIG_FILE", os.devnull)
+    monkeypatch.setenv("AWS_SHARED_CREDENTIALS_FILE", os.devnull)
+    monkeypatch.setenv("AWS_EC2_METADATA_DISABLED", "true")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    monkeypatch.delenv("AWS_SESSION_TOKEN", raising=False)
+
+    # Lift the rate limits, the tests count calls instead of pacing them
+    monkeypatch.setattr(rate_limiter, "service_rates", {})
+    monkeypatch.setattr(rate_limiter, "operation_rates", {})
+    rate_limiter.configure()
+
+    _clear()
+    fake = FakeAws(regions=2)
+    fake.install(registry)
+    yield fake
+    fake.uninstall(registry)
+    _clear()
+
+
+@pytest.fixture
+def organization(fake):
+    from awsaccountmgr.organization import Organization
+
+    return Organization(ROOT_OU_ID, MASTER_CREDENTIALS)
@@ -0,0 +1,132 @@
+import pytest
+import yaml
+from awsaccountmgr.configparser import (
+    ConfigValidationError,
+    get_config_errors,
+    get_duplicate_errors,
+    read_config_files,
+)
+
+
+def account(name, **config):
+    return dict(
+        {
+            "AccountFullName": name,
+            "OrganizationalUnitPath": "/dev",
+            "Email": f"{name}@example.com",
+        },
+        **config,
+    )
+
+
+def duplicates(*accounts):
+    return get_duplicate_errors(
+        [(f"{index}.yml", account) for index, account in enumerate(accounts)]
+    )
+
+
+def test_unique_accounts():
+    assert duplicates(account("a"), account("b"), account("c", Alias="other")) == []
+
+
+def test_duplicate_names_and_emails():
+    errors = duplicates(account("a"), account("a", Email="A@example.com "))
+
+    assert errors == [
+        "1.yml: Duplicate AccountFullName a, already defined in 0.yml",
+        "1.yml: Duplicate Email a@example.com, already defined in 0.yml",
+    ]
+
+
+def test_explicit_alias_before_default_alias():
+    errors = duplicates(account("a", Alias="shared"), account("shared"))
+
+    assert errors == ["1.yml: Duplicate Alias shared, already defined in 0.yml"]
+
+
+def test_default_alias_before_explicit_alias():
+    errors = duplicates(account("shared"), account("a", Alias="shared"))
+
+    assert errors == ["1.yml: Duplicate Alias shared, already defined in 0.yml"]
+
+
+def test_duplicate_explicit_aliases():
+    errors = duplicates(account("a", Alias="x"), account("b", Alias="x"))
+
+    assert errors == ["1.yml: Duplicate Alias x, already defined in 0.yml"]
+
+
+def test_explicit_alias_clashes_with_later_account():
+    # Two default aliases of duplicate names are reported as duplicate names only
+    errors = duplicates(account("x"), account("x"), account("a", Alias="x"))
+
+    assert errors == [
+        "1.yml: Duplicate AccountFullName x, already defined in 0.yml",
+        "1.yml: Duplicate Email x@example.com, already defined in 0.yml",
+        "2.yml: Duplicate Alias x, already defined in 0.yml",
+    ]
+
+
+def test_alias_set_to_own_name_is_the_default():
+    assert duplicates(account("a", Alias="a"), account("b")) == []
+
+
+@pytest.mark.parametrize("order", [1, -1])
+def test_accounts_without_alias_dont_clash(order):
+    accounts = [account("shared", Alias=False), account("a", Alias="shared")]
+
+    assert duplicates(*accounts[::order]) == []
+
+
+def test_config_errors():
+    errors = get_config_errors(
+        [
+            {"OrganizationalUnitPath": "/dev"},
+            account("a", DeleteDefaultVPC="yes", Alias=1, Unknown=True),
+            account("b", Tags=[{"Owner": "x"}, {"Owner": "y"}, "z"]),
+            "invalid",
+        ]
+    )
+
+    assert errors == [
+        "Missing AccountFullName in configuration: {'OrganizationalUnitPath': '/dev'}",
+        "a DeleteDefaultVPC param should be Boolean",
+        "a Alias param should be String or False",
+        "Key Unknown not supported in configuration: "
+        f"{account('a', DeleteDefaultVPC='yes', Alias=1, Unknown=True)}",
+        "b Tag Owner is defined more than once",
+        "b Tags should be a Dict but found z",
+        "Configuration invalid: invalid",
+    ]
+
+
+def write(folder, name, content):
+    with open(folder / name, "w") as stream:
+        stream.write(content if isinstance(content, str) else yaml.safe_dump(content))
+
+
+def test_read_config_files(tmp_path):
+    write(tmp_path, "b.yml", {"Accounts": [account("b")]})
+    write(tmp_path, "a.yaml", {"Accounts": [account("a", Alias=False)]})
+    write(tmp_path, "notes.txt", "not a config file")
+
+    accounts = read_config_files(str(tmp_path))
+
+    assert [account.full_name for account in accounts] == ["a", "b"]
+    assert accounts[0].alias is None
+
+
+def test_read_config_files_reports_all_errors(tmp_path):
+    write(tmp_path, "a.yml", {"Accounts": [account("a"), account("b", Alias="a")]})
+    write(tmp_path, "b.yml", {"Other": []})
+    write(tmp_path, "c.yml", "Accounts: [")
+
+    with pytest.raises(ConfigValidationError) as error:
+        read_config_files(str(tmp_path))
+
+    errors = error.value.errors
+    assert len(errors) == 3
+    assert errors[0].endswith("b.yml: Missing Accounts key in configuration")
+    assert "c.yml: Could not parse file" in errors[1]
+    path = tmp_path / "a.yml"
+    assert errors[2] == f"{path}: Duplicate Alias a, already defined in {path}"
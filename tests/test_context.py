@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from awsaccountmgr.context import bind_context
+from awsaccountmgr.metrics import _labels, api_metrics
+from awsaccountmgr.tracing import Tracer
+
+
+def test_bound_function_runs_in_context_of_caller():
+    tracer = Tracer()
+    tracer.enable()
+
+    def work():
+        with tracer.span("work"):
+            return _labels.get()
+
+    with api_metrics.context(account="a", step="plan"), tracer.span("plan"):
+        bound = bind_context(work)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert executor.submit(bound).result() == {"account": "a", "step": "plan"}
+        assert executor.submit(work).result() == {}
+
+    plan = next(span for span in tracer.spans if span.name == "plan")
+    assert [span.parent for span in tracer.spans if span.name == "work"] == [
+        plan,
+        None,
+    ]
+
+
+def test_bound_function_runs_concurrently():
+    barrier = Barrier(4, timeout=2)
+
+    def work(index):
+        barrier.wait()
+        with api_metrics.context(step=str(index)):
+            return _labels.get()["step"]
+
+    with api_metrics.context(account="a"):
+        bound = bind_context(work)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(bound, range(4))) == ["0", "1", "2", "3"]
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import pytest
+from awsaccountmgr.configparser import ConfigValidationError, read_config_files
+from awsaccountmgr.inventory import (
+    export_accounts,
+    get_config_filename,
+    import_accounts,
+    parse_fields,
+)
+from awsaccountmgr.plan import Planner
+
+SECURITY = {
+    "AlternateContactType": "SECURITY",
+    "EmailAddress": "security@example.com",
+    "Name": "Security",
+    "PhoneNumber": "+31000000000",
+    "Title": "Security",
+}
+
+
+@pytest.fixture
+def accounts(fake):
+    us_id = fake.add_ou("us")
+    dev_id = fake.add_ou("dev", us_id)
+    dev = fake.add_account(
+        "dev", "dev@example.com", dev_id, tags={"Owner": "team"}, alias="dev-alias"
+    )
+    fake.contacts[dev]["SECURITY"] = SECURITY
+    shared = fake.add_account("shared", "shared@example.com")
+    return {"dev": dev, "shared": shared}
+
+
+def test_parse_fields():
+    assert parse_fields("Id, Name,") == ["Id", "Name"]
+    assert len(parse_fields("")) == 11
+    with pytest.raises(ValueError):
+        parse_fields("Id,Unknown")
+
+
+@pytest.mark.parametrize(
+    "ou_path, filename",
+    [("/", "root.yml"), ("/us/dev", "us.yml"), ("/Team A/dev", "Team-A.yml")],
+)
+def test_get_config_filename(ou_path, filename):
+    assert get_config_filename(ou_path) == filename
+
+
+def test_export_jsonl(accounts, organization):
+    stream = io.StringIO()
+
+    # The master account is part of the organization as well
+    assert export_accounts(organization, stream) == (3, 0)
+
+    records = {
+        record["Name"]: record
+        for record in map(json.loads, stream.getvalue().splitlines())
+    }
+    assert records["dev"]["Id"] == accounts["dev"]
+    assert records["dev"]["OrganizationalUnitPath"] == "/us/dev"
+    assert records["dev"]["Tags"] == {"Owner": "team"}
+    assert records["dev"]["Alias"] == "dev-alias"
+    assert records["dev"]["AlternateContacts"]["Security"]["Email"] == (
+        "security@example.com"
+    )
+    assert records["shared"]["OrganizationalUnitPath"] == "/"
+    assert records["shared"]["Alias"] is None
+
+
+def test_export_csv_without_details(fake, accounts, organization):
+    stream = io.StringIO()
+
+    export_accounts(organization, stream, "csv", ["Name", "OrganizationalUnitPath"])
+
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+    assert sorted((row["Name"], row["OrganizationalUnitPath"]) for row in rows) == [
+        ("dev", "/us/dev"),
+        ("master", "/"),
+        ("shared", "/"),
+    ]
+    assert "organizations.ListTagsForResource" not in fake.calls
+
+
+def test_import_round_trip(accounts, organization, tmp_path):
+    folder = str(tmp_path / "accounts")
+
+    files, failed = import_accounts(organization, folder)
+
+    assert files == {"us.yml": 1, "root.yml": 2}
+    assert failed == 0
+    imported = read_config_files(folder)
+    assert [account.full_name for account in imported] == ["master", "shared", "dev"]
+    # Applying the imported configuration doesn't change any account
+    plans = Planner(organization, check_default_vpcs=False).plan(imported)
+    assert [plan.account_id for plan in plans[1:]] == [
+        accounts["shared"],
+        accounts["dev"],
+    ]
+    assert not any(plan.has_changes for plan in plans)
+
+
+def test_import_keeps_existing_files(accounts, organization, tmp_path):
+    import_accounts(organization, str(tmp_path))
+
+    with pytest.raises(FileExistsError):
+        import_accounts(organization, str(tmp_path))
+    import_accounts(organization, str(tmp_path), overwrite=True)
+
+
+def test_import_rejects_duplicates(fake, accounts, organization, tmp_path):
+    fake.add_account("dev", "other@example.com")
+
+    with pytest.raises(ConfigValidationError):
+        import_accounts(organization, str(tmp_path))
+
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,257 @@
+from datetime import datetime, timezone
+import pytest
+from fake_aws import MASTER_ACCOUNT_ID, ROOT_OU_ID
+from awsaccountmgr.account import AlternateContact
+from awsaccountmgr.organization import (
+    CreateAccountPoller,
+    Organization,
+    OrganizationalUnitTree,
+)
+from awsaccountmgr.sts import credential_cache
+
+
+def test_diff_tags():
+    current = {"Owner": "team-a", "CostCenter": "1", "Old": "x"}
+    desired = {"Owner": "team-b", "CostCenter": "1", "New": "y"}
+
+    assert Organization.diff_tags(current, desired) == (
+        {"Owner": "team-b", "New": "y"},
+        ["Old"],
+    )
+
+
+def test_diff_tags_up_to_date():
+    tags = {"Owner": "team-a"}
+
+    assert Organization.diff_tags(tags, dict(tags)) == ({}, [])
+
+
+def test_diff_tags_keeps_aws_tags():
+    current = {"aws:cloudformation:stack-name": "stack", "b": "1", "a": "1"}
+
+    assert Organization.diff_tags(current, {}) == ({}, ["a", "b"])
+
+
+def contact(contact_type, name):
+    return AlternateContact(contact_type, name, f"{name}@example.com")
+
+
+def test_diff_alternate_contacts():
+    current = {
+        "BILLING": contact("BILLING", "billing"),
+        "SECURITY": contact("SECURITY", "security"),
+        "OPERATIONS": None,
+    }
+    desired = {
+        "Billing": contact("BILLING", "billing"),
+        "Security": contact("SECURITY", "new-security"),
+        "Operations": contact("OPERATIONS", "operations"),
+    }
+
+    assert Organization.diff_alternate_contacts(current, desired) == {
+        "SECURITY": desired["Security"],
+        "OPERATIONS": desired["Operations"],
+    }
+
+
+def test_diff_alternate_contacts_removes():
+    current = {"BILLING": contact("BILLING", "billing"), "SECURITY": None}
+    desired = {"Billing": None, "Security": None}
+
+    assert Organization.diff_alternate_contacts(current, desired) == {"BILLING": None}
+
+
+def test_diff_alternate_contacts_ignores_unconfigured_types():
+    current = {"BILLING": contact("BILLING", "billing")}
+
+    assert Organization.diff_alternate_contacts(current, {}) == {}
+
+
+def test_account_index_is_built_once(fake, organization):
+    account_id = fake.add_account("dev", "Dev@Example.com")
+
+    assert organization.get_account_id(" dev ") == account_id
+    assert organization.get_account(account_id)["Name"] == "dev"
+    assert organization.get_account("dev@example.com")["Id"] == account_id
+    assert organization.get_account_id("missing") is None
+    assert fake.calls["organizations.ListAccounts"] == 1
+
+
+def test_refresh_account_adds_new_account(fake, organization):
+    assert organization.get_account_id("new") is None
+
+    account_id = fake.add_account("new", "new@example.com")
+    organization.refresh_account(account_id)
+
+    assert organization.get_account_id("new") == account_id
+    assert fake.calls["organizations.ListAccounts"] == 1
+
+
+def test_invalidate_account_index(fake, organization):
+    assert organization.get_account_id("new") is None
+    account_id = fake.add_account("new", "new@example.com")
+
+    organization.invalidate_account_index()
+
+    assert organization.get_account_id("new") == account_id
+    assert fake.calls["organizations.ListAccounts"] == 2
+
+
+class Children:
+    """Lists the child OUs of a parent and counts the calls."""
+
+    OUS = {
+        "r-root": [{"Id": "ou-us", "Name": "us"}, {"Id": "ou-eu", "Name": "eu"}],
+        "ou-us": [{"Id": "ou-us-dev", "Name": "dev"}],
+        "ou-eu": [{"Id": "ou-eu-dev", "Name": "dev"}],
+        "ou-us-dev": [],
+        "ou-eu-dev": [],
+    }
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, parent_id):
+        self.calls.append(parent_id)
+        return self.OUS[parent_id]
+
+
+@pytest.mark.parametrize("path", ["/us/dev", "us/dev", "us/dev/", " us//dev "])
+def test_ou_tree_normalizes_paths(path):
+    tree = OrganizationalUnitTree("r-root", Children())
+
+    assert tree.get_id(path) == "ou-us-dev"
+
+
+def test_ou_tree_lists_children_once():
+    children = Children()
+    tree = OrganizationalUnitTree("r-root", children)
+
+    assert tree.get_id("/us/dev") == "ou-us-dev"
+    assert tree.get_id("/us") == "ou-us"
+    assert tree.get_id("/eu/dev") == "ou-eu-dev"
+    assert tree.get_id("/") == tree.get_id("r-root") == "r-root"
+    assert children.calls == ["r-root", "ou-us", "ou-eu"]
+
+
+def test_ou_tree_unknown_path():
+    tree = OrganizationalUnitTree("r-root", Children())
+
+    with pytest.raises(ValueError):
+        tree.get_id("/us/test")
+
+
+def test_ou_tree_get_path_crawls_tree():
+    children = Children()
+    tree = OrganizationalUnitTree("r-root", children)
+
+    assert tree.get_path("ou-eu-dev") == "/eu/dev"
+    assert tree.get_path("r-root") == "/"
+    assert len(children.calls) == 5
+    with pytest.raises(ValueError):
+        tree.get_path("ou-missing")
+
+
+def test_ou_tree_invalidate():
+    children = Children()
+    tree = OrganizationalUnitTree("r-root", children)
+    tree.get_id("/us")
+
+    tree.invalidate()
+    tree.get_id("/us")
+
+    assert children.calls == ["r-root", "r-root"]
+
+
+def test_get_ou_id_of_nested_path(fake, organization):
+    us_id = fake.add_ou("us")
+    dev_id = fake.add_ou("dev", us_id)
+
+    assert organization.get_ou_id("us/dev") == dev_id
+    assert organization.get_ou_id("dev", parent_ou_id=us_id) == dev_id
+    assert organization.get_ou_id("/") == organization.root_ou_id
+
+
+def test_account_parents_are_read_per_ou(fake, organization):
+    us_id = fake.add_ou("us")
+    dev_id = fake.add_ou("dev", us_id)
+    account_ids = [
+        fake.add_account(f"dev-{index}", f"{index}@x.com", dev_id) for index in range(3)
+    ]
+    root_account_id = fake.add_account("root", "root@x.com")
+
+    assert [
+        organization.get_account_parent_id(account_id) for account_id in account_ids
+    ] == [dev_id] * 3
+    assert (
+        organization.get_account_parent_id(root_account_id) == organization.root_ou_id
+    )
+    # One call per OU, no list_parents for accounts in the map
+    assert fake.calls["organizations.ListAccountsForParent"] == 3
+    assert "organizations.ListParents" not in fake.calls
+
+
+def test_new_account_parent_falls_back_to_list_parents(fake, organization):
+    organization.get_account_parent_id(fake.add_account("a", "a@x.com"))
+    us_id = fake.add_ou("us")
+
+    new_account_id = fake.add_account("new", "new@x.com", us_id)
+
+    assert organization.get_account_parent_id(new_account_id) == us_id
+    assert organization.get_account_parent_id(new_account_id) == us_id
+    assert fake.calls["organizations.ListParents"] == 1
+
+
+def test_few_expected_parent_lookups_skip_the_map(fake):
+    account_ids = [
+        fake.add_account(f"a-{index}", f"{index}@x.com") for index in range(40)
+    ]
+    credentials = ("ASIA" + MASTER_ACCOUNT_ID, "x", "x")
+    organization = Organization(ROOT_OU_ID, credentials, expected_parent_lookups=1)
+
+    assert organization.get_account_parent_id(account_ids[0]) == ROOT_OU_ID
+    assert "organizations.ListAccountsForParent" not in fake.calls
+    assert fake.calls["organizations.ListParents"] == 1
+
+
+def test_master_clients_use_refreshed_role_credentials(fake, organization):
+    organization.list_organizational_units_for_parent(ROOT_OU_ID)
+    key = (
+        MASTER_ACCOUNT_ID,
+        "OrganizationAccountAccessRole",
+        organization._master_credentials[0],
+    )
+
+    # Let the cached credentials of the master account role expire
+    credentials = credential_cache.peek(key)
+    credential_cache._entries[key] = (credentials, datetime.now(timezone.utc))
+    organization.list_organizational_units_for_parent(ROOT_OU_ID)
+
+    assert fake.calls["sts.AssumeRole"] == 2
+
+
+def test_master_credentials_are_looked_up_on_every_use(fake):
+    credentials = [("ASIA" + MASTER_ACCOUNT_ID, "x", "x")]
+    organization = Organization(ROOT_OU_ID, lambda: credentials[-1])
+
+    credentials.append(("AKIAREFRESHED", "y", "y"))
+    organization.list_organizational_units_for_parent(ROOT_OU_ID)
+
+    assert organization._master_credentials == credentials[-1]
+    assert credential_cache.peek(
+        (MASTER_ACCOUNT_ID, "OrganizationAccountAccessRole", "AKIAREFRESHED")
+    )
+
+
+def test_create_account_poller():
+    poller = CreateAccountPoller(["car-1", "car-2"], max_poll_interval=4)
+
+    assert poller.to_describe({"car-1"}) == ["car-2"]
+    assert not poller.complete({"Id": "car-2", "State": "IN_PROGRESS"})
+    assert [poller.next_interval() for _ in range(4)] == [1, 2, 4, 4]
+
+    assert poller.complete({"Id": "car-2", "State": "FAILED"})
+    assert poller.in_progress == ["car-1"]
+    # The interval is reset when a request completed in the round
+    assert poller.next_interval() == 1
+    assert poller.next_interval() == 2
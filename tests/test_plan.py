@@ -0,0 +1,153 @@
+from fake_aws import REGIONS
+from awsaccountmgr.account import Account
+from awsaccountmgr.plan import AccountPlan, Planner, format_plan
+
+CONTACT = {
+    "Email": "security@example.com",
+    "Name": "Security",
+    "PhoneNumber": "+31000000000",
+    "Title": "Security",
+}
+
+
+class Journal:
+    def __init__(self, *steps):
+        self.steps = set(steps)
+
+    def is_done(self, step):
+        return step in self.steps
+
+
+def account(name, **config):
+    return Account.load_from_config(
+        dict(
+            {
+                "AccountFullName": name,
+                "OrganizationalUnitPath": "/dev",
+                "Email": f"{name}@example.com",
+                "Tags": {"Owner": "team"},
+            },
+            **config,
+        )
+    )
+
+
+def actions(plan):
+    return [change.action for change in plan.changes]
+
+
+def test_account_up_to_date(fake, organization):
+    dev_id = fake.add_ou("dev")
+    account_id = fake.add_account(
+        "a", "a@example.com", dev_id, tags={"Owner": "team"}, alias="a"
+    )
+
+    plan = Planner(organization).plan_account(account("a", DeleteDefaultVPC=True))
+
+    assert plan.account_id == account_id
+    assert not plan.has_changes
+
+
+def test_only_differences_are_planned(fake, organization):
+    fake.add_ou("dev")
+    account_id = fake.add_account(
+        "a", "a@example.com", tags={"Owner": "other", "Old": "x"}, default_vpc=True
+    )
+    fake.vpcs[(account_id, REGIONS[1])] = None
+
+    plan = Planner(organization).plan_account(
+        account(
+            "a",
+            DeleteDefaultVPC=True,
+            AlternateContacts={"Security": CONTACT},
+        )
+    )
+
+    assert actions(plan) == [
+        "move_account",
+        "delete_default_vpc",
+        "create_account_alias",
+        "update_alternate_contacts",
+        "update_account_tags",
+    ]
+    move, vpcs, alias, contacts, tags = plan.changes
+    assert move.params == {"ou_path": "/dev", "allow_direct_move": False}
+    assert vpcs.params == {"regions": [REGIONS[0]]}
+    assert alias.params == {"account_alias": "a"}
+    assert list(contacts.params["contacts"]) == ["SECURITY"]
+    assert tags.params == {"tags": {"Owner": "team"}, "remove_keys": ["Old"]}
+    assert str(tags) == "Set tags {'Owner': 'team'} and remove tags ['Old']"
+
+
+def test_new_account(fake, organization):
+    fake.add_ou("dev")
+
+    plan = Planner(organization).plan_account(
+        account("new", DeleteDefaultVPC=True, Alias=False)
+    )
+
+    assert plan.account_id is None
+    assert actions(plan) == [
+        "create_account",
+        "move_account",
+        "delete_default_vpc",
+        "update_account_tags",
+    ]
+    # The default VPCs of a new account aren't looked up
+    assert plan.changes[2].params == {"regions": REGIONS[:2]}
+    assert "ec2.DescribeVpcs" not in fake.calls
+
+
+def test_completed_steps_are_not_planned(fake, organization):
+    fake.add_ou("dev")
+    fake.add_account("a", "a@example.com", default_vpc=True)
+    journal = Journal("move_account", f"delete_default_vpc:{REGIONS[0]}")
+
+    plan = Planner(organization).plan_account(
+        account("a", DeleteDefaultVPC=True), journal
+    )
+
+    assert actions(plan) == [
+        "delete_default_vpc",
+        "create_account_alias",
+        "update_account_tags",
+    ]
+    assert plan.changes[0].params == {"regions": [REGIONS[1]]}
+    assert "organizations.ListParents" not in fake.calls
+
+
+def test_default_vpcs_without_lookup(fake, organization):
+    fake.add_ou("dev")
+    fake.add_account("a", "a@example.com")
+
+    planner = Planner(organization, check_default_vpcs=False)
+    plan = planner.plan_account(account("a", DeleteDefaultVPC=True, Tags={}))
+
+    assert plan.changes[1].params == {"regions": REGIONS[:2]}
+    assert "ec2.DescribeVpcs" not in fake.calls
+
+
+def test_plan_captures_errors(fake, organization):
+    plans = Planner(organization).plan([account("a", OrganizationalUnitPath="/x")])
+
+    assert isinstance(plans[0].error, ValueError)
+    assert not plans[0].has_changes
+
+
+def test_format_plan(fake, organization):
+    fake.add_ou("dev")
+    plans = [
+        Planner(organization).plan_account(account("new")),
+        AccountPlan(account("a"), "1"),
+        AccountPlan(account("b"), error=ValueError("failed")),
+    ]
+
+    assert format_plan(plans).splitlines() == [
+        "new (new account):",
+        "  - Create account with email new@example.com",
+        "  - Move account from / to /dev",
+        "  - Set account alias to new",
+        "  - Set tags {'Owner': 'team'}",
+        "b (new account): failed to plan: failed",
+        "Plan: 4 change(s) for 1 account(s), 1 account(s) up to date, 1 failed.",
+    ]
@@ -0,0 +1,119 @@
+import pytest
+from awsaccountmgr import ratelimit
+from awsaccountmgr.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    """Stop the clock of the token buckets, so no tokens are added."""
+    monkeypatch.setattr(ratelimit, "monotonic", lambda: 0.0)
+
+
+def test_acquire_within_capacity_does_not_wait(frozen):
+    bucket = TokenBucket(5)
+
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+
+
+def test_reserve_takes_tokens_in_advance(frozen):
+    bucket = TokenBucket(2)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_throttled_halves_rate_down_to_min_rate(frozen):
+    bucket = TokenBucket(4, min_rate=1)
+
+    bucket.throttled()
+    assert bucket.rate == 2
+    bucket.throttled()
+    bucket.throttled()
+    assert bucket.rate == 1
+
+
+def test_throttled_empties_bucket(frozen):
+    bucket = TokenBucket(4)
+
+    bucket.throttled()
+    assert bucket.reserve() == pytest.approx(0.5)
+
+
+def test_succeeded_restores_rate(frozen):
+    bucket = TokenBucket(10, recovery=0.25)
+    bucket.throttled()
+
+    bucket.succeeded()
+    assert bucket.rate == 7.5
+    bucket.succeeded()
+    bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_buckets_per_account():
+    limiter = RateLimiter({"iam": 10}, {})
+
+    master = limiter.buckets_for("iam", "ListAccountAliases")
+    first = limiter.buckets_for("iam", "ListAccountAliases", account_id="1")
+    second = limiter.buckets_for("iam", "ListAccountAliases", account_id="2")
+
+    assert len(master) == len(first) == len(second) == 1
+    assert first == limiter.buckets_for("iam", "CreateAccountAlias", account_id="1")
+    assert master[0] is not first[0]
+    assert first[0] is not second[0]
+
+
+def test_regional_services_have_buckets_per_region():
+    limiter = RateLimiter()
+
+    east = limiter.buckets_for("ec2", "DescribeVpcs", "us-east-1", "1")
+    west = limiter.buckets_for("ec2", "DescribeVpcs", "us-west-2", "1")
+    assert east[0] is not west[0]
+
+    east = limiter.buckets_for("iam", "ListAccountAliases", "us-east-1", "1")
+    west = limiter.buckets_for("iam", "ListAccountAliases", "us-west-2", "1")
+    assert east[0] is west[0]
+
+
+def test_operation_buckets():
+    limiter = RateLimiter()
+
+    create = limiter.buckets_for("organizations", "CreateAccount")
+    assert [bucket.max_rate for bucket in create] == [5, 1]
+    assert len(limiter.buckets_for("organizations", "ListAccounts")) == 1
+
+
+def test_zero_rate_disables_limit():
+    limiter = RateLimiter({"ec2": 0}, {})
+
+    assert limiter.buckets_for("ec2", "DescribeVpcs", "us-east-1") == []
+
+
+def test_remove_account():
+    limiter = RateLimiter()
+    bucket = limiter.buckets_for("iam", "ListAccountAliases", account_id="1")[0]
+    master = limiter.buckets_for("iam", "ListAccountAliases")[0]
+
+    limiter.remove_account("1")
+
+    assert (
+        limiter.buckets_for("iam", "ListAccountAliases", account_id="1")[0]
+        is not bucket
+    )
+    assert limiter.buckets_for("iam", "ListAccountAliases")[0] is master
+
+
+def test_configure_from_strings():
+    limiter = RateLimiter()
+    limiter.configure_from_strings(["organizations=2", "ec2.DeleteVpc=0.5"])
+
+    assert limiter.service_rates["organizations"] == 2
+    assert limiter.operation_rates["ec2.DeleteVpc"] == 0.5
+
+
+@pytest.mark.parametrize("rate_limit", ["organizations", "ec2=fast", "a=1=2"])
+def test_configure_from_invalid_strings(rate_limit):
+    with pytest.raises(ValueError):
+        RateLimiter().configure_from_strings([rate_limit])
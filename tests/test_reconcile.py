@@ -0,0 +1,132 @@
+import pytest
+from awsaccountmgr import aio
+from awsaccountmgr.account import Account
+from awsaccountmgr.plan import Change
+from awsaccountmgr.reconcile import (
+    ReconcileResult,
+    ResultCollector,
+    apply_change,
+    handle_create_status,
+    reconcile_accounts,
+)
+
+BACKENDS = {"threads": reconcile_accounts, "asyncio": aio.reconcile_accounts}
+
+
+def account(name, **config):
+    return Account.load_from_config(
+        dict(
+            {
+                "AccountFullName": name,
+                "OrganizationalUnitPath": "/dev",
+                "Email": f"{name}@example.com",
+                "Tags": {"Owner": "team"},
+            },
+            **config,
+        )
+    )
+
+
+class Journal:
+    def __init__(self):
+        self.done = []
+        self.create_request_cleared = False
+
+    def mark_done(self, step):
+        self.done.append(step)
+
+    def clear_create_request(self):
+        self.create_request_cleared = True
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_reconcile_accounts(fake, organization, backend):
+    dev_id = fake.add_ou("dev")
+    existing_id = fake.add_account("existing", "existing@example.com", default_vpc=True)
+    accounts = [
+        account("new"),
+        account("existing", DeleteDefaultVPC=True),
+        account("invalid", OrganizationalUnitPath="/missing"),
+    ]
+
+    results = BACKENDS[backend](organization, accounts, workers=2)
+
+    assert [result.full_name for result in results] == ["new", "existing", "invalid"]
+    assert [result.succeeded for result in results] == [True, True, False]
+    new_id = fake.find_account_id("new")
+    assert organization.is_new_account(new_id)
+    assert not organization.is_new_account(existing_id)
+    assert [result.account_id for result in results] == [new_id, existing_id, None]
+    for account_id in (new_id, existing_id):
+        assert fake.parents[account_id] == dev_id
+        assert fake.tags[account_id] == {"Owner": "team"}
+    assert not any(fake.vpcs[(existing_id, region)] for region in fake.regions)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_results_are_passed_on_as_accounts_finish(fake, organization, backend):
+    fake.add_ou("dev")
+    fake.add_account("existing", "existing@example.com")
+    fake.create_account_seconds = 0.5
+    recorded = []
+
+    def on_result(account, result):
+        recorded.append((account.full_name, fake.find_account_id("new") is not None))
+
+    accounts = [account("new"), account("existing"), account("invalid", Email=None)]
+    BACKENDS[backend](organization, accounts, workers=2, on_result=on_result)
+
+    # The existing account is passed on before the new account has been created
+    assert sorted(recorded) == [("existing", False), ("invalid", False), ("new", True)]
+
+
+def test_result_collector():
+    results = ResultCollector([account("a"), account("b"), account("c")])
+    results.add(1, ReconcileResult("b", "1"))
+
+    results.fail([0, 1], IOError("failed"))
+    results.add(2, ReconcileResult("c", "2"))
+
+    assert [result.succeeded for result in results.to_list()] == [False, True, True]
+    assert str(results.to_list()[0].error) == "failed"
+
+
+def test_result_collector_survives_failing_callback():
+    def on_result(account, result):
+        raise IOError("state file is read-only")
+
+    results = ResultCollector([account("a")], on_result)
+    results.add(0, ReconcileResult("a", "1"))
+
+    assert results.to_list()[0].succeeded
+
+
+def test_handle_failed_create_status():
+    journal = Journal()
+    status = {"Id": "car-1", "State": "FAILED", "FailureReason": "EMAIL_ALREADY_EXISTS"}
+
+    result = handle_create_status(status, account("a"), journal)
+
+    assert str(result.error) == "Failed to create account a: EMAIL_ALREADY_EXISTS"
+    assert journal.create_request_cleared
+    assert journal.done == []
+
+
+def test_handle_succeeded_create_status():
+    journal = Journal()
+    status = {"Id": "car-1", "State": "SUCCEEDED", "AccountId": "1"}
+
+    assert handle_create_status(status, account("a"), journal) is None
+    assert journal.done == ["create_account"]
+
+
+def test_apply_change_dispatches_to_organization(fake, organization):
+    fake.add_ou("dev")
+    account_id = fake.add_account("a", "a@example.com")
+    change = Change("create_account_alias", "Set alias", account_alias="alias")
+
+    apply_change(organization, change, account("a"), account_id)
+
+    assert fake.aliases[account_id] == ["alias"]
+    with pytest.raises(ValueError):
+        apply_change(organization, Change("unknown", ""), account("a"), account_id)
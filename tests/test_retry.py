@@ -0,0 +1,157 @@
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+from awsaccountmgr import retry
+from awsaccountmgr.retry import RetryPolicy, RetryStats
+
+
+class Clock:
+    """Replaces monotonic() and sleep() of the retry module."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry, "monotonic", clock.monotonic)
+    monkeypatch.setattr(retry, "sleep", clock.sleep)
+    return clock
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "TestOperation")
+
+
+def failing(*codes, result="ok"):
+    """Returns a function raising the given error codes in turn, then returning result."""
+    errors = list(codes)
+
+    def function():
+        if errors:
+            raise client_error(errors.pop(0))
+        return result
+
+    return function
+
+
+def test_get_delay_is_bounded():
+    policy = RetryPolicy(base_delay=0.5, max_delay=4)
+
+    for attempts, bound in [(1, 0.5), (2, 1), (3, 2), (4, 4), (10, 4)]:
+        for _ in range(100):
+            assert 0 <= policy.get_delay(attempts) <= bound
+
+
+def test_should_retry_stops_at_max_attempts(clock):
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy._should_retry(2, start=0, delay=0)
+    assert not policy._should_retry(3, start=0, delay=0)
+
+
+def test_should_retry_stops_at_deadline(clock):
+    policy = RetryPolicy(deadline=10)
+    clock.now = 8
+
+    assert policy._should_retry(1, start=0, delay=2)
+    assert not policy._should_retry(1, start=0, delay=2.5)
+
+
+def test_retryable_error_codes():
+    policy = RetryPolicy()
+
+    for code in ["Throttling", "TooManyRequestsException", "ServiceUnavailable"]:
+        parsed = {"Error": {"Code": code}}
+        assert policy._get_retryable_error((Response(400), parsed), None) == code
+
+    parsed = {"Error": {"Code": "AccessDenied"}}
+    assert policy._get_retryable_error((Response(403), parsed), None) is None
+    assert policy._get_retryable_error((Response(200), {}), None) is None
+
+
+def test_retryable_status_codes():
+    policy = RetryPolicy()
+
+    assert policy._get_retryable_error((Response(503), {}), None) == "503"
+    parsed = {"Error": {"Code": "Unknown"}}
+    assert policy._get_retryable_error((Response(502), parsed), None) == "Unknown"
+
+
+def test_retryable_exceptions():
+    policy = RetryPolicy()
+
+    error = EndpointConnectionError(endpoint_url="https://example.com")
+    assert policy._get_retryable_error(None, error) == "EndpointConnectionError"
+    assert policy._get_retryable_error(None, ValueError()) is None
+
+
+def test_custom_retryable_codes():
+    policy = RetryPolicy(retryable_codes={"ConcurrentModificationException"})
+
+    parsed = {"Error": {"Code": "Throttling"}}
+    assert policy._get_retryable_error((Response(400), parsed), None) is None
+
+
+def test_call_retries_retryable_errors(clock):
+    stats = RetryStats()
+    policy = RetryPolicy(stats=stats)
+    function = failing("Throttling", "InternalError")
+
+    assert policy.call(function) == "ok"
+    assert len(clock.sleeps) == 2
+
+    operation = stats.report()["function"]
+    assert operation["Calls"] == 1
+    assert operation["Attempts"] == 3
+    assert operation["Retries"] == 2
+    assert operation["Errors"] == {"Throttling": 1, "InternalError": 1}
+
+
+def test_call_raises_other_errors(clock):
+    policy = RetryPolicy()
+
+    with pytest.raises(ClientError):
+        policy.call(failing("AccessDenied"))
+    assert clock.sleeps == []
+
+
+def test_call_retries_given_codes(clock):
+    policy = RetryPolicy()
+    function = failing("DependencyViolation")
+
+    assert policy.call(function, retryable_codes={"DependencyViolation"}) == "ok"
+    assert len(clock.sleeps) == 1
+
+
+def test_call_gives_up_after_max_attempts(clock):
+    stats = RetryStats()
+    policy = RetryPolicy(max_attempts=3, stats=stats)
+
+    with pytest.raises(ClientError):
+        policy.call(failing(*["Throttling"] * 5))
+
+    assert len(clock.sleeps) == 2
+    assert stats.report()["function"]["GaveUp"] == 1
+
+
+def test_call_gives_up_at_deadline(clock):
+    policy = RetryPolicy(max_attempts=100, base_delay=10, max_delay=10, deadline=30)
+
+    with pytest.raises(ClientError):
+        policy.call(failing(*["Throttling"] * 100))
+
+    assert sum(clock.sleeps) <= 30
@@ -0,0 +1,86 @@
+import threading
+from time import sleep
+import pytest
+from awsaccountmgr.scheduler import RegionScheduler
+
+
+def test_regions_take_turns():
+    scheduler = RegionScheduler(workers=1, max_per_region=4)
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        release.wait()
+
+    first = scheduler.submit("us-east-1", block)
+    started.wait()
+    futures = [
+        scheduler.submit(region, order.append, f"{region}:{index}")
+        for region, index in [
+            ("us-east-1", 1),
+            ("us-east-1", 2),
+            ("us-east-1", 3),
+            ("eu-west-1", 1),
+            ("eu-west-1", 2),
+        ]
+    ]
+    release.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+
+    assert order == [
+        "us-east-1:1",
+        "eu-west-1:1",
+        "us-east-1:2",
+        "eu-west-1:2",
+        "us-east-1:3",
+    ]
+
+
+def test_max_tasks_per_region():
+    scheduler = RegionScheduler(workers=8, max_per_region=2)
+    lock = threading.Lock()
+    running = {"us-east-1": 0, "eu-west-1": 0}
+    peak = dict(running)
+
+    def task(region):
+        with lock:
+            running[region] += 1
+            peak[region] = max(peak[region], running[region])
+        sleep(0.02)
+        with lock:
+            running[region] -= 1
+
+    futures = [
+        scheduler.submit(region, task, region) for _ in range(6) for region in running
+    ]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert peak == {"us-east-1": 2, "eu-west-1": 2}
+
+
+def test_errors_are_set_on_the_future():
+    scheduler = RegionScheduler(workers=1)
+
+    def fail():
+        raise ValueError("failed")
+
+    future = scheduler.submit("us-east-1", fail)
+    with pytest.raises(ValueError):
+        future.result(timeout=5)
+
+    assert scheduler.submit("us-east-1", lambda: 42).result(timeout=5) == 42
+    assert scheduler.progress()["Failed"] == 1
+
+
+@pytest.mark.parametrize("amounts", [{"workers": 0}, {"max_per_region": 0}])
+def test_configure_rejects_amounts_below_one(amounts):
+    scheduler = RegionScheduler()
+
+    with pytest.raises(ValueError):
+        scheduler.configure(**amounts)
+
+    assert (scheduler.workers, scheduler.max_per_region) == (16, 4)
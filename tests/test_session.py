@@ -0,0 +1,61 @@
+import threading
+from time import sleep
+import pytest
+from awsaccountmgr import session
+from awsaccountmgr.session import ClientRegistry
+
+
+class Session:
+    """Records how many clients are created at the same time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.creating = 0
+        self.peak = 0
+
+    def client(self, service, **kwargs):
+        with self._lock:
+            self.creating += 1
+            self.peak = max(self.peak, self.creating)
+        sleep(0.01)
+        with self._lock:
+            self.creating -= 1
+        return object()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    for name in ("rate_limiter", "retry_policy", "api_metrics"):
+        monkeypatch.setattr(getattr(session, name), "register", lambda *args: None)
+    registry = ClientRegistry(max_clients=3)
+    registry._sessions[None] = Session()
+    return registry
+
+
+def test_clients_are_created_one_at_a_time(registry):
+    clients = {}
+
+    def create(index):
+        clients[index] = registry.client("ec2", region_name=f"region-{index % 4}")
+
+    threads = [threading.Thread(target=create, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert registry.get_session().peak == 1
+    assert clients[0] is clients[4]
+
+
+def test_least_recently_used_clients_are_dropped(registry):
+    first = registry.client("ec2", region_name="us-east-1")
+    registry.client("ec2", region_name="us-west-1")
+    registry.client("ec2", region_name="us-west-2")
+
+    assert registry.client("ec2", region_name="us-east-1") is first
+    registry.client("ec2", region_name="eu-west-1")
+
+    assert registry.client("ec2", region_name="us-east-1") is first
+    assert len(registry._clients) == 3
+    assert (None, "ec2", "us-west-1") not in registry._clients
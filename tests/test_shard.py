@@ -0,0 +1,116 @@
+import json
+import pytest
+from awsaccountmgr.reconcile import ReconcileResult
+from awsaccountmgr.shard import (
+    get_shard_index,
+    merge_reports,
+    parse_shard,
+    select_shard,
+    write_report,
+)
+
+
+class Account:
+    def __init__(self, full_name):
+        self.full_name = full_name
+
+
+def test_parse_shard():
+    assert parse_shard("1/1") == (1, 1)
+    assert parse_shard("2/4") == (2, 4)
+
+
+@pytest.mark.parametrize("shard", ["", "1", "0/4", "5/4", "a/4", "1/2/3"])
+def test_parse_invalid_shard(shard):
+    with pytest.raises(ValueError):
+        parse_shard(shard)
+
+
+def test_shard_index_is_stable():
+    # The first 8 bytes of the SHA-256 of the name, independent of the Python
+    # hash seed, so every runner selects the same accounts
+    names = [f"account-{index:05d}" for index in range(8)]
+    assert [get_shard_index(name, 4) for name in names] == [4, 3, 2, 4, 3, 1, 2, 4]
+    assert get_shard_index(" account-00001 ", 4) == 3
+    assert get_shard_index("account-00001", 1) == 1
+
+
+def test_shards_cover_all_accounts_once():
+    accounts = [Account(f"account-{index:05d}") for index in range(200)]
+
+    shards = [select_shard(accounts, index, 4) for index in range(1, 5)]
+
+    assert sorted(account.full_name for shard in shards for account in shard) == [
+        account.full_name for account in accounts
+    ]
+    assert all(shards)
+
+
+def write(tmp_path, name, shard, names):
+    path = str(tmp_path / name)
+    write_report(path, [ReconcileResult(name, "1") for name in names], shard)
+    return path
+
+
+def test_merge_reports(tmp_path):
+    paths = [
+        write(tmp_path, "1.json", (1, 2), ["a", "b"]),
+        write(tmp_path, "2.json", (2, 2), ["c"]),
+    ]
+
+    results, problems = merge_reports(paths)
+
+    assert [result.full_name for result in results] == ["a", "b", "c"]
+    assert problems == []
+
+
+def test_merge_unsharded_report(tmp_path):
+    results, problems = merge_reports([write(tmp_path, "run.json", None, ["a"])])
+
+    assert len(results) == 1
+    assert problems == []
+
+
+def test_merge_reports_keeps_errors(tmp_path):
+    path = str(tmp_path / "1.json")
+    write_report(path, [ReconcileResult("a", error=IOError("Access denied"))])
+
+    results, _ = merge_reports([path])
+
+    assert not results[0].succeeded
+    assert results[0].error == "Access denied"
+    with open(path) as stream:
+        assert json.load(stream)["Accounts"][0]["Succeeded"] is False
+
+
+def test_merge_reports_finds_missing_shards(tmp_path):
+    _, problems = merge_reports([write(tmp_path, "2.json", (2, 3), ["a"])])
+
+    assert problems == ["Missing report of shard(s) 1, 3 of 3"]
+
+
+def test_merge_reports_finds_duplicates(tmp_path):
+    paths = [
+        write(tmp_path, "1.json", (1, 2), ["a"]),
+        write(tmp_path, "1-again.json", (1, 2), ["b"]),
+        write(tmp_path, "2.json", (2, 2), ["a", "c"]),
+    ]
+
+    results, problems = merge_reports(paths)
+
+    assert [result.full_name for result in results] == ["a", "c"]
+    assert len(problems) == 2
+    assert "Shard 1/2 already reported" in problems[0]
+    assert "Account a already reported" in problems[1]
+
+
+def test_merge_reports_of_different_counts(tmp_path):
+    paths = [
+        write(tmp_path, "1.json", (1, 1), ["a"]),
+        write(tmp_path, "2.json", (1, 2), ["b"]),
+    ]
+
+    _, problems = merge_reports(paths)
+
+    assert "Reports of different shard counts: 1, 2" in problems
+    assert "Missing report of shard(s) 2 of 2" in problems
@@ -0,0 +1,106 @@
+import pytest
+from awsaccountmgr.account import Account
+from awsaccountmgr.reconcile import ReconcileResult
+from awsaccountmgr.state import StateStore, definition_hash
+
+
+def account(name="a", **config):
+    return Account.load_from_config(
+        dict(
+            {
+                "AccountFullName": name,
+                "OrganizationalUnitPath": "/dev",
+                "Email": f"{name}@example.com",
+            },
+            **config,
+        )
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.sqlite"))
+    yield store
+    store.close()
+
+
+def test_definition_hash_normalizes_ou_path():
+    assert definition_hash(account()) == definition_hash(
+        account(OrganizationalUnitPath=" dev/ ")
+    )
+    assert definition_hash(account()) != definition_hash(account(Alias="other"))
+
+
+def test_unknown_account_needs_reconcile(store):
+    assert store.get("a") is None
+    assert store.needs_reconcile(account())
+
+
+def test_record_success(store):
+    store.record(account(), ReconcileResult("a", "111111111111"))
+
+    state = store.get("a")
+    assert state["AccountId"] == "111111111111"
+    assert state["Succeeded"]
+    assert state["Error"] is None
+    assert not store.needs_reconcile(account())
+
+
+def test_changed_definition_needs_reconcile(store):
+    store.record(account(), ReconcileResult("a", "111111111111"))
+
+    assert store.needs_reconcile(account(Tags={"Owner": "team"}))
+
+
+def test_failed_account_needs_reconcile(store):
+    store.record(account(), ReconcileResult("a", error=ValueError("failed")))
+
+    assert store.get("a")["Error"] == "failed"
+    assert store.needs_reconcile(account())
+
+
+def test_state_is_persisted(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    store = StateStore(path)
+    store.record(account(), ReconcileResult("a", "111111111111"))
+    store.close()
+
+    store = StateStore(path)
+    assert not store.needs_reconcile(account())
+    store.close()
+
+
+def test_journal_is_kept_for_the_same_definition(store):
+    journal = store.journal(account())
+    journal.mark_done("move_account")
+
+    assert journal.is_done("move_account")
+    assert store.journal(account()).is_done("move_account")
+    assert not store.journal(account(Alias="other")).is_done("move_account")
+
+
+def test_record_clears_completed_steps(store):
+    store.journal(account()).mark_done("move_account")
+
+    store.record(account(), ReconcileResult("a", error=ValueError("failed")))
+
+    assert not store.journal(account()).is_done("move_account")
+
+
+def test_create_request_kept_until_success(store):
+    store.journal(account()).record_create_request("car-1")
+
+    store.record(account(), ReconcileResult("a", error=ValueError("failed")))
+    assert store.journal(account()).get_create_request() == "car-1"
+
+    store.record(account(), ReconcileResult("a", "111111111111"))
+    assert store.journal(account()).get_create_request() is None
+
+
+def test_clear_create_request(store):
+    journal = store.journal(account())
+    journal.record_create_request("car-1")
+
+    journal.clear_create_request()
+
+    assert journal.get_create_request() is None
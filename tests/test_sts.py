@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from time import sleep
+import pytest
+from botocore.exceptions import ClientError
+from awsaccountmgr.sts import CredentialCache, assume_role, credential_cache
+
+
+class Fetch:
+    """Returns new credentials that expire after the given amount of seconds."""
+
+    def __init__(self, name="key", expires_in=3600, delay=0.0, error=None):
+        self.name = name
+        self.expires_in = expires_in
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.error is not None:
+            raise self.error
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=self.expires_in)
+        return (f"{self.name}-{calls}", "secret", "token"), expiration
+
+
+def wait_for(condition, timeout=2):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        sleep(0.01)
+    raise AssertionError("Condition not met in time")
+
+
+def test_credentials_are_reused():
+    cache = CredentialCache()
+    fetch = Fetch()
+
+    assert cache.get("key", fetch) == ("key-1", "secret", "token")
+    assert cache.get("key", fetch) == ("key-1", "secret", "token")
+    assert cache.get("other", fetch) == ("key-2", "secret", "token")
+    assert fetch.calls == 2
+
+
+def test_credentials_are_refreshed_in_background():
+    cache = CredentialCache(refresh_before=300, expire_before=60)
+    cache.get("key", Fetch("old", expires_in=200))
+    fetch = Fetch("new")
+
+    # The current credentials are still handed out while they are refreshed
+    assert cache.get("key", fetch)[0] == "old-1"
+    wait_for(lambda: cache.peek("key")[0] == "new-1")
+    assert cache.get("key", fetch)[0] == "new-1"
+    assert fetch.calls == 1
+
+
+def test_expired_credentials_are_fetched_again():
+    cache = CredentialCache(refresh_before=300, expire_before=60)
+    cache.get("key", Fetch("old", expires_in=30))
+    fetch = Fetch("new")
+
+    assert cache.get("key", fetch)[0] == "new-1"
+    assert cache.get("key", fetch)[0] == "new-1"
+    assert fetch.calls == 1
+
+
+def test_concurrent_gets_fetch_once():
+    cache = CredentialCache()
+    fetch = Fetch(delay=0.05)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("key", fetch)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fetch.calls == 1
+    assert len(set(results)) == 1
+
+
+def test_failed_background_refresh_keeps_credentials():
+    cache = CredentialCache(refresh_before=300, expire_before=60)
+    cache.get("key", Fetch("old", expires_in=200))
+    fetch = Fetch("new", error=IOError("sts unavailable"))
+
+    assert cache.get("key", fetch)[0] == "old-1"
+    wait_for(lambda: fetch.calls == 1 and "key" not in cache._refreshing)
+    assert cache.peek("key")[0] == "old-1"
+
+
+def test_assume_role_is_cached_per_source(fake):
+    master = ("ASIA111111111111", "x", "x")
+    account_id = fake.add_account("dev", "dev@example.com")
+
+    credentials = assume_role(account_id, source_role=master)
+
+    assert credentials[0] == f"ASIA{account_id}"
+    assert assume_role(account_id, source_role=master) == credentials
+    assert fake.calls["sts.AssumeRole"] == 1
+    assert credential_cache.peek(
+        (account_id, "OrganizationAccountAccessRole", master[0])
+    )
+
+
+def test_assume_role_of_unknown_account(fake):
+    with pytest.raises(ClientError):
+        assume_role("999999999999")
@@ -0,0 +1,48 @@
+import pytest
+from botocore.exceptions import ClientError
+from awsaccountmgr import retry
+from awsaccountmgr.vpc import get_default_vpc_id
+
+
+class Client:
+    """EC2 client stub whose describe_vpcs fails with the given error codes first."""
+
+    def __init__(self, *codes):
+        self.errors = list(codes)
+        self.calls = 0
+
+    def describe_vpcs(self, Filters):
+        self.calls += 1
+        if self.errors:
+            code = self.errors.pop(0)
+            raise ClientError(
+                {"Error": {"Code": code, "Message": code}}, "DescribeVpcs"
+            )
+        return {"Vpcs": [{"VpcId": "vpc-1"}]}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(retry, "sleep", lambda seconds: None)
+
+
+def test_new_account_errors_are_retried_for_new_accounts():
+    client = Client("AuthFailure", "UnauthorizedOperation")
+
+    assert get_default_vpc_id(client, new_account=True) == "vpc-1"
+    assert client.calls == 3
+
+
+def test_new_account_errors_are_permanent_for_existing_accounts():
+    client = Client("AuthFailure")
+
+    with pytest.raises(ClientError):
+        get_default_vpc_id(client)
+    assert client.calls == 1
+
+
+def test_transient_errors_are_retried_for_existing_accounts():
+    client = Client("RequestLimitExceeded")
+
+    assert get_default_vpc_id(client) == "vpc-1"
+    assert client.calls == 2